@@ -1,7 +1,7 @@
 # backend/proyecto/apps/bodegaje/admin.py
 from django.contrib import admin
 # Asegúrate de importar los tres modelos
-from .models import Producto, Ubicacion, Inventario, MovimientoInventario
+from .models import Producto, Ubicacion, Inventario, MovimientoInventario, ReservaStock, SnapshotInventario
 
 @admin.register(Producto)
 class ProductoAdmin(admin.ModelAdmin):
@@ -29,4 +29,17 @@ class MovimientoInventarioAdmin(admin.ModelAdmin):
     list_select_related = ('producto', 'ubicacion', 'empresa', 'usuario')
     readonly_fields = ('timestamp',) # La fecha se pone sola
     list_per_page = 50 # Muestra más por página
-# --- FIN REGISTRO ---
\ No newline at end of file
+# --- FIN REGISTRO ---
+
+@admin.register(ReservaStock)
+class ReservaStockAdmin(admin.ModelAdmin):
+    list_display = ('id', 'pedido', 'inventario', 'cantidad', 'estado', 'vence_en', 'fecha_cierre')
+    list_filter = ('estado',)
+    search_fields = ('pedido__id', 'inventario__producto__nombre')
+    raw_id_fields = ('pedido', 'inventario')
+
+@admin.register(SnapshotInventario)
+class SnapshotInventarioAdmin(admin.ModelAdmin):
+    list_display = ('id', 'empresa', 'corte', 'fecha_creacion')
+    list_filter = ('empresa',)
+    readonly_fields = ('fecha_creacion',)
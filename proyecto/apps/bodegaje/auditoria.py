@@ -0,0 +1,114 @@
+# backend/proyecto/apps/bodegaje/auditoria.py
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from .middleware import get_current_user
+from .models import MovimientoInventario, Producto, Ubicacion
+
+_thread_locals = threading.local()
+
+
+def _usuario(usuario=None):
+    usuario = usuario if usuario is not None else get_current_user()
+    return usuario if usuario is not None and usuario.is_authenticated else None
+
+
+def _escribir(entradas):
+    if entradas:
+        MovimientoInventario.objects.bulk_create(
+            entradas, batch_size=getattr(settings, 'AUDITORIA_BATCH_SIZE', 500)
+        )
+        entradas.clear()
+
+
+def registrar(**campos):
+    """
+    Añade una entrada al historial (MovimientoInventario) sin escribirla ya:
+    se encola al confirmarse la transacción en curso (on_commit), así que los
+    cambios revertidos, incluso por un savepoint, no dejan rastro.
+    Dentro de un lote() (cada petición abre uno) las entradas se acumulan y se
+    escriben juntas con un bulk_create al cerrar el lote; fuera, cada entrada
+    se escribe sola al confirmar.
+    'usuario' por defecto es el de la petición actual.
+    """
+    campos['usuario'] = _usuario(campos.get('usuario'))
+    entrada = MovimientoInventario(**campos)
+    buffer = getattr(_thread_locals, 'buffer', None)
+    if buffer is None:
+        transaction.on_commit(partial(_escribir, [entrada]))
+    else:
+        transaction.on_commit(partial(buffer.append, entrada))
+
+
+@contextmanager
+def lote():
+    """
+    Agrupa las entradas registradas dentro del bloque en un único bulk_create.
+    Si al cerrar seguimos dentro de una transacción, la escritura se difiere a
+    su on_commit (registrado después de las entradas, así corre detrás de
+    ellas); si no, se escribe ya. Los lotes anidados usan el exterior.
+    """
+    if getattr(_thread_locals, 'buffer', None) is not None:
+        yield
+        return
+    buffer = _thread_locals.buffer = []
+    try:
+        yield
+    finally:
+        _thread_locals.buffer = None
+        transaction.on_commit(partial(_escribir, buffer))
+
+
+# --- API masiva: bulk_create / bulk_update no disparan señales ---
+def registrar_productos(productos, creados, campos=None, usuario=None):
+    """Una entrada PROD_CREADO/PROD_MODIFICADO por producto (mismo texto que las señales)."""
+    detalle = f" [Campos: {', '.join(campos)}]" if campos else ''
+    with lote():
+        for producto in productos:
+            registrar(
+                producto=producto if producto.pk else None,
+                tipo_movimiento='PROD_CREADO' if creados else 'PROD_MODIFICADO',
+                motivo=f"Producto '{producto.nombre}' (SKU: {producto.sku}) {'creado' if creados else 'modificado'}.{detalle}",
+                usuario=usuario,
+                cantidad_anterior=None,
+                cantidad_nueva=None,
+                cantidad_cambio=0,
+            )
+
+
+def registrar_ubicaciones(ubicaciones, creadas, campos=None, usuario=None):
+    """Una entrada UBI_CREADA/UBI_MODIFICADA por ubicación (mismo texto que las señales)."""
+    detalle = f" [Campos: {', '.join(campos)}]" if campos else ''
+    with lote():
+        for ubicacion in ubicaciones:
+            registrar(
+                ubicacion=ubicacion if ubicacion.pk else None,
+                tipo_movimiento='UBI_CREADA' if creadas else 'UBI_MODIFICADA',
+                motivo=f"Ubicación '{ubicacion.nombre}' {'creada' if creadas else 'modificada'}.{detalle}",
+                usuario=usuario,
+                cantidad_anterior=None,
+                cantidad_nueva=None,
+                cantidad_cambio=0,
+            )
+
+
+def registrar_catalogo(modelo, objs, creados, campos=None, usuario=None):
+    """Punto de entrada de CatalogoQuerySet.bulk_create/bulk_update."""
+    if modelo is Producto:
+        registrar_productos(objs, creados, campos, usuario)
+    elif modelo is Ubicacion:
+        registrar_ubicaciones(objs, creados, campos, usuario)
+
+
+class AuditoriaMiddleware:
+    """Abre un lote() por petición: todo su historial se escribe con un bulk_create."""
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with lote():
+            return self.get_response(request)
@@ -0,0 +1,226 @@
+# backend/proyecto/apps/bodegaje/exportar.py
+import csv
+import json
+import os
+import tempfile
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from rest_framework.renderers import BaseRenderer
+
+CONTENT_TYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATOS_CSV = ('csv', 'csv.gz')
+
+ENCABEZADOS_INVENTARIO = [
+    'ID', 'Producto', 'SKU', 'Ubicación', 'Cantidad', 'Empresa Cliente', 'Fecha Creación', 'Última Actualización',
+]
+
+
+def _fecha(valor):
+    return valor.strftime('%Y-%m-%d %H:%M:%S') if valor else ''
+
+
+def filas_inventario(queryset):
+    """
+    Una fila por registro de inventario, leyendo el queryset por bloques
+    (iterator): nunca se cargan todos los registros a la vez.
+    """
+    chunk_size = getattr(settings, 'EXPORTAR_CHUNK_SIZE', 2000)
+    for item in queryset.iterator(chunk_size=chunk_size):
+        # Accede a los campos relacionados de forma segura
+        yield [
+            item.id,
+            item.producto.nombre if item.producto else '',
+            item.producto.sku if item.producto else '',
+            item.ubicacion.nombre if item.ubicacion else '',
+            item.cantidad,
+            item.empresa.nombre if item.empresa else '',
+            _fecha(item.fecha_creacion),
+            _fecha(item.fecha_actualizacion),
+        ]
+
+
+def excel_en_archivo(titulo, encabezados, filas):
+    """
+    Escribe el libro en modo write_only (openpyxl vuelca cada fila a disco en
+    vez de mantener las celdas en memoria) sobre un archivo temporal que solo
+    vive en memoria mientras es pequeño. Devuelve el archivo rebobinado, listo
+    para enviarlo con respuesta_archivo (que lo cierra y lo borra al terminar).
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=titulo)
+    sheet.append(encabezados)
+    for fila in filas:
+        sheet.append(fila)
+
+    archivo = tempfile.SpooledTemporaryFile(
+        max_size=getattr(settings, 'EXPORTAR_SPOOL_MAX_BYTES', 8 * 1024 * 1024)
+    )
+    workbook.save(archivo)
+    archivo.seek(0)
+    return archivo
+
+
+def _leer_por_bloques(archivo, tamano_bloque=FileResponse.block_size):
+    try:
+        while True:
+            bloque = archivo.read(tamano_bloque)
+            if not bloque:
+                return
+            yield bloque
+    finally:
+        archivo.close() # Un archivo temporal se borra al cerrarse
+
+
+def respuesta_archivo(request, archivo, nombre, content_type):
+    """
+    Descarga de un archivo ya escrito y rebobinado (ver excel_en_archivo). Bajo
+    WSGI, FileResponse; bajo ASGI Django leería el archivo entero antes de
+    enviarlo, así que se lee por bloques con un iterador asíncrono.
+    """
+    if not isinstance(getattr(request, '_request', request), ASGIRequest):
+        return FileResponse(archivo, as_attachment=True, filename=nombre, content_type=content_type)
+    archivo.seek(0, os.SEEK_END)
+    tamano = archivo.tell()
+    archivo.seek(0)
+    response = StreamingHttpResponse(_iterar_async(_leer_por_bloques(archivo)), content_type=content_type)
+    response['Content-Length'] = str(tamano)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+# --- CSV / CSV comprimido en streaming (para cargas de BI) ---
+class CSVRenderer(BaseRenderer):
+    """
+    Permite ?format=csv en DRF (sin un renderer con ese formato la negociación
+    responde 404). El contenido lo genera la vista en streaming; este renderer
+    solo se usa para errores (403, 400...), que se devuelven como JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+
+
+class CSVGzipRenderer(CSVRenderer):
+    media_type = 'application/gzip'
+    format = 'csv.gz'
+
+
+class _Eco:
+    """'Archivo' para csv.writer: devuelve la línea en vez de guardarla."""
+    def write(self, valor):
+        return valor
+
+
+def lineas_csv(encabezados, filas):
+    """Genera el CSV línea a línea (bytes UTF-8) sin acumularlo."""
+    writer = csv.writer(_Eco())
+    yield writer.writerow(encabezados).encode('utf-8')
+    for fila in filas:
+        yield writer.writerow(fila).encode('utf-8')
+
+
+def _en_bloques(lineas, tam=64 * 1024):
+    # Junta líneas en bloques de ~64 KB: menos escrituras al socket que una por fila
+    bloque, largo = [], 0
+    for linea in lineas:
+        bloque.append(linea)
+        largo += len(linea)
+        if largo >= tam:
+            yield b''.join(bloque)
+            bloque, largo = [], 0
+    if bloque:
+        yield b''.join(bloque)
+
+
+def _gzip(bloques):
+    # wbits=31: formato gzip (cabecera + CRC), comprimido al vuelo
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        comprimido = compresor.compress(bloque)
+        if comprimido:
+            yield comprimido
+    yield compresor.flush()
+
+
+async def _iterar_async(iterador):
+    """
+    Bajo ASGI Django consume los iteradores síncronos enteros (sync_to_async(list))
+    antes de enviar nada. Se pide cada bloque por separado en el hilo de la
+    petición (thread_sensitive: la misma conexión y cursor de la BD).
+    """
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    while True:
+        bloque = await siguiente(iterador, None)
+        if bloque is None:
+            return
+        yield bloque
+
+
+def bloques_para_respuesta(request, bloques):
+    """
+    Iterable de bloques listo para StreamingHttpResponse: bajo ASGI se envuelve
+    con _iterar_async para que se envíe por partes. Acepta el Request de DRF
+    (no hereda de HttpRequest: se mira el de Django que envuelve) o el de Django.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        return _iterar_async(iter(bloques))
+    return bloques
+
+
+def respuesta_csv(request, formato, nombre, encabezados, filas):
+    """
+    StreamingHttpResponse con el CSV (o CSV.gz) de 'filas': el primer bloque
+    sale en cuanto llegan las primeras filas de la BD y la memoria no depende
+    del número de filas. 'filas' debe leer la BD por bloques (iterator).
+    """
+    bloques = _en_bloques(lineas_csv(encabezados, filas))
+    if formato == 'csv.gz':
+        bloques, content_type, nombre = _gzip(bloques), 'application/gzip', f'{nombre}.csv.gz'
+    else:
+        content_type, nombre = 'text/csv; charset=utf-8', f'{nombre}.csv'
+    response = StreamingHttpResponse(bloques_para_respuesta(request, bloques), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    return response
+
+
+ENCABEZADOS_INVENTARIO_CSV = [
+    'id', 'producto_id', 'producto', 'sku', 'ubicacion_id', 'ubicacion', 'empresa_id', 'empresa',
+    'cantidad', 'fecha_creacion', 'fecha_actualizacion',
+]
+
+
+def filas_inventario_csv(queryset):
+    # values_list: tuplas planas, sin instanciar modelos (millones de filas en memoria constante)
+    return _filas_values(queryset, [
+        'id', 'producto_id', 'producto__nombre', 'producto__sku', 'ubicacion_id', 'ubicacion__nombre',
+        'empresa_id', 'empresa__nombre', 'cantidad', 'fecha_creacion', 'fecha_actualizacion',
+    ])
+
+
+ENCABEZADOS_HISTORIAL_CSV = [
+    'id', 'timestamp', 'tipo_movimiento', 'inventario_id', 'producto_id', 'producto', 'ubicacion_id', 'ubicacion',
+    'empresa_id', 'empresa', 'cantidad_anterior', 'cantidad_nueva', 'cantidad_cambio', 'usuario_id', 'usuario', 'motivo',
+]
+
+
+def filas_historial_csv(queryset):
+    return _filas_values(queryset, [
+        'id', 'timestamp', 'tipo_movimiento', 'inventario_id', 'producto_id', 'producto__nombre', 'ubicacion_id',
+        'ubicacion__nombre', 'empresa_id', 'empresa__nombre', 'cantidad_anterior', 'cantidad_nueva',
+        'cantidad_cambio', 'usuario_id', 'usuario__cedula', 'motivo',
+    ])
+
+
+def _filas_values(queryset, campos):
+    chunk_size = getattr(settings, 'EXPORTAR_CHUNK_SIZE', 2000)
+    for fila in queryset.values_list(*campos).iterator(chunk_size=chunk_size):
+        # Fechas en ISO 8601 (con zona), vacíos en vez de None
+        yield ['' if valor is None else (valor.isoformat() if hasattr(valor, 'isoformat') else valor) for valor in fila]
@@ -0,0 +1,138 @@
+# backend/proyecto/apps/bodegaje/historico.py
+from collections import namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from apps.usuarios.models import Empresa
+
+from .models import Inventario, MovimientoInventario, SnapshotInventario, SnapshotInventarioLinea
+
+# De dónde salió el cálculo: snapshot (o inventario actual si no hay uno más cercano)
+OrigenSaldo = namedtuple('OrigenSaldo', ['tipo', 'snapshot_id', 'corte', 'lineas_ajustadas'])
+
+
+# --- Toma y purga de snapshots (comando snapshot_inventario) ---
+def tomar_snapshot(empresa, corte=None):
+    """
+    Copia el inventario actual de la empresa (solo cantidades > 0) en un
+    SnapshotInventario con una línea por (producto, ubicación).
+    """
+    corte = corte or timezone.now()
+    lote = getattr(settings, 'EXPORTAR_CHUNK_SIZE', 2000)
+    filas = (
+        Inventario.objects.filter(empresa=empresa, cantidad__gt=0)
+        .values_list('producto_id', 'ubicacion_id', 'cantidad')
+        .iterator(chunk_size=lote)
+    )
+    with transaction.atomic():
+        snapshot = SnapshotInventario.objects.create(empresa=empresa, corte=corte)
+        pendientes = []
+        for producto_id, ubicacion_id, cantidad in filas:
+            pendientes.append(SnapshotInventarioLinea(
+                snapshot=snapshot, producto_id=producto_id, ubicacion_id=ubicacion_id, cantidad=cantidad,
+            ))
+            if len(pendientes) >= lote:
+                SnapshotInventarioLinea.objects.bulk_create(pendientes)
+                pendientes = []
+        SnapshotInventarioLinea.objects.bulk_create(pendientes)
+    return snapshot
+
+
+def purgar_snapshots(dias):
+    """
+    Borra los snapshots con más de 'dias' de antigüedad salvo el último de cada
+    mes por empresa (el cierre de mes se conserva). Devuelve cuántos borró.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    cierres = {} # (empresa_id, año, mes) -> id del snapshot más reciente de ese mes
+    antiguos = SnapshotInventario.objects.filter(corte__lt=limite).order_by('corte').values_list('id', 'empresa_id', 'corte')
+    for snapshot_id, empresa_id, corte in antiguos:
+        local = timezone.localtime(corte)
+        cierres[(empresa_id, local.year, local.month)] = snapshot_id
+    borrados, _ = (
+        SnapshotInventario.objects.filter(corte__lt=limite)
+        .exclude(pk__in=cierres.values())
+        .delete()
+    )
+    return borrados
+
+
+# --- Stock a una fecha ---
+def _saldos_snapshot(snapshot, producto_id=None, ubicacion_id=None):
+    lineas = SnapshotInventarioLinea.objects.filter(snapshot=snapshot)
+    if producto_id:
+        lineas = lineas.filter(producto_id=producto_id)
+    if ubicacion_id:
+        lineas = lineas.filter(ubicacion_id=ubicacion_id)
+    return {(p, u): c for p, u, c in lineas.values_list('producto_id', 'ubicacion_id', 'cantidad')}
+
+
+def _saldos_actuales(empresa_id, producto_id=None, ubicacion_id=None):
+    filas = Inventario.objects.filter(empresa_id=empresa_id, cantidad__gt=0)
+    if producto_id:
+        filas = filas.filter(producto_id=producto_id)
+    if ubicacion_id:
+        filas = filas.filter(ubicacion_id=ubicacion_id)
+    return {(p, u): c for p, u, c in filas.values_list('producto_id', 'ubicacion_id', 'cantidad')}
+
+
+def _cambios(empresa_id, desde, hasta, producto_id=None, ubicacion_id=None):
+    """
+    Suma de cantidad_cambio por (producto, ubicación) con timestamp en (desde, hasta].
+    Un solo GROUP BY sobre el índice (empresa, -timestamp): solo se leen los
+    movimientos del intervalo, no toda la historia.
+    """
+    movimientos = MovimientoInventario.objects.filter(
+        empresa_id=empresa_id, timestamp__gt=desde, timestamp__lte=hasta,
+        producto__isnull=False, ubicacion__isnull=False,
+    ).exclude(cantidad_cambio=0)
+    if producto_id:
+        movimientos = movimientos.filter(producto_id=producto_id)
+    if ubicacion_id:
+        movimientos = movimientos.filter(ubicacion_id=ubicacion_id)
+    return {
+        (fila['producto_id'], fila['ubicacion_id']): fila['cambio']
+        for fila in movimientos.order_by().values('producto_id', 'ubicacion_id').annotate(cambio=Sum('cantidad_cambio'))
+    }
+
+
+def stock_al_corte(empresa_id, fecha, producto_id=None, ubicacion_id=None):
+    """
+    Stock de la empresa en 'fecha' como {(producto_id, ubicacion_id): cantidad}
+    (sin ceros) y el OrigenSaldo usado.
+    Parte del snapshot más cercano a la fecha: si es anterior se le suman los
+    movimientos (corte, fecha]; si es posterior, o no hay ninguno y se parte del
+    inventario actual, se le restan los movimientos (fecha, corte].
+    """
+    snapshots = SnapshotInventario.objects.filter(empresa_id=empresa_id)
+    anterior = snapshots.filter(corte__lte=fecha).order_by('-corte').first()
+    posterior = snapshots.filter(corte__gt=fecha).order_by('corte').first()
+    ahora = timezone.now()
+
+    # El inventario actual es la "foto" más reciente posible
+    corte_posterior = posterior.corte if posterior else max(ahora, fecha)
+    if anterior and (fecha - anterior.corte) <= (corte_posterior - fecha):
+        saldos = _saldos_snapshot(anterior, producto_id, ubicacion_id)
+        cambios = _cambios(empresa_id, anterior.corte, fecha, producto_id, ubicacion_id)
+        signo, origen = 1, OrigenSaldo('snapshot', anterior.pk, anterior.corte, len(cambios))
+    elif posterior:
+        saldos = _saldos_snapshot(posterior, producto_id, ubicacion_id)
+        cambios = _cambios(empresa_id, fecha, posterior.corte, producto_id, ubicacion_id)
+        signo, origen = -1, OrigenSaldo('snapshot', posterior.pk, posterior.corte, len(cambios))
+    else:
+        saldos = _saldos_actuales(empresa_id, producto_id, ubicacion_id)
+        cambios = _cambios(empresa_id, fecha, ahora, producto_id, ubicacion_id) if fecha < ahora else {}
+        signo, origen = -1, OrigenSaldo('inventario', None, ahora, len(cambios))
+
+    for clave, cambio in cambios.items():
+        saldos[clave] = saldos.get(clave, 0) + signo * cambio
+    return {clave: cantidad for clave, cantidad in saldos.items() if cantidad}, origen
+
+
+def empresas_con_inventario():
+    """Empresas a las que el comando toma snapshot por defecto."""
+    return Empresa.objects.filter(pk__in=Inventario.objects.values('empresa_id').distinct())
@@ -0,0 +1,97 @@
+# backend/proyecto/apps/bodegaje/management/commands/benchmark_ajustes.py
+
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from apps.bodegaje.models import Inventario, MovimientoInventario, Producto, Ubicacion
+from apps.bodegaje.stock import ajustar_stock
+from apps.usuarios.models import Empresa
+
+
+def _ajuste_con_bloqueo(producto, ubicacion, empresa, cambio, motivo):
+    """El camino anterior de entrada/salida: bloquear, leer, modificar en Python y guardar."""
+    with transaction.atomic():
+        inventario = Inventario.objects.select_for_update().get(producto=producto, ubicacion=ubicacion, empresa=empresa)
+        anterior = inventario.cantidad
+        inventario.cantidad += cambio
+        inventario.save()
+        MovimientoInventario.objects.create(
+            inventario=inventario, producto=producto, ubicacion=ubicacion, empresa=empresa,
+            tipo_movimiento='AJUSTE_POS' if cambio > 0 else 'AJUSTE_NEG',
+            cantidad_anterior=anterior, cantidad_nueva=inventario.cantidad, cantidad_cambio=cambio,
+            motivo=motivo,
+        )
+
+
+def _ajuste_atomico(producto, ubicacion, empresa, cambio, motivo):
+    ajustar_stock(producto, ubicacion, empresa, cambio, motivo=motivo)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento de entradas/salidas concurrentes sobre UNA fila de inventario '
+        '(SKU caliente): camino con select_for_update contra UPDATE atómico con RETURNING. '
+        'Crea datos temporales y los borra al terminar. Usar contra PostgreSQL: SQLite '
+        'serializa todas las escrituras y no mide contención de filas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Peticiones concurrentes (default: 8).')
+        parser.add_argument('--operaciones', type=int, default=200, help='Ajustes por hilo (default: 200).')
+        parser.add_argument('--empresa', type=int, help='ID de la empresa a usar (default: la primera).')
+
+    def handle(self, *args, **options):
+        hilos = max(1, options['hilos'])
+        operaciones = max(1, options['operaciones'])
+        empresa = (
+            Empresa.objects.get(pk=options['empresa']) if options['empresa'] else Empresa.objects.order_by('pk').first()
+        )
+        if empresa is None:
+            self.stderr.write(self.style.ERROR("No hay ninguna empresa para el benchmark."))
+            return
+
+        marca = f"benchmark_ajustes {uuid.uuid4().hex[:8]}"
+        producto = Producto.objects.create(nombre=marca, sku=marca)
+        ubicacion = Ubicacion.objects.create(nombre=marca)
+        Inventario.objects.create(producto=producto, ubicacion=ubicacion, empresa=empresa, cantidad=hilos * operaciones)
+
+        self.stdout.write(f"{hilos} hilos x {operaciones} ajustes sobre una fila ({connection.vendor})")
+        try:
+            for nombre, ajuste in (('select_for_update', _ajuste_con_bloqueo), ('UPDATE atómico', _ajuste_atomico)):
+                total, errores, segundos = self._medir(ajuste, producto, ubicacion, empresa, hilos, operaciones, marca)
+                self.stdout.write(
+                    f"  {nombre:<18} {total / segundos:8.1f} ajustes/s  ({total} en {segundos:.2f}s, {errores} errores)"
+                )
+            final = Inventario.objects.get(producto=producto, ubicacion=ubicacion, empresa=empresa).cantidad
+            esperado = hilos * operaciones
+            estilo = self.style.SUCCESS if final == esperado else self.style.ERROR
+            self.stdout.write(estilo(f"Cantidad final {final} (esperada {esperado})"))
+        finally:
+            producto.delete() # Borra también su inventario
+            ubicacion.delete()
+            # Los registros de historial (ajustes y los de las señales) llevan la marca en el motivo
+            MovimientoInventario.objects.filter(motivo__contains=marca).delete()
+
+    def _medir(self, ajuste, producto, ubicacion, empresa, hilos, operaciones, marca):
+        def trabajador(_):
+            errores = 0
+            try:
+                for i in range(operaciones):
+                    # Alterna salida/entrada: la cantidad final debe ser la inicial
+                    try:
+                        ajuste(producto, ubicacion, empresa, -1 if i % 2 == 0 else 1, marca)
+                    except Exception:
+                        errores += 1
+            finally:
+                connection.close() # Cada hilo usa su propia conexión
+            return errores
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            errores = sum(pool.map(trabajador, range(hilos)))
+        segundos = time.perf_counter() - inicio
+        return hilos * operaciones - errores, errores, segundos
@@ -0,0 +1,25 @@
+# backend/proyecto/apps/bodegaje/management/commands/liberar_reservas_vencidas.py
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.bodegaje.models import ReservaStock
+from apps.bodegaje.stock import liberar_reservas_vencidas
+
+
+class Command(BaseCommand):
+    help = (
+        'Marca como liberadas las reservas de stock vencidas. Ya no contaban como '
+        'reservado; esto solo deja el registro al día (programar con cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta las reservas vencidas.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            total = ReservaStock.objects.filter(estado='ACTIVA', vence_en__lte=timezone.now()).count()
+            self.stdout.write(f"Reservas vencidas pendientes de liberar: {total}")
+            return
+        liberadas = liberar_reservas_vencidas()
+        self.stdout.write(self.style.SUCCESS(f"Reservas liberadas: {liberadas}"))
@@ -0,0 +1,33 @@
+# backend/proyecto/apps/bodegaje/management/commands/snapshot_inventario.py
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.bodegaje.historico import empresas_con_inventario, purgar_snapshots, tomar_snapshot
+from apps.usuarios.models import Empresa
+
+
+class Command(BaseCommand):
+    help = (
+        'Toma un snapshot del inventario de cada empresa (programar con cron, p. ej. '
+        'cada noche). Con --purgar-dias borra los snapshots antiguos conservando el '
+        'cierre de cada mes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, action='append', help='ID de empresa (repetible; default: todas con inventario).')
+        parser.add_argument('--purgar-dias', type=int, help='Borra los snapshots con más de N días salvo el último de cada mes.')
+
+    def handle(self, *args, **options):
+        empresas = (
+            Empresa.objects.filter(pk__in=options['empresa']) if options['empresa'] else empresas_con_inventario()
+        )
+        corte = timezone.now() # Mismo corte para todas las empresas
+        for empresa in empresas:
+            snapshot = tomar_snapshot(empresa, corte)
+            self.stdout.write(f"Snapshot {snapshot.pk} de '{empresa.nombre}': {snapshot.lineas.count()} líneas")
+
+        if options['purgar_dias'] is not None:
+            borrados = purgar_snapshots(options['purgar_dias'])
+            self.stdout.write(f"Registros de snapshots antiguos borrados: {borrados}")
+        self.stdout.write(self.style.SUCCESS("Snapshots de inventario al día."))
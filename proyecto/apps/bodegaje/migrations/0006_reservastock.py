@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodegaje', '0005_alter_movimientoinventario_options_and_more'),
+        ('transporte', '0015_asignacionitempedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservaStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad Reservada')),
+                ('estado', models.CharField(choices=[('ACTIVA', 'Activa'), ('CONSUMIDA', 'Consumida (retirada)'), ('LIBERADA', 'Liberada')], default='ACTIVA', max_length=10)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('vence_en', models.DateTimeField(verbose_name='Vence')),
+                ('fecha_cierre', models.DateTimeField(blank=True, null=True, verbose_name='Fecha Consumo/Liberación')),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas', to='bodegaje.inventario')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservas_stock', to='transporte.pedidotransporte', verbose_name='Pedido')),
+            ],
+            options={
+                'verbose_name': 'Reserva de Stock',
+                'verbose_name_plural': 'Reservas de Stock',
+                'indexes': [models.Index(condition=models.Q(('estado', 'ACTIVA')), fields=['inventario', 'vence_en'], name='reserva_activa_inv_idx'), models.Index(fields=['pedido', 'estado'], name='reserva_pedido_estado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodegaje', '0006_reservastock'),
+        ('usuarios', '0008_create_initial_roles'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['-timestamp', 'id'], name='mov_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['empresa', '-timestamp', 'id'], name='mov_empresa_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['producto', '-timestamp', 'id'], name='mov_producto_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimientoinventario',
+            index=models.Index(fields=['ubicacion', '-timestamp', 'id'], name='mov_ubicacion_ts_idx'),
+        ),
+    ]
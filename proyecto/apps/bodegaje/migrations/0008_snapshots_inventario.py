@@ -0,0 +1,46 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodegaje', '0007_indices_historial'),
+        ('usuarios', '0008_create_initial_roles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('corte', models.DateTimeField(verbose_name='Fecha de Corte')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('empresa', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots_inventario', to='usuarios.empresa')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Inventario',
+                'verbose_name_plural': 'Snapshots de Inventario',
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotInventarioLinea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField()),
+                ('producto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bodegaje.producto')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lineas', to='bodegaje.snapshotinventario')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bodegaje.ubicacion')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotinventario',
+            constraint=models.UniqueConstraint(fields=('empresa', 'corte'), name='snapshot_empresa_corte_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='snapshotinventariolinea',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'producto', 'ubicacion'), name='snapshot_linea_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodegaje', '0008_snapshots_inventario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservastock',
+            name='inventario',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='reservas', to='bodegaje.inventario'),
+        ),
+    ]
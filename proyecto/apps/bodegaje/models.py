@@ -4,17 +4,45 @@ from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 
+
+class CatalogoQuerySet(models.QuerySet):
+    """
+    bulk_create/bulk_update no disparan post_save: el historial se registra aquí,
+    en un solo lote (ver auditoria.py), para que las cargas masivas del
+    catálogo queden auditadas igual que los guardados uno a uno.
+    """
+    def bulk_create(self, objs, *args, **kwargs):
+        from .auditoria import registrar_catalogo # Import diferido: auditoria importa estos modelos
+        objs = super().bulk_create(objs, *args, **kwargs)
+        # Con ignore_conflicts no se sabe cuáles se insertaron (las omitidas no son "creadas")
+        if not kwargs.get('ignore_conflicts'):
+            registrar_catalogo(self.model, [obj for obj in objs if obj.pk is not None], creados=True)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        from .auditoria import registrar_catalogo
+        objs = list(objs)
+        filas = super().bulk_update(objs, fields, *args, **kwargs)
+        registrar_catalogo(self.model, objs, creados=False, campos=fields)
+        return filas
+
+
 class Producto(models.Model):
     nombre = models.CharField(max_length=255)
     descripcion = models.TextField(blank=True)
     sku = models.CharField(max_length=50, unique=True) #  SKU (Stock Keeping Unit) - Identificador único del producto
 
+    objects = CatalogoQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
     
 class Ubicacion(models.Model):
     nombre = models.CharField(max_length=100)
     descripcion = models.TextField(blank=True)
+
+    objects = CatalogoQuerySet.as_manager()
+
     def __str__(self):
         return self.nombre
 
@@ -93,6 +121,13 @@ class MovimientoInventario(models.Model):
         verbose_name = _("Movimiento/Log") # Nombre más general
         verbose_name_plural = _("Historial General Bodegaje")
         ordering = ['-timestamp']
+        indexes = [
+            # Mismo orden que la paginación por cursor del historial (-timestamp, id)
+            models.Index(fields=['-timestamp', 'id'], name='mov_ts_id_idx'),
+            models.Index(fields=['empresa', '-timestamp', 'id'], name='mov_empresa_ts_idx'),
+            models.Index(fields=['producto', '-timestamp', 'id'], name='mov_producto_ts_idx'),
+            models.Index(fields=['ubicacion', '-timestamp', 'id'], name='mov_ubicacion_ts_idx'),
+        ]
 
     def __str__(self):
         # String más informativo para diferentes tipos
@@ -107,4 +142,77 @@ class MovimientoInventario(models.Model):
              emp_info = f"Emp ID {self.empresa_id}" if self.empresa_id else "Global"
              return f"{self.get_tipo_movimiento_display()} - Prod ID {self.producto_id} - Ubi ID {self.ubicacion_id} - {emp_info} ({self.timestamp.strftime('%Y-%m-%d %H:%M')})"
 
-# --- FIN NUEVO MODELO ---
\ No newline at end of file
+# --- FIN NUEVO MODELO ---
+
+# --- Reservas de stock para retiros programados (BODEGAJE_SALIDA) ---
+class ReservaStock(models.Model):
+    """
+    Unidades de un registro de inventario prometidas a un pedido: se crean al
+    hacer el pedido, se consumen (descuentan) cuando el conductor inicia el
+    viaje y se liberan al cancelar o al vencer.
+    """
+    ESTADO_CHOICES = (
+        ('ACTIVA', 'Activa'),
+        ('CONSUMIDA', 'Consumida (retirada)'),
+        ('LIBERADA', 'Liberada'),
+    )
+
+    # PROTECT: borrar la fila no puede hacer desaparecer una reserva (el pedido retiraría sin descontar)
+    inventario = models.ForeignKey(Inventario, on_delete=models.PROTECT, related_name='reservas')
+    pedido = models.ForeignKey(
+        'transporte.PedidoTransporte',
+        on_delete=models.CASCADE, # Borrar el pedido libera (borra) sus reservas
+        related_name='reservas_stock',
+        verbose_name=_("Pedido")
+    )
+    cantidad = models.PositiveIntegerField(verbose_name=_("Cantidad Reservada"))
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='ACTIVA')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    vence_en = models.DateTimeField(verbose_name=_("Vence"))
+    fecha_cierre = models.DateTimeField(null=True, blank=True, verbose_name=_("Fecha Consumo/Liberación"))
+
+    class Meta:
+        verbose_name = _("Reserva de Stock")
+        verbose_name_plural = _("Reservas de Stock")
+        indexes = [
+            # Solo las reservas activas: el total reservado por inventario se suma sobre este índice
+            models.Index(fields=['inventario', 'vence_en'], condition=models.Q(estado='ACTIVA'), name='reserva_activa_inv_idx'),
+            models.Index(fields=['pedido', 'estado'], name='reserva_pedido_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f'Reserva {self.cantidad} de Inventario {self.inventario_id} para Pedido {self.pedido_id} [{self.estado}]'
+
+
+class SnapshotInventario(models.Model):
+    """
+    Foto del inventario de una empresa en un instante ('corte'), p. ej. cada
+    noche o al cierre de mes. El stock a una fecha pasada se calcula desde el
+    snapshot más cercano aplicando solo los movimientos posteriores (ver historico.py).
+    """
+    empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE, related_name='snapshots_inventario')
+    corte = models.DateTimeField(verbose_name=_("Fecha de Corte"))
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Snapshot de Inventario")
+        verbose_name_plural = _("Snapshots de Inventario")
+        constraints = [
+            models.UniqueConstraint(fields=['empresa', 'corte'], name='snapshot_empresa_corte_uniq'),
+        ]
+
+    def __str__(self):
+        return f'Snapshot {self.empresa_id} @ {self.corte:%Y-%m-%d %H:%M}'
+
+
+class SnapshotInventarioLinea(models.Model):
+    """Cantidad de un (producto, ubicación) en el corte; solo se guardan las distintas de cero."""
+    snapshot = models.ForeignKey(SnapshotInventario, on_delete=models.CASCADE, related_name='lineas')
+    producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE)
+    cantidad = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'producto', 'ubicacion'], name='snapshot_linea_uniq'),
+        ]
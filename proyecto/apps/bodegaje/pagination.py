@@ -0,0 +1,9 @@
+# backend/proyecto/apps/bodegaje/pagination.py
+from apps.transporte.pagination import KeysetPagination
+
+
+class HistorialInventarioPagination(KeysetPagination):
+    """Historial de bodegaje: más recientes primero (-timestamp, id)."""
+    campo_orden = 'timestamp'
+    ajuste_page_size = 'HISTORIAL_PAGE_SIZE'
+    ajuste_max_page_size = 'HISTORIAL_MAX_PAGE_SIZE'
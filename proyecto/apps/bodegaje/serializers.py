@@ -1,5 +1,7 @@
+from django.conf import settings
 from rest_framework import serializers
 from .models import Producto, Inventario, Ubicacion, Empresa, MovimientoInventario
+from .stock import unidades_reservadas
 from ..usuarios.serializers import EmpresaSimpleSerializer
 
 
@@ -21,6 +23,28 @@ class SalidaInventarioSerializer(serializers.Serializer):
     motivo = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
 
 
+# --- Movimientos masivos: N entradas/salidas en una petición ---
+class LineaMovimientoSerializer(serializers.Serializer):
+    # Ids planos: las FKs se resuelven juntas (una consulta IN por modelo) en stock.resolver_movimientos
+    tipo = serializers.ChoiceField(choices=(('entrada', 'Entrada'), ('salida', 'Salida')))
+    producto_id = serializers.IntegerField(min_value=1)
+    ubicacion_id = serializers.IntegerField(min_value=1)
+    empresa_id = serializers.IntegerField(min_value=1)
+    cantidad = serializers.IntegerField(min_value=1)
+    motivo = serializers.CharField(max_length=255, required=False, allow_blank=True, allow_null=True)
+
+class MovimientosLoteSerializer(serializers.Serializer):
+    movimientos = LineaMovimientoSerializer(many=True, allow_empty=False)
+    # False: todo o nada. True: se aplican las líneas válidas y se informan las demás
+    parcial = serializers.BooleanField(required=False, default=False)
+
+    def validate_movimientos(self, value):
+        maximo = getattr(settings, 'MOVIMIENTOS_LOTE_MAX_LINEAS', 1000)
+        if len(value) > maximo:
+            raise serializers.ValidationError(f"Máximo {maximo} líneas por petición.")
+        return value
+
+
 # --- Serializer de Producto (Asegúrate que esté definido) ---
 class ProductoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -43,22 +67,38 @@ class InventarioSerializer(serializers.ModelSerializer):
     ubicacion_id = serializers.PrimaryKeyRelatedField(queryset=Ubicacion.objects.all(), source='ubicacion', write_only=True, label="Ubicación (ID para Escritura)")
     empresa_id = serializers.PrimaryKeyRelatedField(queryset=Empresa.objects.all(), source='empresa', write_only=True, required=True, allow_null=False, label="Empresa Cliente (ID para Escritura)")
     fecha_creacion = serializers.DateTimeField(read_only=True, format="%Y-%m-%dT%H:%M:%S.%fZ") # <-- AÑADIDO (formato ISO 8601 es estándar)
+    # Unidades prometidas a pedidos y lo que queda libre (anotados por anotar_disponible)
+    reservado = serializers.SerializerMethodField()
+    disponible = serializers.SerializerMethodField()
     
     class Meta: 
         model = Inventario
         fields = [
             'id',
             'producto_nombre', 'producto_id_read', 'ubicacion_nombre', # <<< ¡COMENTADO!
-            'empresa', 'cantidad', #'fecha_actualizacion',
+            'empresa', 'cantidad', 'reservado', 'disponible', #'fecha_actualizacion',
             'fecha_creacion',
             'producto_id', 'ubicacion_id', 'empresa_id',
         ]
         read_only_fields = ('fecha_actualizacion',)
 
+    def get_reservado(self, obj):
+        if not hasattr(obj, 'reservado'):
+            # Instancia suelta (respuesta de entrada/salida): una consulta solo para ella
+            obj.reservado = unidades_reservadas([obj]).get(obj.pk, 0) if obj.pk else 0
+        return obj.reservado
+
+    def get_disponible(self, obj):
+        return obj.cantidad - self.get_reservado(obj)
+
     # Opcional: Añadir validaciones extra si es necesario
     def validate_cantidad(self, value):
          if value < 0:
              raise serializers.ValidationError("La cantidad no puede ser negativa.")
+         if self.instance is not None:
+             reservado = unidades_reservadas([self.instance]).get(self.instance.pk, 0)
+             if value < reservado:
+                 raise serializers.ValidationError(f"Hay {reservado} unidades reservadas para pedidos; la cantidad no puede ser menor.")
          return value
 
     def validate(self, data):
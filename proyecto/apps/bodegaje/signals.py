@@ -1,8 +1,9 @@
 # backend/proyecto/apps/bodegaje/signals.py
 from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from .models import Producto, Ubicacion, MovimientoInventario
+from .models import Producto, Ubicacion
 from .middleware import get_current_user # Importa la función helper
+from .auditoria import registrar # Se escribe al confirmar, en lote con el resto de la petición
 
 # --- Señales para Producto ---
 
@@ -18,7 +19,7 @@ def log_producto_guardado(sender, instance, created, **kwargs):
     #    # Necesitarías comparar con el estado pre_save o implementar lógica de rastreo
     #    motivo += " [Campos modificados: ...]" # Placeholder
 
-    MovimientoInventario.objects.create(
+    registrar(
         producto=instance,
         tipo_movimiento=tipo,
         motivo=motivo,
@@ -38,7 +39,7 @@ def log_producto_eliminado(sender, instance, **kwargs):
     current_user = get_current_user()
     motivo = f"Producto ID {instance.id} ('{instance.nombre}', SKU: {instance.sku}) eliminado."
 
-    MovimientoInventario.objects.create(
+    registrar(
         # Guarda el ID y nombre en el motivo, ya que la FK será NULL pronto
         producto=None, # Ya no existe para FK
         tipo_movimiento='PROD_ELIMINADO',
@@ -63,7 +64,7 @@ def log_ubicacion_guardada(sender, instance, created, **kwargs):
 
     # Opcional: Detallar campos modificados
 
-    MovimientoInventario.objects.create(
+    registrar(
         ubicacion=instance,
         tipo_movimiento=tipo,
         motivo=motivo,
@@ -82,7 +83,7 @@ def log_ubicacion_eliminada(sender, instance, **kwargs):
     current_user = get_current_user()
     motivo = f"Ubicación ID {instance.id} ('{instance.nombre}') eliminada."
 
-    MovimientoInventario.objects.create(
+    registrar(
         ubicacion=None, # Ya no existe
         tipo_movimiento='UBI_ELIMINADA',
         motivo=motivo,
@@ -0,0 +1,641 @@
+# backend/proyecto/apps/bodegaje/stock.py
+import operator
+import sqlite3
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, Exists, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.usuarios.models import Empresa
+
+from .models import Inventario, MovimientoInventario, Producto, ReservaStock, Ubicacion
+
+
+class StockInsuficienteError(Exception):
+    """No hay stock para una o más líneas; 'errores' trae un mensaje por línea."""
+    def __init__(self, errores):
+        super().__init__('; '.join(errores))
+        self.errores = errores
+
+
+# Una línea de retiro; ubicacion_id fija la ubicación (estrategia 'ubicacion') solo para esa línea
+LineaRetiro = namedtuple('LineaRetiro', ['producto', 'cantidad', 'ubicacion_id'], defaults=[None])
+
+
+# --- Estrategias de asignación por ubicación ---
+# Cada una recibe las filas de inventario de UN producto y la cantidad pedida, y
+# devuelve [(fila, cantidad_a_tomar), ...] o None si no alcanza.
+def _tomar_en_orden(filas, cantidad):
+    plan, pendiente = [], cantidad
+    for fila in filas:
+        if not pendiente:
+            break
+        tomar = min(fila.cantidad, pendiente)
+        if tomar > 0:
+            plan.append((fila, tomar))
+            pendiente -= tomar
+    return plan if not pendiente else None
+
+
+def _menos_recogidas(filas, cantidad, ubicacion_id=None):
+    """Si una ubicación alcanza, solo esa (la más ajustada); si no, las más llenas primero."""
+    suficientes = [f for f in filas if f.cantidad >= cantidad]
+    if suficientes:
+        return [(min(suficientes, key=lambda f: (f.cantidad, f.ubicacion_id)), cantidad)]
+    return _tomar_en_orden(sorted(filas, key=lambda f: (-f.cantidad, f.ubicacion_id)), cantidad)
+
+
+def _vaciar_menores(filas, cantidad, ubicacion_id=None):
+    """Vacía primero las ubicaciones con menos unidades (libera espacio en bodega)."""
+    return _tomar_en_orden(sorted(filas, key=lambda f: (f.cantidad, f.ubicacion_id)), cantidad)
+
+
+def _ubicacion_especifica(filas, cantidad, ubicacion_id=None):
+    """Solo de la ubicación indicada."""
+    return _tomar_en_orden([f for f in filas if f.ubicacion_id == ubicacion_id], cantidad)
+
+
+ESTRATEGIAS = OrderedDict([
+    ('menos_recogidas', _menos_recogidas),
+    ('vaciar_menores', _vaciar_menores),
+    ('ubicacion', _ubicacion_especifica),
+])
+ESTRATEGIA_CHOICES = (
+    ('menos_recogidas', 'Menos recogidas (menos ubicaciones)'),
+    ('vaciar_menores', 'Vaciar primero las ubicaciones más pequeñas'),
+    ('ubicacion', 'Ubicación específica por línea'),
+)
+
+
+def estrategia_por_defecto():
+    return getattr(settings, 'ASIGNACION_ESTRATEGIA_DEFECTO', 'menos_recogidas')
+
+
+def normalizar_lineas(lineas):
+    """
+    Acepta LineaRetiro o tuplas (producto, cantidad[, ubicacion_id]) y junta las
+    líneas repetidas (mismo producto y ubicación) sumando cantidades.
+    """
+    agrupadas = OrderedDict()
+    for linea in lineas:
+        linea = LineaRetiro(*linea)
+        clave = (linea.producto.pk, linea.ubicacion_id)
+        if clave in agrupadas:
+            linea = linea._replace(cantidad=agrupadas[clave].cantidad + linea.cantidad)
+        agrupadas[clave] = linea
+    return list(agrupadas.values())
+
+
+def planificar(lineas, filas, empresa, estrategia=None, reservado=None):
+    """
+    Reparte cada línea entre las ubicaciones con la estrategia elegida, en memoria,
+    a partir de las filas ya leídas (sin consultas). Las filas se consumen en
+    orden, así que dos líneas del mismo producto no cuentan dos veces la misma unidad.
+    'reservado' ({inventario_id: unidades}) descuenta lo ya prometido a otros pedidos.
+    Devuelve (plan, errores); plan = [(linea, fila, cantidad), ...].
+    """
+    estrategia = estrategia or estrategia_por_defecto()
+    reservado = reservado or {}
+    por_producto = {}
+    for fila in filas:
+        por_producto.setdefault(fila.producto_id, []).append(fila)
+
+    restantes = {fila.pk: max(fila.cantidad - reservado.get(fila.pk, 0), 0) for fila in filas}
+    plan, errores = [], []
+    # Primero las líneas con ubicación fija: así las otras no les quitan su stock
+    for linea in sorted(lineas, key=lambda l: l.ubicacion_id is None):
+        nombre_estrategia = 'ubicacion' if linea.ubicacion_id else estrategia
+        if nombre_estrategia == 'ubicacion' and not linea.ubicacion_id:
+            errores.append(f"Item '{linea.producto.nombre}': La estrategia 'ubicacion' requiere indicar ubicacion_id.")
+            continue
+        filas_producto = [
+            _Disponible(f, restantes[f.pk]) for f in por_producto.get(linea.producto.pk, [])
+        ]
+        if not filas_producto:
+            errores.append(f"Item '{linea.producto.nombre}': No encontrado en inventario de '{empresa.nombre}'.")
+            continue
+        asignado = ESTRATEGIAS[nombre_estrategia](filas_producto, linea.cantidad, linea.ubicacion_id)
+        if asignado is None:
+            if linea.ubicacion_id:
+                disponible = sum(f.cantidad for f in filas_producto if f.ubicacion_id == linea.ubicacion_id)
+                errores.append(f"Item '{linea.producto.nombre}': Stock insuficiente en la ubicación {linea.ubicacion_id} (Disp: {disponible}, Sol: {linea.cantidad}).")
+            else:
+                disponible = sum(f.cantidad for f in filas_producto)
+                errores.append(f"Item '{linea.producto.nombre}': Stock insuficiente (Disp: {disponible}, Sol: {linea.cantidad}).")
+            continue
+        for disponible, cantidad in asignado:
+            restantes[disponible.fila.pk] -= cantidad
+            plan.append((linea, disponible.fila, cantidad))
+    return plan, errores
+
+
+class _Disponible:
+    """Vista de una fila de inventario con lo que aún queda tras las líneas anteriores."""
+    __slots__ = ('fila', 'cantidad', 'ubicacion_id')
+
+    def __init__(self, fila, cantidad):
+        self.fila = fila
+        self.cantidad = cantidad
+        self.ubicacion_id = fila.ubicacion_id
+
+
+def _filas_inventario(empresa, lineas, bloquear=False):
+    queryset = Inventario.objects.filter(
+        empresa=empresa, producto_id__in={linea.producto.pk for linea in lineas}
+    ).only('id', 'producto_id', 'ubicacion_id', 'empresa_id', 'cantidad')
+    if bloquear:
+        queryset = queryset.select_for_update()
+    # Orden fijo: dos pedidos concurrentes bloquean las filas en el mismo orden (sin deadlocks)
+    return list(queryset.order_by('producto_id', 'ubicacion_id', 'id'))
+
+
+# --- Reservas ---
+def reservas_vigentes():
+    """Reservas que todavía cuentan: activas y sin vencer (usa el índice parcial)."""
+    return ReservaStock.objects.filter(estado='ACTIVA', vence_en__gt=timezone.now())
+
+
+def unidades_reservadas(filas, excluir_pedido_id=None):
+    """{inventario_id: unidades reservadas vigentes} para esas filas, en una consulta agregada."""
+    reservas = reservas_vigentes().filter(inventario_id__in=[fila.pk for fila in filas])
+    if excluir_pedido_id is not None:
+        reservas = reservas.exclude(pedido_id=excluir_pedido_id)
+    return dict(
+        reservas.order_by().values('inventario_id').annotate(total=Sum('cantidad')).values_list('inventario_id', 'total')
+    )
+
+
+def anotar_disponible(queryset):
+    """
+    Añade 'reservado' y 'disponible' (= cantidad - reservado) a un queryset de
+    Inventario con una subconsulta agregada por fila sobre las reservas activas;
+    no recorre pedidos.
+    """
+    reservado = reservas_vigentes().filter(inventario=OuterRef('pk')).order_by().values('inventario').annotate(
+        total=Sum('cantidad')
+    ).values('total')
+    return queryset.annotate(
+        reservado=Coalesce(Subquery(reservado, output_field=IntegerField()), 0)
+    ).annotate(disponible=F('cantidad') - F('reservado'))
+
+
+def vencimiento_reserva(pedido):
+    """Las reservas duran RESERVA_STOCK_HORAS desde la recogida programada (o desde ahora)."""
+    horas = getattr(settings, 'RESERVA_STOCK_HORAS', 48)
+    desde = timezone.now()
+    if pedido.hora_recogida_programada and pedido.hora_recogida_programada > desde:
+        desde = pedido.hora_recogida_programada
+    return desde + timedelta(hours=horas)
+
+
+def verificar_stock(empresa, lineas, estrategia=None):
+    """
+    Validación previa (sin bloquear) de todas las líneas: una consulta trae las
+    filas (producto, ubicación) de la empresa para esos productos y otra suma lo
+    ya reservado en ellas; sobre eso se simula la asignación. Devuelve los errores.
+    """
+    lineas = normalizar_lineas(lineas)
+    if not lineas:
+        return []
+    filas = _filas_inventario(empresa, lineas)
+    _, errores = planificar(lineas, filas, empresa, estrategia, unidades_reservadas(filas))
+    return errores
+
+
+def _planificar_bloqueando(empresa, lineas, estrategia):
+    filas = _filas_inventario(empresa, lineas, bloquear=True)
+    # Las reservas se leen DESPUÉS de bloquear: una consulta nueva ve lo que
+    # confirmó el pedido concurrente que tenía el bloqueo
+    plan, errores = planificar(lineas, filas, empresa, estrategia, unidades_reservadas(filas))
+    if errores:
+        raise StockInsuficienteError(errores)
+    return plan
+
+
+def reservar_stock(empresa, lineas, pedido, estrategia=None):
+    """
+    Reserva todas las líneas para el pedido, todo o nada, sin tocar la cantidad
+    física: bloquea las filas de inventario (mismo orden que descontar_stock),
+    reparte cada línea sobre lo disponible (cantidad - reservado) y crea las
+    ReservaStock con un bulk_create. Lanza StockInsuficienteError si no alcanza.
+    Devuelve el plan [(linea, inventario, cantidad_reservada), ...].
+    """
+    lineas = normalizar_lineas(lineas)
+    if not lineas:
+        return []
+
+    with transaction.atomic():
+        plan = _planificar_bloqueando(empresa, lineas, estrategia)
+        por_fila = OrderedDict()
+        for _, fila, cantidad in plan:
+            por_fila[fila] = por_fila.get(fila, 0) + cantidad
+        vence_en = vencimiento_reserva(pedido)
+        ReservaStock.objects.bulk_create([
+            ReservaStock(inventario=fila, pedido=pedido, cantidad=cantidad, vence_en=vence_en)
+            for fila, cantidad in por_fila.items()
+        ])
+    return plan
+
+
+def consumir_reservas(pedido_id, empresa=None, lineas=(), usuario=None, motivo=''):
+    """
+    Convierte en salidas reales lo que el pedido retira (al iniciar el viaje).
+    Lo cubierto por sus reservas activas se descuenta de las filas reservadas,
+    comprobando que sigue cubierto descontando lo prometido a OTROS pedidos
+    (una reserva vencida pudo haber sido ocupada). 'lineas' son las del pedido
+    (ItemPedido) y 'empresa' la del cliente: lo que las reservas ya no cubren
+    (liberadas al vencer) se descuenta como un retiro normal sobre lo disponible.
+    Todo o nada: lanza StockInsuficienteError sin cambiar nada si algo no alcanza.
+    Devuelve el número de reservas consumidas.
+    """
+    lineas = normalizar_lineas(lineas)
+    with transaction.atomic():
+        reservas = list(
+            ReservaStock.objects.filter(pedido_id=pedido_id, estado='ACTIVA').values_list('id', 'inventario_id', 'cantidad')
+        )
+        if not reservas and not lineas:
+            return 0
+        por_inventario = {}
+        for _, inventario_id, cantidad in reservas:
+            por_inventario[inventario_id] = por_inventario.get(inventario_id, 0) + cantidad
+
+        filas = list(
+            Inventario.objects.select_for_update().filter(pk__in=por_inventario)
+            .only('id', 'producto_id', 'ubicacion_id', 'empresa_id', 'cantidad')
+            .order_by('producto_id', 'ubicacion_id', 'id')
+        )
+        otras = unidades_reservadas(filas, excluir_pedido_id=pedido_id)
+        faltantes = [
+            fila for fila in filas if fila.cantidad - otras.get(fila.pk, 0) < por_inventario[fila.pk]
+        ]
+        if faltantes:
+            nombres = dict(Inventario.objects.filter(pk__in=[f.pk for f in faltantes]).values_list('pk', 'producto__nombre'))
+            raise StockInsuficienteError([
+                f"Item '{nombres[fila.pk]}': Stock insuficiente en la ubicación {fila.ubicacion_id} "
+                f"(Disp: {max(fila.cantidad - otras.get(fila.pk, 0), 0)}, Reservado: {por_inventario[fila.pk]})."
+                for fila in faltantes
+            ])
+        descuentos = OrderedDict((fila.pk, [fila, por_inventario[fila.pk]]) for fila in filas)
+
+        # Lo que el pedido retira y ya no está reservado (reserva liberada o parcial)
+        cubierto = {}
+        for fila in filas:
+            cubierto[fila.producto_id] = cubierto.get(fila.producto_id, 0) + por_inventario[fila.pk]
+        pendientes = []
+        for linea in lineas:
+            usado = min(cubierto.get(linea.producto.pk, 0), linea.cantidad)
+            cubierto[linea.producto.pk] = cubierto.get(linea.producto.pk, 0) - usado
+            if linea.cantidad > usado:
+                pendientes.append(linea._replace(cantidad=linea.cantidad - usado))
+        if pendientes:
+            if empresa is None:
+                raise StockInsuficienteError([f"Item '{linea.producto.nombre}': Sin reserva de stock." for linea in pendientes])
+            filas_retiro = _filas_inventario(empresa, pendientes, bloquear=True)
+            # No cuenta como disponible lo de otros pedidos ni lo que ya se descuenta arriba
+            reservado = unidades_reservadas(filas_retiro, excluir_pedido_id=pedido_id)
+            for inventario_id, cantidad in por_inventario.items():
+                reservado[inventario_id] = reservado.get(inventario_id, 0) + cantidad
+            plan, errores = planificar(pendientes, filas_retiro, empresa, reservado=reservado)
+            if errores:
+                raise StockInsuficienteError(errores)
+            for _, fila, cantidad in plan:
+                if fila.pk in descuentos:
+                    descuentos[fila.pk][1] += cantidad
+                else:
+                    descuentos[fila.pk] = [fila, cantidad]
+
+        aplicar_descuentos([(fila, cantidad) for fila, cantidad in descuentos.values()], usuario=usuario, motivo=motivo)
+        if reservas:
+            ReservaStock.objects.filter(pk__in=[reserva_id for reserva_id, _, _ in reservas]).update(
+                estado='CONSUMIDA', fecha_cierre=timezone.now()
+            )
+    return len(reservas)
+
+
+def liberar_reservas(pedido_id):
+    """Libera las reservas activas del pedido (cancelación) con un UPDATE. Devuelve cuántas."""
+    return ReservaStock.objects.filter(pedido_id=pedido_id, estado='ACTIVA').update(
+        estado='LIBERADA', fecha_cierre=timezone.now()
+    )
+
+
+def liberar_reservas_vencidas():
+    """Marca como liberadas las reservas activas ya vencidas (ya no contaban como reservado)."""
+    ahora = timezone.now()
+    return ReservaStock.objects.filter(estado='ACTIVA', vence_en__lte=ahora).update(
+        estado='LIBERADA', fecha_cierre=ahora
+    )
+
+
+def borrar_filas_vacias(ids):
+    """
+    Borra las filas de inventario de 'ids' que estén en 0 y que ninguna reserva
+    referencie (ReservaStock las protege: una reserva activa debe seguir
+    apuntando a su fila y las cerradas guardan el historial). Devuelve los ids borrados.
+    """
+    vacias = list(
+        Inventario.objects.filter(pk__in=ids, cantidad=0)
+        .filter(~Exists(ReservaStock.objects.filter(inventario=OuterRef('pk'))))
+        .values_list('pk', flat=True)
+    )
+    if vacias:
+        Inventario.objects.filter(pk__in=vacias).delete()
+    return set(vacias)
+
+
+def descontar_stock(empresa, lineas, usuario=None, motivo='', estrategia=None):
+    """
+    Descuenta todas las líneas como una sola operación, todo o nada:
+      1. Una consulta bloquea (SELECT ... FOR UPDATE) todas las filas de
+         inventario afectadas, siempre en el mismo orden (producto, ubicación, id)
+         para que dos retiros concurrentes no se bloqueen mutuamente.
+      2. Se reparte cada línea entre ubicaciones con la estrategia (ver ESTRATEGIAS)
+         sobre lo disponible de las filas ya bloqueadas (sin tocar lo reservado).
+      3. Un único UPDATE ... SET cantidad = CASE id WHEN ... descuenta todo.
+      4. Un bulk_create registra los movimientos.
+    Lanza StockInsuficienteError sin modificar nada si alguna línea no alcanza.
+    Devuelve el plan [(linea, inventario, cantidad_descontada), ...].
+    """
+    lineas = normalizar_lineas(lineas)
+    if not lineas:
+        return []
+
+    with transaction.atomic():
+        plan = _planificar_bloqueando(empresa, lineas, estrategia)
+        # Una fila puede aparecer en varias líneas: se descuenta la suma
+        por_fila = OrderedDict()
+        for _, fila, cantidad in plan:
+            por_fila[fila] = por_fila.get(fila, 0) + cantidad
+        aplicar_descuentos(list(por_fila.items()), usuario=usuario, motivo=motivo)
+    return plan
+
+
+def aplicar_descuentos(descuentos, usuario=None, motivo='', tipo_movimiento='AJUSTE_NEG'):
+    """
+    [(inventario_bloqueado, cantidad), ...] -> un UPDATE con CASE y un bulk_create
+    de MovimientoInventario. Las filas deben venir bloqueadas y con stock suficiente.
+    """
+    if not descuentos:
+        return
+    ahora = timezone.now()
+    Inventario.objects.filter(pk__in=[fila.pk for fila, _ in descuentos]).update(
+        cantidad=Case(*[When(pk=fila.pk, then=F('cantidad') - cantidad) for fila, cantidad in descuentos]),
+        fecha_actualizacion=ahora,
+    )
+    movimientos = []
+    for fila, cantidad in descuentos:
+        anterior = fila.cantidad
+        fila.cantidad = anterior - cantidad
+        fila.fecha_actualizacion = ahora
+        movimientos.append(MovimientoInventario(
+            inventario=fila,
+            producto_id=fila.producto_id,
+            ubicacion_id=fila.ubicacion_id,
+            empresa_id=fila.empresa_id,
+            tipo_movimiento=tipo_movimiento,
+            cantidad_anterior=anterior,
+            cantidad_nueva=fila.cantidad,
+            cantidad_cambio=-cantidad,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            motivo=motivo,
+        ))
+    MovimientoInventario.objects.bulk_create(movimientos)
+
+
+# --- Movimientos masivos (entradas/salidas de muchas líneas en una petición) ---
+class MovimientosRechazadosError(Exception):
+    """Alguna línea del lote no se puede aplicar; 'errores' = [{'linea': i, 'error': msg}, ...]."""
+    def __init__(self, errores):
+        super().__init__(f"{len(errores)} línea(s) con error")
+        self.errores = errores
+
+
+LineaMovimiento = namedtuple('LineaMovimiento', ['linea', 'tipo', 'producto', 'ubicacion', 'empresa', 'cantidad', 'motivo'])
+
+
+def resolver_movimientos(datos):
+    """
+    Convierte las líneas validadas (ids) en LineaMovimiento con una consulta
+    IN por modelo (Producto, Ubicacion, Empresa) en vez de tres por línea.
+    Devuelve (lineas, errores) con un error por cada línea con ids inexistentes.
+    """
+    productos = Producto.objects.in_bulk({dato['producto_id'] for dato in datos})
+    ubicaciones = Ubicacion.objects.in_bulk({dato['ubicacion_id'] for dato in datos})
+    empresas = Empresa.objects.in_bulk({dato['empresa_id'] for dato in datos})
+    lineas, errores = [], []
+    for indice, dato in enumerate(datos):
+        producto = productos.get(dato['producto_id'])
+        ubicacion = ubicaciones.get(dato['ubicacion_id'])
+        empresa = empresas.get(dato['empresa_id'])
+        faltan = [
+            f"{nombre} {dato[campo]}" for nombre, campo, obj in (
+                ('producto', 'producto_id', producto), ('ubicación', 'ubicacion_id', ubicacion), ('empresa', 'empresa_id', empresa)
+            ) if obj is None
+        ]
+        if faltan:
+            errores.append({'linea': indice, 'error': f"No existe: {', '.join(faltan)}."})
+            continue
+        lineas.append(LineaMovimiento(indice, dato['tipo'], producto, ubicacion, empresa, dato['cantidad'], dato.get('motivo') or ''))
+    return lineas, errores
+
+
+def aplicar_movimientos(lineas, usuario=None, parcial=False):
+    """
+    Aplica un lote de entradas/salidas en una transacción:
+      1. Las combinaciones (producto, ubicación, empresa) nuevas de las entradas se
+         crean en 0 con un bulk_create (ignore_conflicts por si otra petición las crea).
+      2. Una consulta bloquea todas las filas del lote, en el mismo orden que los
+         retiros de pedidos (producto, ubicación, id): sin deadlocks entre ellos.
+      3. Las líneas se aplican en orden sobre los saldos en memoria; una salida
+         no puede tocar lo reservado para pedidos.
+      4. Un UPDATE con CASE deja las cantidades finales, las filas que quedan en
+         0 sin reservas se borran (como en la salida individual) y un
+         bulk_create registra un movimiento por línea.
+    Si alguna línea falla: con parcial=False no se aplica nada (MovimientosRechazadosError);
+    con parcial=True se aplican las demás y se devuelven los errores.
+    Devuelve (filas_afectadas, errores).
+    """
+    if not lineas:
+        return [], []
+    claves = {(l.producto.pk, l.ubicacion.pk, l.empresa.pk) for l in lineas}
+    errores = []
+
+    with transaction.atomic():
+        Inventario.objects.bulk_create([
+            Inventario(producto_id=producto_id, ubicacion_id=ubicacion_id, empresa_id=empresa_id, cantidad=0)
+            for producto_id, ubicacion_id, empresa_id in
+            {(l.producto.pk, l.ubicacion.pk, l.empresa.pk) for l in lineas if l.tipo == 'entrada'}
+        ], ignore_conflicts=True)
+
+        filtro = reduce(operator.or_, (
+            Q(producto_id=producto_id, ubicacion_id=ubicacion_id, empresa_id=empresa_id)
+            for producto_id, ubicacion_id, empresa_id in claves
+        ))
+        filas = list(
+            Inventario.objects.select_for_update().filter(filtro)
+            .only('id', 'producto_id', 'ubicacion_id', 'empresa_id', 'cantidad')
+            .order_by('producto_id', 'ubicacion_id', 'id')
+        )
+        por_clave = {(f.producto_id, f.ubicacion_id, f.empresa_id): f for f in filas}
+        reservado = unidades_reservadas(filas)
+        saldo = {fila.pk: fila.cantidad for fila in filas}
+
+        aplicadas = [] # (linea, fila, anterior, nueva)
+        for linea in lineas:
+            fila = por_clave.get((linea.producto.pk, linea.ubicacion.pk, linea.empresa.pk))
+            if fila is None:
+                errores.append({'linea': linea.linea, 'error': "No existe inventario para este producto/ubicación/empresa."})
+                continue
+            anterior = saldo[fila.pk]
+            if linea.tipo == 'salida':
+                disponible = anterior - reservado.get(fila.pk, 0)
+                if disponible < linea.cantidad:
+                    errores.append({'linea': linea.linea, 'error': f"Stock insuficiente. Disponible: {disponible}, Solicitado: {linea.cantidad}"})
+                    continue
+                saldo[fila.pk] = anterior - linea.cantidad
+            else:
+                saldo[fila.pk] = anterior + linea.cantidad
+            aplicadas.append((linea, fila, anterior, saldo[fila.pk]))
+
+        if errores and not parcial:
+            raise MovimientosRechazadosError(sorted(errores, key=lambda e: e['linea']))
+
+        afectadas = {fila.pk: fila for _, fila, _, _ in aplicadas}
+        ahora = timezone.now()
+        if afectadas:
+            Inventario.objects.filter(pk__in=afectadas).update(
+                cantidad=Case(*[When(pk=pk, then=Value(saldo[pk])) for pk in afectadas]),
+                fecha_actualizacion=ahora,
+            )
+        # Las que quedan en 0 se borran, como en la salida individual (salvo si tienen reservas)
+        vaciadas = borrar_filas_vacias([pk for pk in afectadas if saldo[pk] == 0])
+
+        MovimientoInventario.objects.bulk_create([
+            MovimientoInventario(
+                inventario_id=None if fila.pk in vaciadas else fila.pk,
+                producto_id=fila.producto_id,
+                ubicacion_id=fila.ubicacion_id,
+                empresa_id=fila.empresa_id,
+                tipo_movimiento='AJUSTE_NEG' if linea.tipo == 'salida' else 'AJUSTE_POS',
+                cantidad_anterior=anterior,
+                cantidad_nueva=nueva,
+                cantidad_cambio=nueva - anterior,
+                usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+                motivo=linea.motivo or f"{linea.tipo.capitalize()} masiva registrada vía API.",
+            )
+            for linea, fila, anterior, nueva in aplicadas
+        ])
+
+    for pk, fila in afectadas.items():
+        fila.cantidad = saldo[pk]
+        fila.fecha_actualizacion = ahora
+    return [fila for pk, fila in afectadas.items() if pk not in vaciadas], errores
+
+
+# --- Ajustes individuales sin bloqueo previo (entrada/salida de una fila) ---
+ResultadoAjuste = namedtuple(
+    'ResultadoAjuste', ['inventario_id', 'cantidad_anterior', 'cantidad_nueva', 'creado', 'borrado'], defaults=[False]
+)
+
+
+def _returning_soportado():
+    # PostgreSQL y SQLite >= 3.35 aceptan UPDATE ... RETURNING; MySQL no
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and sqlite3.sqlite_version_info >= (3, 35)
+
+
+def _actualizar_cantidad(producto_id, ubicacion_id, empresa_id, cambio, ahora):
+    """
+    UPDATE atómico de la cantidad; devuelve (id, cantidad_nueva) o None si no
+    hay fila o si una salida dejaría menos de lo reservado vigente.
+    """
+    qn = connection.ops.quote_name
+    inventario, reservas = qn(Inventario._meta.db_table), qn(ReservaStock._meta.db_table)
+    ahora_db = connection.ops.adapt_datetimefield_value(ahora)
+    sql = (
+        f"UPDATE {inventario} SET cantidad = cantidad + %s, fecha_actualizacion = %s "
+        f"WHERE producto_id = %s AND ubicacion_id = %s AND empresa_id = %s"
+    )
+    params = [cambio, ahora_db, producto_id, ubicacion_id, empresa_id]
+    if cambio < 0:
+        # La guarda va en el propio WHERE: si no alcanza, no se actualiza ninguna fila
+        sql += (
+            f" AND cantidad + %s >= COALESCE((SELECT SUM(r.cantidad) FROM {reservas} r"
+            f" WHERE r.inventario_id = {inventario}.id AND r.estado = %s AND r.vence_en > %s), 0)"
+        )
+        params += [cambio, 'ACTIVA', ahora_db]
+
+    with connection.cursor() as cursor:
+        if _returning_soportado():
+            cursor.execute(sql + " RETURNING id, cantidad", params)
+            return cursor.fetchone()
+        cursor.execute(sql, params)
+        if not cursor.rowcount:
+            return None
+    # Sin RETURNING: el UPDATE ya tiene la fila bloqueada hasta el commit, releerla es seguro
+    return Inventario.objects.filter(
+        producto_id=producto_id, ubicacion_id=ubicacion_id, empresa_id=empresa_id
+    ).values_list('id', 'cantidad').first()
+
+
+def ajustar_stock(producto, ubicacion, empresa, cambio, usuario=None, motivo='', crear=False, borrar_vacia=False):
+    """
+    Suma 'cambio' (negativo = salida) a la fila (producto, ubicación, empresa) con
+    un solo UPDATE ... SET cantidad = cantidad + %s ... RETURNING id, cantidad:
+    sin SELECT ... FOR UPDATE ni lectura previa en Python. El lock de la fila
+    dura solo ese UPDATE y el INSERT del movimiento, que se escribe con los
+    valores devueltos (anterior = nueva - cambio). Las salidas no pueden dejar
+    menos de lo reservado para pedidos.
+    Con crear=True una entrada a una combinación inexistente crea la fila.
+    Con borrar_vacia=True una salida que deja la fila en 0 la borra en la misma
+    transacción (con la fila aún bloqueada), salvo que tenga reservas.
+    Lanza Inventario.DoesNotExist o StockInsuficienteError sin cambiar nada.
+    """
+    ahora = timezone.now()
+    creado = False
+    with transaction.atomic():
+        fila = _actualizar_cantidad(producto.pk, ubicacion.pk, empresa.pk, cambio, ahora)
+        if fila is None and cambio > 0 and crear:
+            try:
+                with transaction.atomic():
+                    nuevo = Inventario.objects.create(producto=producto, ubicacion=ubicacion, empresa=empresa, cantidad=cambio)
+                fila, creado = (nuevo.pk, nuevo.cantidad), True
+            except IntegrityError:
+                # Otra petición la creó entre medias: ahora el UPDATE sí la encuentra
+                fila = _actualizar_cantidad(producto.pk, ubicacion.pk, empresa.pk, cambio, ahora)
+        if fila is None:
+            raise _diagnosticar_ajuste(producto, ubicacion, empresa, cambio)
+
+        inventario_id, nueva = fila
+        anterior = 0 if creado else nueva - cambio
+        borrado = bool(borrar_vacia and nueva == 0 and borrar_filas_vacias([inventario_id]))
+        MovimientoInventario.objects.create(
+            inventario_id=None if borrado else inventario_id,
+            producto=producto,
+            ubicacion=ubicacion,
+            empresa=empresa,
+            tipo_movimiento='AJUSTE_POS' if cambio > 0 else 'AJUSTE_NEG',
+            cantidad_anterior=anterior,
+            cantidad_nueva=nueva,
+            cantidad_cambio=cambio,
+            usuario=usuario if usuario is not None and usuario.is_authenticated else None,
+            motivo=motivo,
+        )
+    return ResultadoAjuste(inventario_id, anterior, nueva, creado, borrado)
+
+
+def _diagnosticar_ajuste(producto, ubicacion, empresa, cambio):
+    # Solo en el camino de error: se lee la fila para explicar por qué no se aplicó
+    fila = Inventario.objects.filter(producto=producto, ubicacion=ubicacion, empresa=empresa).only('id', 'cantidad').first()
+    if fila is None:
+        return Inventario.DoesNotExist("No existe inventario para este producto/ubicación/empresa.")
+    reservado = unidades_reservadas([fila]).get(fila.pk, 0)
+    return StockInsuficienteError([
+        f"Stock insuficiente. Disponible: {fila.cantidad - reservado} (Reservado: {reservado}), Solicitado: {-cambio}"
+    ])
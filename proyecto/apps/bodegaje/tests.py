@@ -1,3 +1,239 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.http import FileResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.client import AsyncRequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from apps.transporte.models import PedidoTransporte
+from apps.usuarios.models import Empresa, Rol, Usuario
+
+from .exportar import bloques_para_respuesta, respuesta_archivo
+from .historico import stock_al_corte
+from .models import Inventario, MovimientoInventario, Producto, ReservaStock, SnapshotInventario, SnapshotInventarioLinea, Ubicacion
+from .stock import ResultadoAjuste, ajustar_stock
+from .views import InventarioViewSet
+
+
+class BloquesParaRespuestaTests(SimpleTestCase):
+    """Bajo ASGI la exportación se envía por partes también desde vistas de DRF."""
+
+    def test_request_drf_bajo_asgi_itera_asincrono(self):
+        request = Request(AsyncRequestFactory().get('/api/bodegaje/inventario/exportar-excel/'))
+        bloques = bloques_para_respuesta(request, [b'a', b'b'])
+        self.assertTrue(hasattr(bloques, '__aiter__'))
+
+    def test_wsgi_deja_el_iterador_sincrono(self):
+        request = Request(RequestFactory().get('/api/bodegaje/inventario/exportar-excel/'))
+        bloques = [b'a', b'b']
+        self.assertIs(bloques_para_respuesta(request, bloques), bloques)
+
+    def test_archivo_bajo_asgi_se_envia_por_bloques(self):
+        archivo = tempfile.SpooledTemporaryFile()
+        archivo.write(b'x' * (FileResponse.block_size * 2 + 10))
+        archivo.seek(0)
+        request = Request(AsyncRequestFactory().get('/api/bodegaje/inventario/exportar-excel/'))
+        response = respuesta_archivo(request, archivo, 'inventario.xlsx', 'application/octet-stream')
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Length'], str(FileResponse.block_size * 2 + 10))
+        self.assertIn('attachment; filename="inventario.xlsx"', response['Content-Disposition'])
+
+
+class SalidaHastaCeroTests(TestCase):
+    """La salida que deja una fila en 0 la borra en la misma transacción, salvo que tenga reservas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa Test')
+        cls.producto = Producto.objects.create(nombre='Caja', sku='CAJA-1')
+        cls.ubicacion = Ubicacion.objects.create(nombre='A1')
+
+    def setUp(self):
+        self.inventario = Inventario.objects.create(
+            producto=self.producto, ubicacion=self.ubicacion, empresa=self.empresa, cantidad=5
+        )
+
+    def _salida(self, cantidad):
+        return ajustar_stock(self.producto, self.ubicacion, self.empresa, -cantidad, borrar_vacia=True)
+
+    def test_fila_sin_reservas_se_borra(self):
+        resultado = self._salida(5)
+        self.assertTrue(resultado.borrado)
+        self.assertFalse(Inventario.objects.filter(pk=self.inventario.pk).exists())
+        self.assertIsNone(MovimientoInventario.objects.get(tipo_movimiento='AJUSTE_NEG').inventario_id)
+
+    def test_fila_con_reserva_vencida_no_se_borra(self):
+        cliente = Usuario.objects.create_user('cli-1', 'pw', empresa=self.empresa)
+        pedido = PedidoTransporte.objects.create(cliente=cliente, tipo_servicio='BODEGAJE_SALIDA')
+        reserva = ReservaStock.objects.create(
+            inventario=self.inventario, pedido=pedido, cantidad=2, vence_en=timezone.now() - timedelta(minutes=1)
+        )
+        resultado = self._salida(5)
+        self.assertFalse(resultado.borrado)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 0)
+        self.assertTrue(ReservaStock.objects.filter(pk=reserva.pk, estado='ACTIVA').exists())
+
+    def test_respuesta_sin_fila(self):
+        # Otra salida la borró entre el ajuste y la relectura
+        resultado = ResultadoAjuste(self.inventario.pk + 1000, 1, 0, False)
+        datos = InventarioViewSet()._inventario_actualizado(resultado, self.producto, self.ubicacion, self.empresa)
+        self.assertIn('detail', datos)
+
+
+class AuditoriaCatalogoMasivoTests(TestCase):
+    """bulk_create del catálogo audita solo lo que de verdad se creó."""
+
+    def _auditados(self):
+        return list(MovimientoInventario.objects.filter(tipo_movimiento='PROD_CREADO').values_list('producto__sku', flat=True))
+
+    def test_bulk_create_audita_cada_producto(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.bulk_create([Producto(nombre='Caja', sku='CAJA-1'), Producto(nombre='Bolsa', sku='BOLSA-1')])
+        self.assertCountEqual(self._auditados(), ['CAJA-1', 'BOLSA-1'])
+
+    def test_ignore_conflicts_no_audita_las_omitidas(self):
+        Producto.objects.create(nombre='Caja', sku='CAJA-1')
+        MovimientoInventario.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.bulk_create([Producto(nombre='Caja', sku='CAJA-1')], ignore_conflicts=True)
+        self.assertEqual(Producto.objects.filter(sku='CAJA-1').count(), 1)
+        self.assertEqual(self._auditados(), [])
+
+
+class MovimientosLoteTests(TestCase):
+    """POST /inventario/movimientos/: todo o nada por defecto, errores por línea con parcial=true."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa Test')
+        cls.producto = Producto.objects.create(nombre='Caja', sku='CAJA-1')
+        cls.otro_producto = Producto.objects.create(nombre='Bolsa', sku='BOLSA-1')
+        cls.ubicacion = Ubicacion.objects.create(nombre='A1')
+        cls.admin = Usuario.objects.create_user(
+            'adm-1', 'pw', rol=Rol.objects.get_or_create(nombre='admin')[0], is_staff=True
+        )
+
+    def setUp(self):
+        self.inventario = Inventario.objects.create(
+            producto=self.producto, ubicacion=self.ubicacion, empresa=self.empresa, cantidad=5
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def _linea(self, tipo, cantidad, producto=None):
+        return {
+            'tipo': tipo, 'producto_id': (producto or self.producto).pk, 'ubicacion_id': self.ubicacion.pk,
+            'empresa_id': self.empresa.pk, 'cantidad': cantidad,
+        }
+
+    def _enviar(self, lineas, parcial=False):
+        return self.client.post(
+            '/api/bodegaje/inventario/movimientos/', {'movimientos': lineas, 'parcial': parcial}, format='json'
+        )
+
+    def _reservar(self, cantidad):
+        cliente = Usuario.objects.create_user('cli-1', 'pw', empresa=self.empresa)
+        pedido = PedidoTransporte.objects.create(cliente=cliente, tipo_servicio='BODEGAJE_SALIDA')
+        ReservaStock.objects.create(
+            inventario=self.inventario, pedido=pedido, cantidad=cantidad, vence_en=timezone.now() + timedelta(hours=1)
+        )
+
+    def test_linea_invalida_rechaza_todo_el_lote(self):
+        respuesta = self._enviar([self._linea('entrada', 3, self.otro_producto), self._linea('salida', 9)])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertEqual([e['linea'] for e in respuesta.data['errores']], [1])
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 5)
+        # Ni siquiera la fila en 0 de la entrada queda creada
+        self.assertFalse(Inventario.objects.filter(producto=self.otro_producto).exists())
+        self.assertFalse(MovimientoInventario.objects.filter(tipo_movimiento__startswith='AJUSTE').exists())
+
+    def test_parcial_aplica_las_validas(self):
+        respuesta = self._enviar(
+            [self._linea('entrada', 3, self.otro_producto), self._linea('salida', 9), self._linea('salida', 2)], parcial=True
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['aplicados'], 2)
+        self.assertEqual([e['linea'] for e in respuesta.data['errores']], [1])
+        self.assertEqual(Inventario.objects.get(producto=self.otro_producto).cantidad, 3)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 3)
+        self.assertEqual(MovimientoInventario.objects.filter(tipo_movimiento__startswith='AJUSTE').count(), 2)
+
+    def test_salida_no_toca_lo_reservado(self):
+        self._reservar(3)
+        respuesta = self._enviar([self._linea('salida', 3)])
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('Disponible: 2', respuesta.data['errores'][0]['error'])
+
+        self.assertEqual(self._enviar([self._linea('salida', 2)]).status_code, 200)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 3)
+
+    def test_fila_vaciada_se_borra(self):
+        respuesta = self._enviar([self._linea('salida', 2), self._linea('salida', 3)])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['inventario'], [])
+        self.assertFalse(Inventario.objects.filter(pk=self.inventario.pk).exists())
+        movimientos = MovimientoInventario.objects.filter(tipo_movimiento='AJUSTE_NEG')
+        self.assertEqual(sorted(movimientos.values_list('cantidad_nueva', flat=True)), [0, 3])
+        self.assertFalse(movimientos.filter(inventario__isnull=False).exists())
+
+
+class StockAlCorteTests(TestCase):
+    """
+    Stock histórico desde el snapshot más cercano. Historia de la fila:
+    6 -> +4 (12 h antes del snapshot) -> 10 [snapshot, hace 10 días] -> +5 (día siguiente) -> 15
+    -> -2 (hace 12 h) -> 13 (inventario actual).
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ahora = timezone.now()
+        cls.corte = cls.ahora - timedelta(days=10)
+        cls.empresa = Empresa.objects.create(nombre='Empresa Test')
+        cls.producto = Producto.objects.create(nombre='Caja', sku='CAJA-1')
+        cls.ubicacion = Ubicacion.objects.create(nombre='A1')
+        Inventario.objects.create(producto=cls.producto, ubicacion=cls.ubicacion, empresa=cls.empresa, cantidad=13)
+        cls.snapshot = SnapshotInventario.objects.create(empresa=cls.empresa, corte=cls.corte)
+        SnapshotInventarioLinea.objects.create(snapshot=cls.snapshot, producto=cls.producto, ubicacion=cls.ubicacion, cantidad=10)
+        for momento, cambio in (
+            (cls.corte - timedelta(hours=12), 4), (cls.corte + timedelta(days=1), 5), (cls.ahora - timedelta(hours=12), -2),
+        ):
+            movimiento = MovimientoInventario.objects.create(
+                producto=cls.producto, ubicacion=cls.ubicacion, empresa=cls.empresa,
+                tipo_movimiento='AJUSTE_POS' if cambio > 0 else 'AJUSTE_NEG', cantidad_cambio=cambio,
+            )
+            # timestamp es auto_now_add: se fecha después
+            MovimientoInventario.objects.filter(pk=movimiento.pk).update(timestamp=momento)
+        cls.clave = (cls.producto.pk, cls.ubicacion.pk)
+
+    def test_antes_del_snapshot_resta_los_movimientos(self):
+        saldos, origen = stock_al_corte(self.empresa.pk, self.corte - timedelta(days=1))
+        self.assertEqual(saldos, {self.clave: 6})
+        self.assertEqual((origen.tipo, origen.snapshot_id, origen.lineas_ajustadas), ('snapshot', self.snapshot.pk, 1))
+
+    def test_despues_del_snapshot_suma_los_movimientos(self):
+        saldos, origen = stock_al_corte(self.empresa.pk, self.corte + timedelta(days=2))
+        self.assertEqual(saldos, {self.clave: 15})
+        self.assertEqual((origen.tipo, origen.snapshot_id), ('snapshot', self.snapshot.pk))
+
+    def test_cerca_de_hoy_parte_del_inventario_actual(self):
+        saldos, origen = stock_al_corte(self.empresa.pk, self.ahora - timedelta(days=1))
+        self.assertEqual(saldos, {self.clave: 15})
+        self.assertEqual(origen.tipo, 'inventario')
+
+    def test_sin_snapshots_deshace_desde_el_inventario(self):
+        SnapshotInventario.objects.all().delete()
+        saldos, origen = stock_al_corte(self.empresa.pk, self.corte - timedelta(days=1))
+        self.assertEqual(saldos, {self.clave: 6})
+        self.assertEqual((origen.tipo, origen.lineas_ajustadas), ('inventario', 1))
+
+    def test_fecha_futura_es_el_inventario_actual(self):
+        saldos, origen = stock_al_corte(self.empresa.pk, self.ahora + timedelta(days=1))
+        self.assertEqual(saldos, {self.clave: 13})
+        self.assertEqual((origen.tipo, origen.lineas_ajustadas), ('inventario', 0))
@@ -3,21 +3,37 @@ from rest_framework import generics, viewsets, status
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from django.db import IntegrityError, DatabaseError, transaction
+from django.db.models import ProtectedError
+from rest_framework.exceptions import ValidationError
 from .models import Producto, Ubicacion, Inventario, MovimientoInventario, Inventario
-from .serializers import ProductoSerializer, UbicacionSerializer, InventarioSerializer, MovimientoInventarioSerializer, EntradaInventarioSerializer, SalidaInventarioSerializer, InventarioSerializer
+from .serializers import ProductoSerializer, UbicacionSerializer, InventarioSerializer, MovimientoInventarioSerializer, EntradaInventarioSerializer, SalidaInventarioSerializer, InventarioSerializer, MovimientosLoteSerializer
 from django.shortcuts import get_object_or_404 # <-- Útil para buscar objetos
 from rest_framework.decorators import action # <-- Importa action
 from apps.usuarios.permissions import IsCliente, IsJefeEmpresa, IsJefeInventario
+from apps.usuarios.principal import principal_de
 from apps.usuarios.models import Empresa
 from django.core.exceptions import PermissionDenied
 from .models import MovimientoInventario
 import logging
+from datetime import datetime, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django_filters.rest_framework import DjangoFilterBackend
 from .filters import InventarioFilter
+from .pagination import HistorialInventarioPagination
+from . import auditoria # Historial diferido al commit y agrupado por petición
+from .historico import stock_al_corte
+from .stock import (
+    MovimientosRechazadosError, StockInsuficienteError, ajustar_stock, anotar_disponible,
+    aplicar_movimientos, resolver_movimientos,
+)
 from django.utils.translation import gettext_lazy as _ # Para mensajes de error
-from django.http import HttpResponse
-import openpyxl
-from io import BytesIO
+from rest_framework.settings import api_settings
+from .exportar import (
+    CONTENT_TYPE_XLSX, ENCABEZADOS_HISTORIAL_CSV, ENCABEZADOS_INVENTARIO, ENCABEZADOS_INVENTARIO_CSV, FORMATOS_CSV,
+    CSVGzipRenderer, CSVRenderer, excel_en_archivo, filas_historial_csv, filas_inventario, filas_inventario_csv,
+    respuesta_archivo, respuesta_csv,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -67,22 +83,24 @@ class InventarioViewSet(viewsets.ModelViewSet):
     
 
     def get_queryset(self):
-        user = self.request.user
         # El queryset base ahora se optimiza con select_related
         # El filtrado por producto, ubicacion, empresa lo hará DjangoFilterBackend ANTES
         queryset = Inventario.objects.select_related('producto', 'ubicacion', 'empresa')
+        # reservado / disponible: una subconsulta agregada sobre las reservas activas
+        queryset = anotar_disponible(queryset)
 
         # La lógica aquí solo se enfoca en la VISIBILIDAD según el rol,
         # asumiendo que los filtros de producto/ubicacion/empresa ya fueron aplicados por el backend.
-        if user.is_staff or (user.rol and user.rol.nombre in ['jefe_empresa', 'jefe_inventario', 'admin']):
+        principal = principal_de(self.request) # Rol/empresa sin consultar la BD
+        if principal.es_jefe_bodega:
             # Jefes/Admin pueden ver todo (lo que pasó los filtros)
             # YA NO necesitamos filtrar por 'empresa_id' manualmente aquí
             # if self.request.query_params.get('empresa_id'): ... # BORRAR ESTA LÓGICA MANUAL
             return queryset
-        elif user.rol and user.rol.nombre == 'cliente' and user.empresa:
+        elif principal.tiene_rol('cliente') and principal.empresa_id:
             # Clientes solo ven su inventario (además de otros filtros aplicados)
             # Este filtro adicional por la empresa del cliente SÍ es necesario aquí
-            return queryset.filter(empresa=user.empresa)
+            return queryset.filter(empresa_id=principal.empresa_id)
         else:
              # Si no es ninguno de los anteriores, no debería ver nada
             return Inventario.objects.none()
@@ -91,10 +109,10 @@ class InventarioViewSet(viewsets.ModelViewSet):
         # Define permisos por acción
         permission_classes = [IsAuthenticated] # Base: estar autenticado
 
-        if self.action in ['list', 'retrieve']:
+        if self.action in ['list', 'retrieve', 'al_corte']:
             # Quién puede VER lista/detalle (clientes ven suyo, jefes ven todo filtrado)
             permission_classes.append((IsAdminUser | IsJefeEmpresa | IsJefeInventario | IsCliente))
-        elif self.action in ['entrada', 'salida']:
+        elif self.action in ['entrada', 'salida', 'movimientos']:
             # Quién puede registrar entradas/salidas manuales
             permission_classes.append((IsAdminUser | IsJefeEmpresa | IsJefeInventario))
         else:
@@ -106,7 +124,6 @@ class InventarioViewSet(viewsets.ModelViewSet):
 
     # --- ACCIÓN PERSONALIZADA PARA ENTRADAS ---
     @action(detail=False, methods=['post'], url_path='entrada')
-    @transaction.atomic # Asegura que la operación sea atómica
     def entrada(self, request):
         serializer = EntradaInventarioSerializer(data=request.data)
         if serializer.is_valid():
@@ -114,97 +131,95 @@ class InventarioViewSet(viewsets.ModelViewSet):
             producto = data['producto_id'] # El serializer devuelve el objeto
             ubicacion = data['ubicacion_id']
             empresa = data['empresa_id']
-            cantidad_entrada = data['cantidad']
             motivo = data.get('motivo', 'Entrada manual registrada vía API.')
-            usuario_actual = request.user
-
-            # Usamos select_for_update para bloquear la fila si existe
-            inventario, created = Inventario.objects.select_for_update().get_or_create(
-                producto=producto,
-                ubicacion=ubicacion,
-                empresa=empresa,
-                defaults={'cantidad': 0} # Valor inicial si se crea
-            )
 
-            cantidad_anterior = inventario.cantidad
-            inventario.cantidad += cantidad_entrada
-            inventario.save() # Guarda el inventario actualizado/creado
-
-            # Registrar movimiento
-            MovimientoInventario.objects.create(
-                # inventario=inventario, # Puedes asociarlo si quieres
-                producto=producto,
-                ubicacion=ubicacion,
-                empresa=empresa,
-                tipo_movimiento='AJUSTE_POS', # O 'ENTRADA_MANUAL' si creas ese tipo
-                cantidad_anterior=cantidad_anterior,
-                cantidad_nueva=inventario.cantidad,
-                cantidad_cambio=cantidad_entrada,
-                usuario=usuario_actual if usuario_actual.is_authenticated else None,
-                motivo=motivo
+            # Un UPDATE atómico (cantidad = cantidad + N) en vez de bloquear, leer y guardar;
+            # si la combinación no existe se crea
+            resultado = ajustar_stock(
+                producto, ubicacion, empresa, data['cantidad'],
+                usuario=request.user, motivo=motivo, crear=True,
             )
-
-            # Devuelve el estado actualizado del inventario
-            inventario_serializer = InventarioSerializer(inventario)
-            return Response(inventario_serializer.data, status=status.HTTP_200_OK)
+            return Response(self._inventario_actualizado(resultado, producto, ubicacion, empresa), status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def _inventario_actualizado(self, resultado, producto, ubicacion, empresa):
+        # Se relee la fila ya confirmada (fuera del lock) con reservado/disponible;
+        # producto/ubicación/empresa ya vienen resueltos por el serializer
+        inventario = anotar_disponible(Inventario.objects.filter(pk=resultado.inventario_id)).first()
+        if inventario is None:
+            # Una salida concurrente la dejó en cero y la borró después de este ajuste
+            return {"detail": _("Movimiento registrado. El registro de inventario ya no existe (stock en cero).")}
+        inventario.producto, inventario.ubicacion, inventario.empresa = producto, ubicacion, empresa
+        return InventarioSerializer(inventario).data
         
-    @action(detail=False, methods=['get'], url_path='exportar-excel')
+    @action(detail=False, methods=['get'], url_path='exportar-excel',
+            renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, CSVGzipRenderer])
     def exportar_excel(self, request):
         # 1. Aplicar los mismos filtros que la lista
         #    filter_queryset() usa filter_backends y filterset_class configurados
         #    para filtrar basado en request.query_params (?producto=X&empresa=Y...)
         queryset = self.filter_queryset(self.get_queryset())
 
-        # 2. Crear un libro de Excel en memoria
-        workbook = openpyxl.Workbook()
-        sheet = workbook.active
-        sheet.title = 'Inventario Filtrado'
-
-        # 3. Escribir encabezados
-        headers = ['ID', 'Producto', 'SKU', 'Ubicación', 'Cantidad', 'Empresa Cliente', 'Fecha Creación', 'Última Actualización']
-        sheet.append(headers)
-
-        # 4. Escribir datos del queryset filtrado
-        for item in queryset:
-            # Accede a los campos relacionados de forma segura
-            sku = item.producto.sku if item.producto else ''
-            ubicacion_nombre = item.ubicacion.nombre if item.ubicacion else ''
-            empresa_nombre = item.empresa.nombre if item.empresa else ''
-            # Formatea fechas si quieres (opcional)
-            fecha_creacion_str = item.fecha_creacion.strftime('%Y-%m-%d %H:%M:%S') if item.fecha_creacion else ''
-            fecha_actualizacion_str = item.fecha_actualizacion.strftime('%Y-%m-%d %H:%M:%S') if item.fecha_actualizacion else ''
-
-            sheet.append([
-                item.id,
-                item.producto.nombre if item.producto else '',
-                sku,
-                ubicacion_nombre,
-                item.cantidad,
-                empresa_nombre,
-                fecha_creacion_str,
-                fecha_actualizacion_str
-            ])
-
-        # 5. Guardar el libro en un stream de bytes en memoria
-        excel_file = BytesIO()
-        workbook.save(excel_file)
-        excel_file.seek(0) # Rebobina el stream al principio
-
-        # 6. Crear la respuesta HTTP
-        response = HttpResponse(
-            excel_file.read(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename="inventario_filtrado.xlsx"' # Sugiere nombre de archivo
-
-        return response
+        # ?format=csv | csv.gz: exportación plana en streaming para cargas de BI
+        formato = request.query_params.get('format')
+        if formato in FORMATOS_CSV:
+            return respuesta_csv(request, formato, 'inventario', ENCABEZADOS_INVENTARIO_CSV, filas_inventario_csv(queryset))
+
+        # 2. Libro write_only sobre archivo temporal, leyendo el queryset por bloques:
+        #    la memoria no crece con el número de filas
+        archivo = excel_en_archivo('Inventario Filtrado', ENCABEZADOS_INVENTARIO, filas_inventario(queryset))
+
+        # 3. Se envía por partes desde el archivo (sin copiarlo entero a la respuesta, también bajo ASGI)
+        return respuesta_archivo(request, archivo, 'inventario_filtrado.xlsx', CONTENT_TYPE_XLSX)
     # --- FIN NUEVA ACCIÓN ---
 
+    # --- STOCK A UNA FECHA PASADA ---
+    @action(detail=False, methods=['get'], url_path='al-corte')
+    def al_corte(self, request):
+        """
+        ?fecha=AAAA-MM-DD (cierre de ese día) o fecha/hora ISO; ?empresa_id= (jefes/admin);
+        opcionales ?producto_id=, ?ubicacion_id=.
+        Parte del snapshot más cercano y aplica solo los movimientos posteriores.
+        """
+        principal = principal_de(request)
+        fecha = _fecha_corte(request.query_params.get('fecha'))
+        if fecha is None:
+            return Response({"error": "Parámetro 'fecha' requerido (AAAA-MM-DD o fecha/hora ISO)."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if principal.tiene_rol('cliente'):
+            if not principal.empresa_id:
+                return Response({"error": "Tu usuario no tiene empresa asociada."}, status=status.HTTP_403_FORBIDDEN)
+            empresa_id = principal.empresa_id # El cliente solo consulta su propio stock
+        else:
+            empresa_id = request.query_params.get('empresa_id')
+            if not (empresa_id and empresa_id.isdigit()):
+                return Response({"error": "Parámetro 'empresa_id' requerido."}, status=status.HTTP_400_BAD_REQUEST)
+        producto_id = request.query_params.get('producto_id')
+        ubicacion_id = request.query_params.get('ubicacion_id')
+        if not all(v.isdigit() for v in (producto_id, ubicacion_id) if v):
+            return Response({"error": "producto_id y ubicacion_id deben ser numéricos."}, status=status.HTTP_400_BAD_REQUEST)
+
+        saldos, origen = stock_al_corte(int(empresa_id), fecha, producto_id, ubicacion_id)
+        # Nombres en dos consultas, no una por fila
+        productos = Producto.objects.in_bulk({p for p, _ in saldos})
+        ubicaciones = Ubicacion.objects.in_bulk({u for _, u in saldos})
+        resultados = sorted((
+            {
+                'producto_id': p, 'producto_nombre': productos[p].nombre, 'producto_sku': productos[p].sku,
+                'ubicacion_id': u, 'ubicacion_nombre': ubicaciones[u].nombre, 'cantidad': cantidad,
+            }
+            for (p, u), cantidad in saldos.items() if p in productos and u in ubicaciones
+        ), key=lambda r: (r['producto_nombre'], r['ubicacion_nombre']))
+        return Response({
+            'empresa_id': int(empresa_id),
+            'fecha': fecha,
+            'origen': origen._asdict(),
+            'resultados': resultados,
+        })
+
     # --- ACCIÓN PERSONALIZADA PARA SALIDAS ---
     @action(detail=False, methods=['post'], url_path='salida')
-    @transaction.atomic # Asegura que la operación sea atómica
     def salida(self, request):
         serializer = SalidaInventarioSerializer(data=request.data)
         if serializer.is_valid():
@@ -212,64 +227,69 @@ class InventarioViewSet(viewsets.ModelViewSet):
             producto = data['producto_id']
             ubicacion = data['ubicacion_id']
             empresa = data['empresa_id']
-            cantidad_salida = data['cantidad']
             motivo = data.get('motivo', 'Salida manual registrada vía API.')
-            usuario_actual = request.user
 
             try:
-                # Usamos select_for_update para bloquear la fila
-                inventario = Inventario.objects.select_for_update().get(
-                    producto=producto,
-                    ubicacion=ubicacion,
-                    empresa=empresa
+                # UPDATE ... WHERE cantidad - reservado >= N: la validación de stock va en el propio UPDATE.
+                # Si queda en cero el registro se borra en la misma transacción (salvo que tenga reservas)
+                resultado = ajustar_stock(
+                    producto, ubicacion, empresa, -data['cantidad'],
+                    usuario=request.user, motivo=motivo, borrar_vacia=True,
                 )
             except Inventario.DoesNotExist:
                 return Response(
                     {"detail": _("No existe inventario para este producto/ubicación/empresa.")},
                     status=status.HTTP_404_NOT_FOUND
                 )
+            except StockInsuficienteError as e:
+                return Response({"detail": e.errores[0]}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Validar stock
-            if inventario.cantidad < cantidad_salida:
-                return Response(
-                    {"detail": _(f"Stock insuficiente. Disponible: {inventario.cantidad}, Solicitado: {cantidad_salida}")},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-
-            cantidad_anterior = inventario.cantidad
-            cantidad_nueva = inventario.cantidad - cantidad_salida
-
-            # Registrar movimiento ANTES de borrar (por si acaso)
-            MovimientoInventario.objects.create(
-                # inventario=inventario, # Asocia si quieres
-                producto=producto,
-                ubicacion=ubicacion,
-                empresa=empresa,
-                tipo_movimiento='AJUSTE_NEG', # O 'SALIDA_MANUAL'
-                cantidad_anterior=cantidad_anterior,
-                cantidad_nueva=cantidad_nueva,
-                cantidad_cambio=-cantidad_salida, # Negativo
-                usuario=usuario_actual if usuario_actual.is_authenticated else None,
-                motivo=motivo
-            )
-
-            # Actualizar o borrar inventario
-            if cantidad_nueva == 0:
-                inventario.delete()
+            if resultado.borrado:
                 return Response(
                     {"detail": _("Salida registrada. Stock en cero, registro eliminado.")},
                     status=status.HTTP_200_OK # O 204 No Content si prefieres
                 )
-            else:
-                inventario.cantidad = cantidad_nueva
-                inventario.save()
-                inventario_serializer = InventarioSerializer(inventario)
-                return Response(inventario_serializer.data, status=status.HTTP_200_OK)
+            return Response(self._inventario_actualizado(resultado, producto, ubicacion, empresa), status=status.HTTP_200_OK)
 
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+    # --- ACCIÓN PARA MOVIMIENTOS MASIVOS (recepción de un contenedor, etc.) ---
+    @action(detail=False, methods=['post'], url_path='movimientos')
+    def movimientos(self, request):
+        """
+        POST /inventario/movimientos/
+        {"movimientos": [{"tipo": "entrada"|"salida", "producto_id", "ubicacion_id",
+                          "empresa_id", "cantidad", "motivo"?}, ...], "parcial": false}
+        Aplica todas las líneas en una transacción (ver stock.aplicar_movimientos)
+        y devuelve los errores por línea ('linea' = posición en la lista).
+        """
+        serializer = MovimientosLoteSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        parcial = serializer.validated_data['parcial']
+
+        lineas, errores = resolver_movimientos(serializer.validated_data['movimientos'])
+        if errores and not parcial:
+            return Response({'errores': errores}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            filas, errores_stock = aplicar_movimientos(lineas, usuario=request.user, parcial=parcial)
+        except MovimientosRechazadosError as e:
+            return Response({'errores': e.errores}, status=status.HTTP_400_BAD_REQUEST)
+
+        errores = sorted(errores + errores_stock, key=lambda e: e['linea'])
+        logger.info(f"Movimientos masivos por usuario {request.user.id}: {len(lineas) - len(errores_stock)} aplicados, {len(errores)} con error")
+        return Response({
+            'aplicados': len(lineas) - len(errores_stock),
+            'errores': errores,
+            # Estado final de las filas tocadas (las que quedaron en 0 se borraron)
+            'inventario': [
+                {'id': fila.pk, 'producto_id': fila.producto_id, 'ubicacion_id': fila.ubicacion_id,
+                 'empresa_id': fila.empresa_id, 'cantidad': fila.cantidad}
+                for fila in filas
+            ],
+        }, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         # Manejo de duplicados (sin cambios respecto a la versión anterior)
@@ -294,7 +314,8 @@ class InventarioViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         user = self.request.user
         # Verifica permiso (redundante si get_permissions es correcto)
-        if not (user.is_staff or (user.rol and user.rol.nombre in ['jefe_empresa', 'jefe_inventario'])):
+        principal = principal_de(self.request)
+        if not (principal.is_staff or principal.tiene_rol('jefe_empresa', 'jefe_inventario')):
              raise PermissionDenied("No tienes permiso para crear inventario.")
 
         # Guarda primero para tener el 'instance'
@@ -302,7 +323,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
 
         # --- Log de Creación ---
         try:
-            MovimientoInventario.objects.create(
+            auditoria.registrar(
                 inventario=instance,
                 producto=instance.producto,
                 ubicacion=instance.ubicacion,
@@ -314,7 +335,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
                 usuario=user,
                 motivo="Registro inicial vía API."
             )
-            print(f"INFO: Log de CREACION creado para Inventario ID {instance.id}")
+            print(f"INFO: Log de CREACION registrado para Inventario ID {instance.id}")
         except Exception as e:
             print(f"ERROR al crear log de inventario para CREACION ID {instance.id}: {e}")
         # --- Fin Log ---
@@ -335,7 +356,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
             cantidad_cambio = cantidad_nueva - cantidad_anterior
             # Solo registra si la cantidad realmente cambió
             if cantidad_cambio != 0:
-                MovimientoInventario.objects.create(
+                auditoria.registrar(
                     inventario=instance,
                     producto=instance.producto,
                     ubicacion=instance.ubicacion,
@@ -347,7 +368,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
                     usuario=self.request.user,
                     motivo="Actualización de cantidad vía API."
                 )
-                print(f"INFO: Log de ACTUALIZACION creado para Inventario ID {instance.id}")
+                print(f"INFO: Log de ACTUALIZACION registrado para Inventario ID {instance.id}")
             else:
                 print(f"INFO: No se creó log para Inventario ID {instance.id} porque la cantidad no cambió.")
         except Exception as e:
@@ -359,7 +380,8 @@ class InventarioViewSet(viewsets.ModelViewSet):
     def perform_destroy(self, instance):
         user = self.request.user
         print(f"--- DEBUG: perform_destroy INICIADO ---")
-        print(f"Usuario ID: {user.id}, Rol: {user.rol.nombre if user.rol else 'N/A'}")
+        principal = principal_de(self.request)
+        print(f"Usuario ID: {user.id}, Rol: {principal.rol or 'N/A'}")
         print(f"Intentando eliminar Inventario ID: {instance.id}")
 
         # Guarda datos ANTES de borrar para el log
@@ -371,7 +393,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
 
         # Verifica permiso explícito
         can_delete = False
-        if user.is_staff or (user.rol and user.rol.nombre in ['jefe_empresa', 'jefe_inventario']):
+        if principal.is_staff or principal.tiene_rol('jefe_empresa', 'jefe_inventario'):
              can_delete = True
         if not can_delete:
             print(f"PERMISSION DENIED dentro de perform_destroy para usuario {user.id}")
@@ -383,7 +405,7 @@ class InventarioViewSet(viewsets.ModelViewSet):
 
             # --- Log de Eliminación ---
             try:
-                MovimientoInventario.objects.create(
+                auditoria.registrar(
                     inventario=None, # Ya no existe
                     producto=producto_log,
                     ubicacion=ubicacion_log,
@@ -395,11 +417,15 @@ class InventarioViewSet(viewsets.ModelViewSet):
                     usuario=user,
                     motivo=f"Eliminación de registro ID {inventario_id_log} vía API."
                 )
-                print(f"INFO: Log de ELIMINACION creado para ex-Inventario ID {inventario_id_log}")
+                print(f"INFO: Log de ELIMINACION registrado para ex-Inventario ID {inventario_id_log}")
             except Exception as e:
                  print(f"ERROR al crear log de inventario para ELIMINACION ID {inventario_id_log}: {e}")
             # --- Fin Log ---
 
+        except ProtectedError:
+            # Reservas de pedidos apuntan a esta fila (ver ReservaStock.inventario)
+            print(f"Inventario ID: {inventario_id_log} tiene reservas de pedidos, no se borra.")
+            raise ValidationError({"detail": _("No se puede eliminar: el registro tiene reservas de pedidos.")})
         except DatabaseError as e: print(f"ERROR DB borrando ID {inventario_id_log}: {e}"); raise e
         except Exception as e: print(f"ERROR Inesperado borrando ID {inventario_id_log}: {e}"); raise e
         print(f"--- FIN DEBUG: perform_destroy ---")
@@ -409,10 +435,24 @@ class HistorialInventarioView(generics.ListAPIView):
     """
     API para ver el historial de movimientos de inventario.
     Permite filtrar por query parameters (ej: ?producto_id=1&year=2025&month=4)
+    y se pagina por cursor (?cursor=, ?page_size=).
     """
     serializer_class = MovimientoInventarioSerializer
     # Define quién puede ver el historial completo
     permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa | IsJefeInventario)]
+    # Cursor sobre (-timestamp, id): cada página cuesta lo mismo aunque la tabla tenga millones de filas
+    pagination_class = HistorialInventarioPagination
+    # ?format=csv | csv.gz exporta el historial filtrado completo (sin paginar) en streaming
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, CSVRenderer, CSVGzipRenderer]
+
+    def list(self, request, *args, **kwargs):
+        formato = request.query_params.get('format')
+        if formato in FORMATOS_CSV:
+            return respuesta_csv(
+                request, formato, 'historial_inventario', ENCABEZADOS_HISTORIAL_CSV,
+                filas_historial_csv(self.filter_queryset(self.get_queryset())),
+            )
+        return super().list(request, *args, **kwargs)
 
     def get_queryset(self):
         queryset = MovimientoInventario.objects.all().select_related(
@@ -423,9 +463,6 @@ class HistorialInventarioView(generics.ListAPIView):
         producto_id = self.request.query_params.get('producto_id')
         ubicacion_id = self.request.query_params.get('ubicacion_id')
         empresa_id = self.request.query_params.get('empresa_id')
-        year = self.request.query_params.get('year')
-        month = self.request.query_params.get('month')
-        day = self.request.query_params.get('day') # Podrías filtrar por día también
 
         if producto_id:
             queryset = queryset.filter(producto_id=producto_id)
@@ -434,15 +471,60 @@ class HistorialInventarioView(generics.ListAPIView):
         if empresa_id:
              queryset = queryset.filter(empresa_id=empresa_id)
 
-        # Filtrado por fecha
-        if year:
-            try: queryset = queryset.filter(timestamp__year=int(year))
-            except ValueError: pass # Ignora si no es un año válido
-        if month:
-             try: queryset = queryset.filter(timestamp__month=int(month))
-             except ValueError: pass
-        if day:
-             try: queryset = queryset.filter(timestamp__day=int(day))
-             except ValueError: pass
-
-        return queryset 
\ No newline at end of file
+        # Filtrado por fecha como rango semiabierto [inicio, fin): usa los índices (…, -timestamp)
+        return _filtrar_por_fecha(queryset, self.request.query_params)
+
+
+def _fecha_corte(valor):
+    """'AAAA-MM-DD' es el cierre de ese día (inicio del siguiente); también acepta fecha/hora ISO."""
+    if not valor:
+        return None
+    try:
+        # parse_date primero: parse_datetime también acepta '2025-01-01' (como medianoche de inicio)
+        dia = parse_date(valor)
+        if dia is not None:
+            fecha = datetime.combine(dia + timedelta(days=1), datetime.min.time())
+        else:
+            fecha = parse_datetime(valor)
+            if fecha is None:
+                return None
+    except ValueError: # Formato correcto pero fecha imposible (2025-02-30)
+        return None
+    return timezone.make_aware(fecha) if timezone.is_naive(fecha) else fecha
+
+
+def _filtrar_por_fecha(queryset, query_params):
+    """
+    ?year=  ?year=&month=  ?year=&month=&day=  -> timestamp >= inicio AND timestamp < fin
+    (en la zona horaria local). Los valores inválidos se ignoran, como antes.
+    Sin año no hay rango posible (?month= solo = ese mes de todos los años) y
+    se mantiene el filtro por partes de la fecha.
+    """
+    def entero(nombre):
+        try:
+            return int(query_params.get(nombre))
+        except (TypeError, ValueError):
+            return None
+
+    year, month, day = entero('year'), entero('month'), entero('day')
+    if year is None or not 1 <= year <= 9998:
+        if month is not None:
+            queryset = queryset.filter(timestamp__month=month)
+        if day is not None:
+            queryset = queryset.filter(timestamp__day=day)
+        return queryset
+
+    if month is None or not 1 <= month <= 12:
+        inicio, fin = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+    elif day is None:
+        inicio = datetime(year, month, 1)
+        fin = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    else:
+        try:
+            inicio = datetime(year, month, day)
+        except ValueError:
+            return queryset.none() # Día inexistente (ej. 31 de abril): antes tampoco había filas
+        fin = inicio + timedelta(days=1)
+    return queryset.filter(
+        timestamp__gte=timezone.make_aware(inicio), timestamp__lt=timezone.make_aware(fin)
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TransporteConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.transporte'
+
+    def ready(self):
+        import apps.transporte.signals  # Registra las señales (caché de remisiones)
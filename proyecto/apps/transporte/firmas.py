@@ -0,0 +1,103 @@
+# backend/proyecto/apps/transporte/firmas.py
+import base64
+import binascii
+import logging
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class FirmaInvalidaError(ValueError):
+    """La firma recibida no es un data URL de imagen válido."""
+
+
+def decodificar_data_url(data_url):
+    """
+    Convierte 'data:image/png;base64,AAAA...' en bytes.
+    Acepta también el base64 sin el prefijo 'data:...,'.
+    """
+    if not data_url:
+        raise FirmaInvalidaError("La firma está vacía.")
+    if data_url.startswith('data:'):
+        cabecera, _, contenido = data_url.partition(',')
+        if ';base64' not in cabecera or not cabecera.startswith('data:image/'):
+            raise FirmaInvalidaError("La firma debe ser una imagen codificada en base64.")
+    else:
+        contenido = data_url
+    max_bytes = getattr(settings, 'FIRMA_MAX_BYTES', 2 * 1024 * 1024)
+    # El base64 ocupa ~4/3 del binario: se descarta antes de decodificar si es enorme
+    if len(contenido) > max_bytes * 4 // 3 + 4:
+        raise FirmaInvalidaError("La firma supera el tamaño máximo permitido.")
+    try:
+        return base64.b64decode(contenido, validate=True)
+    except (binascii.Error, ValueError):
+        raise FirmaInvalidaError("La firma no es base64 válido.")
+
+
+def optimizar_firma(datos):
+    """
+    Abre la imagen de la firma y la re-codifica como PNG de paleta optimizado.
+    Una firma es trazo sobre fondo (pocos colores), así que la paleta de 16
+    colores la deja en unos pocos KB sin pérdida visible.
+    """
+    try:
+        imagen = Image.open(BytesIO(datos))
+        imagen.load()
+    except Exception as e:
+        raise FirmaInvalidaError(f"La firma no es una imagen válida ({e}).")
+    imagen = imagen.convert('RGBA').quantize(colors=16, method=Image.Quantize.FASTOCTREE)
+    salida = BytesIO()
+    imagen.save(salida, format='PNG', optimize=True)
+    return salida.getvalue()
+
+
+def guardar_firma(confirmacion, data_url, save=True):
+    """
+    Decodifica la firma (una sola vez), la guarda en el storage y deja en la
+    fila solo la referencia al archivo. Limpia el data URL legado si existía.
+    """
+    return guardar_firma_png(confirmacion, optimizar_firma(decodificar_data_url(data_url)), save=save)
+
+
+def guardar_firma_png(confirmacion, png, save=True):
+    """Guarda bytes PNG ya optimizados como archivo de la firma."""
+    anterior = confirmacion.firma_imagen.name if confirmacion.firma_imagen else None
+    confirmacion.firma_imagen.save(f'firma_pedido_{confirmacion.pedido_id}.png', ContentFile(png), save=False)
+    confirmacion.firma_imagen_base64 = None
+    if save:
+        confirmacion.save(update_fields=['firma_imagen', 'firma_imagen_base64'])
+    if anterior:
+        storage = confirmacion.firma_imagen.storage
+        # Solo se borra el archivo viejo si la transacción se confirma
+        transaction.on_commit(lambda: _borrar_archivo(storage, anterior))
+    return confirmacion.firma_imagen
+
+
+def _borrar_archivo(storage, nombre):
+    try:
+        storage.delete(nombre)
+    except Exception as e:
+        logger.warning(f"No se pudo borrar la firma anterior {nombre}: {e}")
+
+
+def firma_como_data_url(confirmacion):
+    """
+    Fuente <img> de la firma para la plantilla PDF: lee el archivo desde el
+    storage (funciona con cualquier backend) o usa el data URL legado.
+    """
+    if confirmacion is None:
+        return None
+    if confirmacion.firma_imagen:
+        try:
+            with confirmacion.firma_imagen.open('rb') as archivo:
+                contenido = base64.b64encode(archivo.read()).decode('ascii')
+            return f'data:image/png;base64,{contenido}'
+        except Exception as e:
+            logger.warning(f"No se pudo leer la firma de la confirmación {confirmacion.pk}: {e}")
+            return None
+    return confirmacion.firma_imagen_base64 or None
@@ -0,0 +1,86 @@
+# backend/proyecto/apps/transporte/fotos.py
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+
+class FotoInvalidaError(ValueError):
+    """El archivo recibido no es una imagen que se pueda procesar."""
+
+
+def _lado(nombre_setting, defecto):
+    return getattr(settings, nombre_setting, defecto)
+
+
+def _reducir(imagen, lado_max):
+    """Copia de la imagen que cabe en lado_max x lado_max (nunca la agranda)."""
+    copia = imagen.copy()
+    copia.thumbnail((lado_max, lado_max), Image.Resampling.LANCZOS)
+    return copia
+
+
+def _codificar(imagen, formato, **opciones):
+    salida = BytesIO()
+    # Se guarda sin exif=...: el archivo resultante no lleva GPS ni datos del teléfono
+    imagen.save(salida, format=formato, **opciones)
+    return salida.getvalue()
+
+
+def procesar_foto(archivo, nombre=None):
+    """
+    Prepara una foto de prueba de entrega tal como llega del teléfono:
+      - la orienta según el EXIF y luego descarta todos los metadatos,
+      - reduce el original a PRUEBA_FOTO_MAX_LADO (JPEG),
+      - genera la miniatura (PRUEBA_FOTO_MINIATURA_LADO) y la versión media
+        (PRUEBA_FOTO_MEDIA_LADO) en WebP.
+    Devuelve un dict {campo: ContentFile} listo para asignar al modelo;
+    'nombre' (opcional) es el nombre base de los archivos generados.
+    """
+    lado_max = _lado('PRUEBA_FOTO_MAX_LADO', 2048)
+    calidad = _lado('PRUEBA_FOTO_CALIDAD', 85)
+    try:
+        archivo.seek(0)
+        imagen = Image.open(archivo)
+        # En JPEG, draft() decodifica ya a escala reducida: mucho menos CPU y memoria
+        imagen.draft('RGB', (lado_max, lado_max))
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.load()
+    except Exception as e:
+        raise FotoInvalidaError(f"La foto no es una imagen válida ({e}).")
+
+    if imagen.mode != 'RGB':
+        imagen = imagen.convert('RGB')
+    imagen = _reducir(imagen, lado_max)
+
+    base = os.path.splitext(os.path.basename(nombre or getattr(archivo, 'name', '') or 'foto'))[0] or 'foto'
+    return {
+        'foto': ContentFile(
+            _codificar(imagen, 'JPEG', quality=calidad, optimize=True, progressive=True),
+            name=f'{base}.jpg',
+        ),
+        'foto_media': ContentFile(
+            _codificar(_reducir(imagen, _lado('PRUEBA_FOTO_MEDIA_LADO', 1024)), 'WEBP', quality=80, method=4),
+            name=f'{base}_media.webp',
+        ),
+        'foto_miniatura': ContentFile(
+            _codificar(_reducir(imagen, _lado('PRUEBA_FOTO_MINIATURA_LADO', 320)), 'WEBP', quality=75, method=4),
+            name=f'{base}_miniatura.webp',
+        ),
+    }
+
+
+def asignar_foto_procesada(prueba, versiones):
+    """
+    Asigna las versiones a la instancia SIN guardarlas todavía: se escriben en
+    el storage al hacer prueba.save(), cuando la etapa (usada en la ruta) ya está calculada.
+    """
+    for campo, contenido in versiones.items():
+        setattr(prueba, campo, contenido)
+    return prueba
+
@@ -0,0 +1,64 @@
+# backend/proyecto/apps/transporte/management/commands/generar_miniaturas.py
+
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from apps.transporte.models import PruebaEntrega
+from apps.transporte.fotos import FotoInvalidaError, procesar_foto, asignar_foto_procesada
+
+
+class Command(BaseCommand):
+    help = (
+        'Procesa las fotos de PruebaEntrega subidas antes del pipeline de imágenes: '
+        'quita EXIF, reduce el original y genera la miniatura y la versión media, por lotes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Filas por lote (default: 100).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta las fotos pendientes.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        pendientes = PruebaEntrega.objects.filter(
+            Q(foto_miniatura__isnull=True) | Q(foto_miniatura='')
+        ).exclude(foto='')
+
+        total = pendientes.count()
+        self.stdout.write(f"Fotos pendientes de procesar: {total}")
+        if options['dry_run'] or not total:
+            return
+
+        procesadas, fallidas, ultimo_id = 0, 0, 0
+        while True:
+            # Paginación por id: cada lote cuesta lo mismo aunque la tabla sea grande
+            lote = list(
+                pendientes.filter(pk__gt=ultimo_id).select_related('pedido').order_by('pk')[:batch_size]
+            )
+            if not lote:
+                break
+            ultimo_id = lote[-1].pk
+
+            for prueba in lote:
+                anterior = prueba.foto
+                try:
+                    # Se quita el prefijo '<uuid>_' que añadió la ruta de subida
+                    nombre = os.path.basename(anterior.name).split('_', 1)[-1]
+                    with anterior.open('rb') as archivo:
+                        versiones = procesar_foto(archivo, nombre=nombre)
+                except (FotoInvalidaError, OSError) as e:
+                    fallidas += 1
+                    self.stdout.write(self.style.WARNING(f"Prueba {prueba.pk}: no se pudo procesar ({e})."))
+                    continue
+                nombre_anterior, storage = anterior.name, anterior.storage
+                with transaction.atomic():
+                    asignar_foto_procesada(prueba, versiones)
+                    prueba.save(update_fields=['foto', 'foto_miniatura', 'foto_media'])
+                    # El original pesado solo se borra si la fila quedó apuntando al nuevo
+                    transaction.on_commit(lambda n=nombre_anterior, s=storage: s.delete(n))
+                procesadas += 1
+            self.stdout.write(f"  ... {procesadas + fallidas}/{total} procesadas")
+
+        self.stdout.write(self.style.SUCCESS(f"Fotos procesadas: {procesadas}. Con error: {fallidas}."))
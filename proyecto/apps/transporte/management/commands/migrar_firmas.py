@@ -0,0 +1,53 @@
+# backend/proyecto/apps/transporte/management/commands/migrar_firmas.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.transporte.models import ConfirmacionCliente
+from apps.transporte.firmas import FirmaInvalidaError, guardar_firma
+
+
+class Command(BaseCommand):
+    help = (
+        'Mueve las firmas guardadas como data URL base64 en ConfirmacionCliente '
+        'a archivos PNG en el storage, por lotes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Filas por lote (default: 200).')
+        parser.add_argument('--dry-run', action='store_true', help='Solo cuenta las filas pendientes.')
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        pendientes = ConfirmacionCliente.objects.filter(
+            firma_imagen_base64__isnull=False
+        ).exclude(firma_imagen_base64='')
+
+        total = pendientes.count()
+        self.stdout.write(f"Firmas pendientes de migrar: {total}")
+        if options['dry_run'] or not total:
+            return
+
+        migradas, fallidas, ultimo_id = 0, 0, 0
+        while True:
+            # Paginación por id: cada lote cuesta lo mismo aunque la tabla sea grande
+            ids = list(
+                pendientes.filter(pk__gt=ultimo_id).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            ultimo_id = ids[-1]
+
+            for confirmacion in ConfirmacionCliente.objects.filter(pk__in=ids).only(
+                'pk', 'pedido_id', 'firma_imagen', 'firma_imagen_base64'
+            ):
+                try:
+                    with transaction.atomic():
+                        guardar_firma(confirmacion, confirmacion.firma_imagen_base64)
+                    migradas += 1
+                except FirmaInvalidaError as e:
+                    fallidas += 1
+                    self.stdout.write(self.style.WARNING(f"Confirmación {confirmacion.pk}: firma inválida, se deja igual ({e})."))
+            self.stdout.write(f"  ... {migradas + fallidas}/{total} procesadas")
+
+        self.stdout.write(self.style.SUCCESS(f"Firmas migradas: {migradas}. Inválidas: {fallidas}."))
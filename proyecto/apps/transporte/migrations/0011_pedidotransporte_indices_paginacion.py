@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-17 23:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0010_alter_vehiculo_tipo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedidotransporte',
+            index=models.Index(fields=['-fecha_creacion', 'id'], name='pedido_fcreacion_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedidotransporte',
+            index=models.Index(fields=['estado', '-fecha_fin', 'id'], name='pedido_estado_ffin_id_idx'),
+        ),
+    ]
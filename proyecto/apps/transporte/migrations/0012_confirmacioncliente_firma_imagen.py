@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-17 23:59
+
+import apps.transporte.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0011_pedidotransporte_indices_paginacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='confirmacioncliente',
+            name='firma_imagen',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.transporte.models.firma_confirmacion_upload_path, verbose_name='Firma'),
+        ),
+        migrations.AlterField(
+            model_name='confirmacioncliente',
+            name='firma_imagen_base64',
+            field=models.TextField(blank=True, null=True, verbose_name='Firma (Data URL Base64, legado)'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:03
+
+import apps.transporte.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0012_confirmacioncliente_firma_imagen'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pruebaentrega',
+            name='foto_media',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.transporte.models.prueba_entrega_miniatura_upload_path, verbose_name='Foto Tamaño Medio'),
+        ),
+        migrations.AddField(
+            model_name='pruebaentrega',
+            name='foto_miniatura',
+            field=models.ImageField(blank=True, null=True, upload_to=apps.transporte.models.prueba_entrega_miniatura_upload_path, verbose_name='Miniatura'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:05
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0013_pruebaentrega_miniaturas'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SesionSubidaPrueba',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo_foto', models.CharField(choices=[('INICIO_GEN', 'Inicio - General'), ('FIN_MERC', 'Fin - Mercancía'), ('FIN_REC', 'Fin - Receptor'), ('FIN_GEN', 'Fin - General')], max_length=10, verbose_name='Tipo de Foto')),
+                ('nombre_archivo', models.CharField(max_length=255, verbose_name='Nombre del Archivo')),
+                ('tamano_total', models.PositiveBigIntegerField(verbose_name='Tamaño Total (bytes)')),
+                ('recibido', models.PositiveBigIntegerField(default=0, verbose_name='Bytes Recibidos')),
+                ('creado', models.DateTimeField(auto_now_add=True, verbose_name='Creado')),
+                ('actualizado', models.DateTimeField(auto_now=True, verbose_name='Última Actividad')),
+                ('conductor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones_subida', to=settings.AUTH_USER_MODEL, verbose_name='Conductor')),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sesiones_subida', to='transporte.pedidotransporte', verbose_name='Pedido Asociado')),
+            ],
+            options={
+                'verbose_name': 'Sesión de Subida de Prueba',
+                'verbose_name_plural': 'Sesiones de Subida de Pruebas',
+            },
+        ),
+    ]
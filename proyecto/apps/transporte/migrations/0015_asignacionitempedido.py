@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bodegaje', '0005_alter_movimientoinventario_options_and_more'),
+        ('transporte', '0014_sesionsubidaprueba'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AsignacionItemPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad Asignada')),
+                ('inventario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bodegaje.inventario', verbose_name='Registro de Inventario')),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='asignaciones', to='transporte.itempedido', verbose_name='Item del Pedido')),
+                ('ubicacion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='bodegaje.ubicacion', verbose_name='Ubicación')),
+            ],
+            options={
+                'verbose_name': 'Asignación de Item por Ubicación',
+                'verbose_name_plural': 'Asignaciones de Items por Ubicación',
+            },
+        ),
+    ]
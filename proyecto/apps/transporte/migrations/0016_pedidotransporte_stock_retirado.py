@@ -0,0 +1,26 @@
+# Generated by Django 5.1.6 on 2026-10-18 01:05
+
+from django.db import migrations, models
+
+
+def marcar_iniciados(apps, schema_editor):
+    # Los pedidos que ya pasaron por en_curso descontaron su stock
+    PedidoTransporte = apps.get_model('transporte', 'PedidoTransporte')
+    PedidoTransporte.objects.filter(estado__in=('en_curso', 'finalizado')).update(stock_retirado=True)
+    PedidoTransporte.objects.filter(fecha_inicio__isnull=False).update(stock_retirado=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transporte', '0015_asignacionitempedido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedidotransporte',
+            name='stock_retirado',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Stock Retirado?'),
+        ),
+        migrations.RunPython(marcar_iniciados, migrations.RunPython.noop),
+    ]
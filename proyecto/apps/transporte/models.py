@@ -84,6 +84,12 @@ def prueba_entrega_upload_path(instance, filename):
     # filename = "".join(c for c in filename if c.isalnum() or c in ('.', '_')).rstrip()
     return f'pruebas_entrega/{pedido_id}/{etapa}/{unique_id}_{filename}'
 
+def prueba_entrega_miniatura_upload_path(instance, filename):
+    # Las miniaturas van junto a la foto, en una subcarpeta: .../<etapa>/miniaturas/<uuid>_<nombre>
+    pedido_id = instance.pedido.id if instance.pedido else 'sin_pedido'
+    etapa = instance.etapa if instance.etapa else 'sin_etapa'
+    return f'pruebas_entrega/{pedido_id}/{etapa}/miniaturas/{uuid.uuid4()}_{filename}'
+
 # --- Nuevo Modelo PruebaEntrega ---
 class PruebaEntrega(models.Model):
     ETAPA_CHOICES = (
@@ -123,6 +129,17 @@ class PruebaEntrega(models.Model):
         upload_to=prueba_entrega_upload_path,
         verbose_name=_("Archivo de Foto")
     )
+    # Versiones reducidas (WebP) generadas al subir; las listas usan estas, no el original
+    foto_miniatura = models.ImageField(
+        upload_to=prueba_entrega_miniatura_upload_path,
+        null=True, blank=True,
+        verbose_name=_("Miniatura")
+    )
+    foto_media = models.ImageField(
+        upload_to=prueba_entrega_miniatura_upload_path,
+        null=True, blank=True,
+        verbose_name=_("Foto Tamaño Medio")
+    )
     subido_por = models.ForeignKey(
         settings.AUTH_USER_MODEL, # <-- USA settings.AUTH_USER_MODEL
         on_delete=models.SET_NULL,
@@ -157,6 +174,55 @@ class PruebaEntrega(models.Model):
         super().save(*args, **kwargs) # Llama al método save original
 
 
+# --- Sesión de subida por partes (reanudable) de una PruebaEntrega ---
+class SesionSubidaPrueba(models.Model):
+    """
+    Estado de una subida reanudable: el conductor crea la sesión, envía la foto
+    en trozos (PUT con offset) y al final la confirma. Los trozos se escriben en
+    un archivo temporal en disco (SUBIDAS_TEMP_DIR); aquí solo se guarda cuánto llegó.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    pedido = models.ForeignKey(
+        'PedidoTransporte',
+        on_delete=models.CASCADE,
+        related_name='sesiones_subida',
+        verbose_name=_("Pedido Asociado")
+    )
+    conductor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='sesiones_subida',
+        verbose_name=_("Conductor")
+    )
+    tipo_foto = models.CharField(
+        max_length=10,
+        choices=PruebaEntrega.TIPO_FOTO_CHOICES,
+        verbose_name=_("Tipo de Foto")
+    )
+    nombre_archivo = models.CharField(max_length=255, verbose_name=_("Nombre del Archivo"))
+    tamano_total = models.PositiveBigIntegerField(verbose_name=_("Tamaño Total (bytes)"))
+    recibido = models.PositiveBigIntegerField(default=0, verbose_name=_("Bytes Recibidos"))
+    creado = models.DateTimeField(auto_now_add=True, verbose_name=_("Creado"))
+    actualizado = models.DateTimeField(auto_now=True, verbose_name=_("Última Actividad"))
+
+    class Meta:
+        verbose_name = _("Sesión de Subida de Prueba")
+        verbose_name_plural = _("Sesiones de Subida de Pruebas")
+
+    def __str__(self):
+        return f"Subida {self.id} ({self.recibido}/{self.tamano_total}) Pedido {self.pedido_id}"
+
+    @property
+    def completa(self):
+        return self.recibido == self.tamano_total
+
+
+# --- Ruta de subida para la firma del cliente ---
+def firma_confirmacion_upload_path(instance, filename):
+    # Guarda en: media/firmas_confirmacion/<pedido_id>/<uuid>_<nombre_archivo>
+    pedido_id = instance.pedido_id if instance.pedido_id else 'sin_pedido'
+    return f'firmas_confirmacion/{pedido_id}/{uuid.uuid4()}_{filename}'
+
 # --- Modelo ConfirmacionCliente ---
 class ConfirmacionCliente(models.Model):
     pedido = models.OneToOneField(
@@ -176,8 +242,14 @@ class ConfirmacionCliente(models.Model):
     # Datos que llena el cliente
     nombre_receptor = models.CharField(max_length=255, verbose_name=_("Nombre de quien recibe"))
     cedula_receptor = models.CharField(max_length=50, blank=True, null=True, verbose_name=_("Cédula/ID de quien recibe (Opcional)"))
-    # Guardaremos la firma como imagen base64 (texto largo)
-    firma_imagen_base64 = models.TextField(blank=True, null=True, verbose_name=_("Firma (Data URL Base64)"))
+    # La firma se guarda como archivo PNG en el storage (ver firmas.py)
+    firma_imagen = models.ImageField(
+        upload_to=firma_confirmacion_upload_path,
+        blank=True, null=True,
+        verbose_name=_("Firma")
+    )
+    # LEGADO: firmas antiguas como data URL base64. Se vacía con `manage.py migrar_firmas`
+    firma_imagen_base64 = models.TextField(blank=True, null=True, verbose_name=_("Firma (Data URL Base64, legado)"))
     observaciones = models.TextField(blank=True, null=True, verbose_name=_("Observaciones del Cliente"))
     # Cuando se confirma
     fecha_confirmacion = models.DateTimeField(null=True, blank=True, verbose_name=_("Fecha de Confirmación"))
@@ -304,9 +376,17 @@ class PedidoTransporte(models.Model):
     fotos_inicio_completas = models.BooleanField(default=False, editable=False, verbose_name=_("Fotos Inicio OK?"))
     fotos_fin_completas = models.BooleanField(default=False, editable=False, verbose_name=_("Fotos Fin OK?"))
     confirmacion_cliente_realizada = models.BooleanField(default=False, editable=False, verbose_name=_("Confirmación Cliente OK?"))
+    # El stock del retiro de bodega ya se descontó (solo una vez, aunque el estado vuelva a en_curso)
+    stock_retirado = models.BooleanField(default=False, editable=False, verbose_name=_("Stock Retirado?"))
     
     # --- FIN CAMPOS ESPECÍFICOS ---
 
+    class Meta:
+        indexes = [
+            # Soportan la paginación por cursor (-fecha, id) de las listas e historiales
+            models.Index(fields=['-fecha_creacion', 'id'], name='pedido_fcreacion_id_idx'),
+            models.Index(fields=['estado', '-fecha_fin', 'id'], name='pedido_estado_ffin_id_idx'),
+        ]
 
     def __str__(self):
         # Muestra el tipo de servicio para identificarlo fácilmente
@@ -349,4 +429,33 @@ class ItemPedido(models.Model):
         unique_together = ('pedido', 'producto')
 
     def __str__(self):
-        return f'{self.cantidad} x {self.producto.nombre} (Pedido {self.pedido_id})'
\ No newline at end of file
+        return f'{self.cantidad} x {self.producto.nombre} (Pedido {self.pedido_id})'
+
+# --- De qué ubicación sale cada ItemPedido (puede repartirse en varias) ---
+class AsignacionItemPedido(models.Model):
+    item = models.ForeignKey(
+        'ItemPedido',
+        on_delete=models.CASCADE,
+        related_name='asignaciones',
+        verbose_name=_("Item del Pedido")
+    )
+    ubicacion = models.ForeignKey(
+        'bodegaje.Ubicacion',
+        on_delete=models.SET_NULL, # Se conserva el registro aunque se borre la ubicación
+        null=True, blank=True,
+        verbose_name=_("Ubicación")
+    )
+    inventario = models.ForeignKey(
+        'bodegaje.Inventario',
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name=_("Registro de Inventario")
+    )
+    cantidad = models.PositiveIntegerField(verbose_name=_("Cantidad Asignada"))
+
+    class Meta:
+        verbose_name = _("Asignación de Item por Ubicación")
+        verbose_name_plural = _("Asignaciones de Items por Ubicación")
+
+    def __str__(self):
+        return f'{self.cantidad} de Ubicación {self.ubicacion_id} (Item {self.item_id})'
@@ -0,0 +1,143 @@
+# backend/proyecto/apps/transporte/pagination.py
+import json
+from base64 import b64decode, b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre el par (campo_orden DESC, id ASC).
+
+    En lugar de OFFSET, cada página filtra a partir de la última fila vista
+    (campo_orden, id), así que la página 500 cuesta lo mismo que la primera.
+    El cursor es opaco para el cliente (JSON en base64) y el orden es estable
+    aunque varias filas compartan la misma fecha, porque el id desempata.
+    El campo_orden NO debe ser nulo en el queryset paginado.
+    """
+    campo_orden = 'fecha_creacion'
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido.'
+    # Nombres de los settings con el tamaño de página por defecto y el máximo
+    ajuste_page_size = 'PEDIDOS_PAGE_SIZE'
+    ajuste_max_page_size = 'PEDIDOS_MAX_PAGE_SIZE'
+
+    def get_page_size(self, request):
+        page_size = getattr(settings, self.ajuste_page_size, 50)
+        max_page_size = getattr(settings, self.ajuste_max_page_size, 200)
+        try:
+            solicitado = int(request.query_params[self.page_size_query_param])
+            if solicitado > 0:
+                page_size = min(solicitado, max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return page_size
+
+    # --- Codificación del cursor ---
+    def encode_cursor(self, valor, pk, reverse=False):
+        payload = {'v': valor.isoformat(), 'id': pk}
+        if reverse:
+            payload['r'] = 1
+        token = b64encode(json.dumps(payload, separators=(',', ':')).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            payload = json.loads(b64decode(token.encode('ascii')).decode('ascii'))
+            valor = parse_datetime(payload['v'])
+            pk = int(payload['id'])
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if valor is None:
+            raise NotFound(self.invalid_cursor_message)
+        return valor, pk, reverse
+
+    # --- Paginación ---
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        cursor = self.decode_cursor(request)
+        campo = self.campo_orden
+
+        reverse = False
+        if cursor is None:
+            queryset = queryset.order_by(f'-{campo}', 'id')
+        else:
+            valor, pk, reverse = cursor
+            if reverse:
+                # Página anterior: filas "antes" del cursor, recorridas al revés
+                queryset = queryset.filter(
+                    Q(**{f'{campo}__gt': valor}) | Q(**{campo: valor, 'id__lt': pk})
+                ).order_by(campo, '-id')
+            else:
+                queryset = queryset.filter(
+                    Q(**{f'{campo}__lt': valor}) | Q(**{campo: valor, 'id__gt': pk})
+                ).order_by(f'-{campo}', 'id')
+
+        # Pedimos una fila extra para saber si hay más sin hacer COUNT(*)
+        resultados = list(queryset[:self.page_size + 1])
+        hay_mas = len(resultados) > self.page_size
+        resultados = resultados[:self.page_size]
+        if reverse:
+            resultados.reverse()
+
+        if cursor is None:
+            self.has_next, self.has_previous = hay_mas, False
+        elif reverse:
+            self.has_next, self.has_previous = True, hay_mas
+        else:
+            self.has_next, self.has_previous = hay_mas, True
+
+        self.page = resultados
+        return resultados
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        ultimo = self.page[-1]
+        return self.encode_cursor(getattr(ultimo, self.campo_orden), ultimo.pk)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        primero = self.page[0]
+        return self.encode_cursor(getattr(primero, self.campo_orden), primero.pk, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PedidoFechaCreacionPagination(KeysetPagination):
+    """Listas de pedidos activos: más recientes primero (-fecha_creacion, id)."""
+    campo_orden = 'fecha_creacion'
+
+
+class PedidoFechaFinPagination(KeysetPagination):
+    """Historiales de pedidos finalizados: (-fecha_fin, id)."""
+    campo_orden = 'fecha_fin'
@@ -0,0 +1,9 @@
+# backend/proyecto/apps/transporte/pdf_worker.py
+# Función que se ejecuta DENTRO de los procesos del pool de remisiones.
+# No importa Django ni modelos: el proceso hijo solo necesita WeasyPrint.
+
+
+def html_a_pdf(html_string, base_url):
+    """Convierte el HTML ya renderizado de la remisión en bytes PDF."""
+    from weasyprint import HTML
+    return HTML(string=html_string, base_url=base_url).render().write_pdf()
@@ -0,0 +1,346 @@
+# backend/proyecto/apps/transporte/remisiones.py
+import hashlib
+import logging
+import multiprocessing
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template, render_to_string
+
+from .firmas import firma_como_data_url
+from .models import ConfirmacionCliente, PedidoTransporte
+from .pdf_worker import html_a_pdf
+
+logger = logging.getLogger(__name__)
+
+PLANTILLA_REMISION = 'transporte/remision_template.html'
+
+
+def queryset_remision():
+    """Pedidos con todo lo que usa la plantilla de remisión, en una sola pasada."""
+    return PedidoTransporte.objects.select_related(
+        'cliente', 'conductor', 'cliente__empresa', 'confirmacion_cliente'
+    ).prefetch_related(
+        'items_pedido__producto', # Precarga items y producto si es BODEGAJE_SALIDA
+    )
+
+
+def _confirmacion(pedido):
+    try:
+        return pedido.confirmacion_cliente
+    except ConfirmacionCliente.DoesNotExist:
+        return None
+
+
+def _items(pedido):
+    return list(pedido.items_pedido.all()) if pedido.tipo_servicio == 'BODEGAJE_SALIDA' else None
+
+
+def contexto_remision(pedido):
+    return {
+        'pedido': pedido,
+        'items': _items(pedido),
+        'firma_src': firma_como_data_url(_confirmacion(pedido)), # Firma desde el storage (o legado base64)
+    }
+
+
+@lru_cache(maxsize=1)
+def _hash_plantilla():
+    # Si cambia la plantilla, cambian todas las versiones (no se sirven PDFs viejos)
+    origen = get_template(PLANTILLA_REMISION).origin
+    try:
+        with open(origen.name, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()[:12]
+    except OSError:
+        return 'sin-hash'
+
+
+def version_remision(pedido):
+    """
+    Huella de los datos que la plantilla muestra. Si cualquiera cambia
+    (pedido, cliente, conductor, items, confirmación o la plantilla misma)
+    cambia la versión, y con ella la clave de caché y el ETag.
+    """
+    cliente = pedido.cliente
+    conductor = pedido.conductor
+    empresa = getattr(cliente, 'empresa', None) if cliente else None
+    partes = [
+        _hash_plantilla(),
+        pedido.pk, pedido.tipo_servicio, pedido.estado, pedido.descripcion,
+        pedido.origen, pedido.destino,
+        pedido.fecha_creacion, pedido.fecha_inicio, pedido.fecha_fin,
+        pedido.hora_recogida_programada, pedido.hora_entrega_programada,
+        pedido.numero_pasajeros, pedido.tipo_tarifa_pasajero,
+        pedido.duracion_estimada_horas, pedido.distancia_estimada_km,
+        # La plantilla muestra el nombre completo (o la cédula si no hay nombre)
+        getattr(cliente, 'cedula', None), cliente.get_full_name() if cliente else None,
+        getattr(empresa, 'nombre', None),
+        getattr(conductor, 'cedula', None), conductor.get_full_name() if conductor else None,
+    ]
+    for item in _items(pedido) or []:
+        partes += [item.pk, item.cantidad, item.producto.nombre, item.producto.sku]
+    confirmacion = _confirmacion(pedido)
+    if confirmacion:
+        partes += [
+            confirmacion.nombre_receptor, confirmacion.cedula_receptor,
+            confirmacion.fecha_confirmacion, confirmacion.observaciones,
+            confirmacion.firma_imagen.name if confirmacion.firma_imagen else None,
+            hashlib.sha256(confirmacion.firma_imagen_base64.encode()).hexdigest() if confirmacion.firma_imagen_base64 else None,
+        ]
+    return hashlib.sha256(repr(partes).encode('utf-8')).hexdigest()[:32]
+
+
+# --- Pool de procesos para WeasyPrint ---
+class PoolRemisionesSaturado(Exception):
+    """No hay cupo en el pool de render: el cliente debe reintentar más tarde."""
+
+
+class RenderRemisionTimeout(Exception):
+    """El render del PDF superó REMISION_PDF_TIMEOUT."""
+
+
+class _PoolRemisiones:
+    """
+    Pool acotado de procesos para renderizar PDFs fuera del proceso web.
+    WeasyPrint es CPU puro: en un proceso aparte no compite por el GIL con
+    las demás peticiones del worker uvicorn.
+      - REMISION_PDF_WORKERS: procesos de render (0 = render en línea, sin pool).
+      - REMISION_PDF_COLA: peticiones extra que pueden esperar turno.
+      - REMISION_PDF_TIMEOUT: segundos máximos de espera por un PDF.
+    Si workers + cola están ocupados se rechaza de inmediato (429).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._cupos = None
+
+    def _obtener_executor(self):
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'REMISION_PDF_WORKERS', 2)
+                cola = getattr(settings, 'REMISION_PDF_COLA', 4)
+                # 'spawn': los hijos no heredan conexiones de BD ni hilos del proceso web
+                self._executor = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+                )
+                self._cupos = threading.BoundedSemaphore(workers + cola)
+            return self._executor, self._cupos
+
+    def _reiniciar(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def enviar(self, html_string, base_url, espera_cupo=None):
+        """
+        Encola un render y devuelve el Future con los bytes del PDF.
+        Sin espera_cupo, si no hay cupo se rechaza al instante; con espera_cupo
+        (segundos) se espera turno, útil para exportaciones masivas que deben
+        avanzar al ritmo del pool en vez de fallar.
+        """
+        if getattr(settings, 'REMISION_PDF_WORKERS', 2) <= 0:
+            future = Future()
+            try:
+                future.set_result(html_a_pdf(html_string, base_url))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        executor, cupos = self._obtener_executor()
+        if espera_cupo is None:
+            obtenido = cupos.acquire(blocking=False)
+        else:
+            obtenido = cupos.acquire(timeout=espera_cupo)
+        if not obtenido:
+            raise PoolRemisionesSaturado()
+        try:
+            future = executor.submit(html_a_pdf, html_string, base_url)
+        except BrokenProcessPool:
+            cupos.release()
+            self._reiniciar(executor)
+            raise
+        # El cupo se libera cuando el proceso termina de verdad, no cuando el
+        # request deja de esperar: así un render colgado sigue contando.
+        future.add_done_callback(lambda _: cupos.release())
+        return future
+
+    def resultado(self, future):
+        """Espera el PDF de un Future de enviar() con REMISION_PDF_TIMEOUT."""
+        try:
+            return future.result(timeout=getattr(settings, 'REMISION_PDF_TIMEOUT', 30))
+        except FuturesTimeoutError:
+            future.cancel()
+            raise RenderRemisionTimeout()
+        except BrokenProcessPool:
+            with self._lock:
+                executor = self._executor
+            if executor is not None:
+                self._reiniciar(executor)
+            raise
+
+    def renderizar(self, html_string, base_url):
+        return self.resultado(self.enviar(html_string, base_url))
+
+
+pool_remisiones = _PoolRemisiones()
+
+
+def _html_remision(pedido):
+    return render_to_string(PLANTILLA_REMISION, contexto_remision(pedido))
+
+
+def renderizar_remision(pedido):
+    """Renderiza la plantilla HTML aquí y la convierte en PDF en el pool de procesos."""
+    # base_url: directorio base del proyecto (útil para rutas locales de CSS/imágenes)
+    return pool_remisiones.renderizar(_html_remision(pedido), str(settings.BASE_DIR))
+
+
+# --- Caché de PDFs en el storage ---
+def _directorio_cache(pedido_id):
+    base = getattr(settings, 'REMISION_CACHE_DIR', 'remisiones_cache')
+    return f'{base}/{pedido_id}'
+
+
+def ruta_cache(pedido_id, version):
+    return f'{_directorio_cache(pedido_id)}/{version}.pdf'
+
+
+def leer_cache(pedido_id, version):
+    nombre = ruta_cache(pedido_id, version)
+    try:
+        if default_storage.exists(nombre):
+            with default_storage.open(nombre, 'rb') as f:
+                return f.read()
+    except Exception as e:
+        logger.warning(f"No se pudo leer la remisión en caché {nombre}: {e}")
+    return None
+
+
+def guardar_cache(pedido_id, version, pdf_bytes):
+    nombre = ruta_cache(pedido_id, version)
+    try:
+        if not default_storage.exists(nombre):
+            default_storage.save(nombre, ContentFile(pdf_bytes))
+    except Exception as e:
+        # La caché es una optimización: si falla, solo se loguea
+        logger.warning(f"No se pudo guardar la remisión en caché {nombre}: {e}")
+
+
+def invalidar_cache(pedido_id):
+    """Borra todas las versiones en caché de la remisión de un pedido."""
+    directorio = _directorio_cache(pedido_id)
+    try:
+        _, archivos = default_storage.listdir(directorio)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for archivo in archivos:
+        try:
+            default_storage.delete(f'{directorio}/{archivo}')
+        except Exception as e:
+            logger.warning(f"No se pudo borrar la remisión en caché {directorio}/{archivo}: {e}")
+
+
+def obtener_pdf_remision(pedido, version=None):
+    """Devuelve (pdf_bytes, version), renderizando solo si no está en caché."""
+    version = version or version_remision(pedido)
+    pdf_bytes = leer_cache(pedido.pk, version)
+    if pdf_bytes is None:
+        pdf_bytes = renderizar_remision(pedido)
+        guardar_cache(pedido.pk, version, pdf_bytes)
+    return pdf_bytes, version
+
+
+# --- Exportación masiva ---
+def iterar_pdfs_remisiones(pedidos):
+    """
+    Genera (pedido, pdf_bytes, error) para cada pedido, en orden.
+    Los que ya están en caché salen de inmediato; los demás se encolan en el
+    pool y se renderizan en paralelo (tantos como cupos haya), guardándolos en
+    caché al terminar. Si un PDF falla se devuelve el error y se sigue con el resto.
+    """
+    base_url = str(settings.BASE_DIR)
+    espera_cupo = getattr(settings, 'REMISION_PDF_TIMEOUT', 30)
+    en_vuelo = deque() # (pedido, version, future) en el orden de entrada
+
+    def _terminar(pedido, version, future):
+        try:
+            pdf_bytes = pool_remisiones.resultado(future)
+        except Exception as e:
+            logger.error(f"Error generando PDF para pedido {pedido.pk} (exportación masiva): {e}")
+            return pedido, None, e
+        guardar_cache(pedido.pk, version, pdf_bytes)
+        return pedido, pdf_bytes, None
+
+    for pedido in pedidos:
+        version = version_remision(pedido)
+        pdf_bytes = leer_cache(pedido.pk, version)
+        if pdf_bytes is not None and not en_vuelo:
+            yield pedido, pdf_bytes, None
+            continue
+        if pdf_bytes is not None:
+            # Ya resuelto, pero se respeta el orden detrás de los que están en vuelo
+            future = Future()
+            future.set_result(pdf_bytes)
+        else:
+            try:
+                future = pool_remisiones.enviar(_html_remision(pedido), base_url, espera_cupo=espera_cupo)
+            except Exception as e:
+                future = Future()
+                future.set_exception(e)
+        en_vuelo.append((pedido, version, future))
+        # Entrega lo que ya terminó para no acumular PDFs en memoria
+        while en_vuelo and en_vuelo[0][2].done():
+            yield _terminar(*en_vuelo.popleft())
+
+    while en_vuelo:
+        yield _terminar(*en_vuelo.popleft())
+
+
+class _SalidaZip:
+    """Archivo solo-escritura para ZipFile: acumula lo escrito para ir emitiéndolo."""
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes = []
+        return datos
+
+
+def zip_remisiones(pedidos):
+    """
+    Genera el ZIP de remisiones por trozos, sin armarlo entero en memoria ni
+    en disco: cada PDF se escribe y se emite en cuanto está listo.
+    Los PDF ya vienen comprimidos, así que se guardan sin recomprimir (ZIP_STORED).
+    """
+    salida = _SalidaZip()
+    # Sin seek(): zipfile usa descriptores de datos y escribe en modo streaming
+    with zipfile.ZipFile(salida, mode='w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for pedido, pdf_bytes, error in iterar_pdfs_remisiones(pedidos):
+            if error is None:
+                archivo_zip.writestr(f'remision_pedido_{pedido.pk}.pdf', pdf_bytes)
+            else:
+                archivo_zip.writestr(f'remision_pedido_{pedido.pk}_ERROR.txt',
+                                     f'No se pudo generar la remisión del pedido {pedido.pk}: {error}\n')
+            yield salida.vaciar()
+    yield salida.vaciar() # Directorio central del ZIP
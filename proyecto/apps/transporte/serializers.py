@@ -1,13 +1,61 @@
 # backend/proyecto/apps/transporte/serializers.py
+import logging
+
 from rest_framework import serializers, viewsets
 from .models import PedidoTransporte, ItemPedido, PruebaEntrega, ConfirmacionCliente, Vehiculo, TipoVehiculo # Modelos de esta app
+from .models import SesionSubidaPrueba, AsignacionItemPedido
 #from .serializers import VehiculoSerializer
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from apps.usuarios.permissions import IsJefeEmpresa, IsJefeInventario
 from apps.usuarios.models import Usuario # Modelo de otra app
 from apps.bodegaje.models import Producto, Inventario # Modelos de otra app
+from apps.bodegaje.stock import StockInsuficienteError, LineaRetiro, ESTRATEGIA_CHOICES, verificar_stock, reservar_stock
 from django.utils.translation import gettext_lazy as _ # Para mensajes de error
 from django.core.exceptions import ObjectDoesNotExist # Para manejo de errores
+from django.conf import settings
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from .firmas import FirmaInvalidaError, decodificar_data_url, optimizar_firma, guardar_firma_png
+from .fotos import FotoInvalidaError, procesar_foto, asignar_foto_procesada
+from .transiciones import TransicionInvalida, efectos_de_estado
+
+logger = logging.getLogger(__name__)
+
+
+def _lista_query_param(request, nombre):
+    """Lee un query param separado por comas (?fields=a,b) como conjunto."""
+    if request is None:
+        return None
+    valor = request.query_params.get(nombre)
+    if valor is None:
+        return None
+    return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+
+def campos_expandidos(request, permitidos):
+    """Campos pesados pedidos en ?expand= que el serializer permite expandir."""
+    return (_lista_query_param(request, 'expand') or set()) & set(permitidos)
+
+
+class CamposDinamicosMixin:
+    """
+    Permite al cliente elegir columnas en la respuesta:
+      - ?fields=id,estado,...   -> solo devuelve esos campos.
+      - ?expand=pruebas_entrega -> incluye campos pesados listados en
+        Meta.campos_expandibles, que por defecto NO se serializan.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        expandibles = getattr(self.Meta, 'campos_expandibles', ())
+        expandir = campos_expandidos(request, expandibles)
+        for campo in expandibles:
+            if campo not in expandir:
+                self.fields.pop(campo, None)
+        solicitados = _lista_query_param(request, 'fields')
+        if solicitados:
+            for campo in set(self.fields) - solicitados - expandir:
+                self.fields.pop(campo)
 
 class VehiculoSerializer(serializers.ModelSerializer):
     # Campo de Lectura: Muestra el objeto TipoVehiculo anidado o solo su nombre
@@ -68,8 +116,9 @@ class VehiculoViewSet(viewsets.ModelViewSet):
 # Confirmacion de Formulario Cliente
 class ConfirmacionClienteSerializer(serializers.ModelSerializer):
     # Hacemos los campos escribibles que vienen del formulario público
-    # La firma viene como un string largo base64
-    firma_imagen_base64 = serializers.CharField(allow_blank=True, allow_null=True, required=False)
+    # La firma viene como un string largo base64; se guarda como archivo (ver firmas.py)
+    firma_imagen_base64 = serializers.CharField(allow_blank=True, allow_null=True, required=False, write_only=True)
+    firma_url = serializers.SerializerMethodField(read_only=True)
     # Cédula y Observaciones son opcionales
     cedula_receptor = serializers.CharField(max_length=50, allow_blank=True, allow_null=True, required=False)
     observaciones = serializers.CharField(allow_blank=True, allow_null=True, required=False)
@@ -83,6 +132,7 @@ class ConfirmacionClienteSerializer(serializers.ModelSerializer):
             'nombre_receptor',
             'cedula_receptor',
             'firma_imagen_base64',
+            'firma_url',
             'observaciones',
             # Campos que son solo de lectura en este contexto o se manejan internamente
             'pedido',
@@ -90,26 +140,39 @@ class ConfirmacionClienteSerializer(serializers.ModelSerializer):
             'fecha_confirmacion'
         ]
         # Estos campos no los debe enviar el cliente, se determinan por el contexto o se generan
-        read_only_fields = ['pedido', 'token', 'fecha_confirmacion']
+        read_only_fields = ['pedido', 'token', 'fecha_confirmacion', 'firma_url']
 
     def validate_nombre_receptor(self, value):
         if not value or len(value.strip()) < 3: # Validación simple de ejemplo
             raise serializers.ValidationError("El nombre del receptor es requerido.")
         return value
 
-    # Podrías añadir una validación básica para la firma si quisieras
-    # def validate_firma_imagen_base64(self, value):
-    #     if value and not value.startswith('data:image/png;base64,'):
-    #          raise serializers.ValidationError("Formato de firma inválido.")
-    #     return value
+    def validate_firma_imagen_base64(self, value):
+        # Decodifica y optimiza UNA vez aquí; update() solo guarda los bytes resultantes
+        if not value:
+            return None
+        try:
+            return optimizar_firma(decodificar_data_url(value))
+        except FirmaInvalidaError as e:
+            raise serializers.ValidationError(str(e))
+
+    def get_firma_url(self, obj):
+        request = self.context.get('request')
+        if obj.firma_imagen:
+            return request.build_absolute_uri(obj.firma_imagen.url) if request else obj.firma_imagen.url
+        # Filas aún no migradas (ver `manage.py migrar_firmas`)
+        return obj.firma_imagen_base64 or None
 
     def update(self, instance, validated_data):
         # Sobrescribimos update para asegurarnos que solo actualizamos los campos del form
         # y ponemos la fecha de confirmación. El pedido se actualiza en la vista.
         instance.nombre_receptor = validated_data.get('nombre_receptor', instance.nombre_receptor)
         instance.cedula_receptor = validated_data.get('cedula_receptor', instance.cedula_receptor)
-        instance.firma_imagen_base64 = validated_data.get('firma_imagen_base64', instance.firma_imagen_base64)
         instance.observaciones = validated_data.get('observaciones', instance.observaciones)
+        firma_png = validated_data.get('firma_imagen_base64')
+        if firma_png:
+            # Solo la referencia al archivo queda en la fila
+            guardar_firma_png(instance, firma_png, save=False)
         # La fecha de confirmación se pondrá en la vista después de llamar a save()
         instance.save()
         return instance
@@ -140,6 +203,13 @@ class VehiculoSerializer(serializers.ModelSerializer):
             'activo',
         ]
 
+# Versión ligera para listas: sin la firma (data URL base64), solo datos de texto
+class ConfirmacionClienteResumenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ConfirmacionCliente
+        fields = ['nombre_receptor', 'cedula_receptor', 'observaciones', 'fecha_confirmacion']
+        read_only_fields = fields
+
 # --- Serializer para PruebaEntrega ---
 class PruebaEntregaSerializer(serializers.ModelSerializer):
     foto = serializers.ImageField(required=True, write_only=True) # WriteOnly si no necesitas reenviar el archivo
@@ -147,6 +217,9 @@ class PruebaEntregaSerializer(serializers.ModelSerializer):
     tipo_foto = serializers.ChoiceField(choices=PruebaEntrega.TIPO_FOTO_CHOICES, required=True)
     # --- FIN CAMBIO ---
     foto_url = serializers.SerializerMethodField(read_only=True)
+    # Versiones reducidas para listas y vistas previas (WebP)
+    foto_miniatura_url = serializers.SerializerMethodField(read_only=True)
+    foto_media_url = serializers.SerializerMethodField(read_only=True)
     subido_por_info = serializers.StringRelatedField(source='subido_por', read_only=True)
     # Añadimos el display de tipo_foto para la respuesta
     tipo_foto_display = serializers.CharField(source='get_tipo_foto_display', read_only=True)
@@ -164,19 +237,45 @@ class PruebaEntregaSerializer(serializers.ModelSerializer):
             'tipo_foto_display', # Lectura (texto)
             'foto', # Solo escritura
             'foto_url', # Lectura
+            'foto_miniatura_url', # Lectura (320px)
+            'foto_media_url', # Lectura (1024px)
             'subido_por_info',
             'timestamp'
         ]
         # etapa ya no es un campo de entrada directo
-        read_only_fields = ['id', 'pedido_id', 'timestamp', 'subido_por_info', 'tipo_foto_display', 'foto_url']
+        read_only_fields = ['id', 'pedido_id', 'timestamp', 'subido_por_info', 'tipo_foto_display', 'foto_url',
+                            'foto_miniatura_url', 'foto_media_url']
 
-    # Método para obtener la URL completa de la imagen
-    def get_foto_url(self, obj):
+    def _url_absoluta(self, archivo):
         request = self.context.get('request')
-        if obj.foto and request:
-            return request.build_absolute_uri(obj.foto.url)
+        if archivo and request:
+            return request.build_absolute_uri(archivo.url)
         return None
 
+    # Método para obtener la URL completa de la imagen
+    def get_foto_url(self, obj):
+        return self._url_absoluta(obj.foto)
+
+    # Fotos antiguas sin miniaturas (ver 'generar_miniaturas') caen al original
+    def get_foto_miniatura_url(self, obj):
+        return self._url_absoluta(obj.foto_miniatura or obj.foto)
+
+    def get_foto_media_url(self, obj):
+        return self._url_absoluta(obj.foto_media or obj.foto)
+
+    def validate_foto(self, value):
+        # Se procesa una sola vez al validar: orientar, quitar EXIF, reducir y generar miniaturas
+        try:
+            return procesar_foto(value)
+        except FotoInvalidaError as e:
+            raise serializers.ValidationError(str(e))
+
+    def create(self, validated_data):
+        versiones = validated_data.pop('foto')
+        prueba = asignar_foto_procesada(PruebaEntrega(**validated_data), versiones)
+        prueba.save() # save() calcula la etapa y luego escribe los archivos
+        return prueba
+
     # Validación adicional si es necesaria
     def validate_etapa(self, value):
         # Puedes añadir validaciones extra aquí si quieres
@@ -184,21 +283,52 @@ class PruebaEntregaSerializer(serializers.ModelSerializer):
              raise serializers.ValidationError("Etapa inválida.")
         return value
 
-# --- Serializers ItemPedido (Sin cambios respecto a la versión anterior) ---
+# --- Serializer para la sesión de subida por partes ---
+class SesionSubidaPruebaSerializer(serializers.ModelSerializer):
+    tipo_foto = serializers.ChoiceField(choices=PruebaEntrega.TIPO_FOTO_CHOICES, required=True)
+    pedido_id = serializers.PrimaryKeyRelatedField(source='pedido', read_only=True)
+
+    class Meta:
+        model = SesionSubidaPrueba
+        fields = ['id', 'pedido_id', 'tipo_foto', 'nombre_archivo', 'tamano_total', 'recibido', 'creado']
+        read_only_fields = ['id', 'pedido_id', 'recibido', 'creado']
+
+    def validate_tamano_total(self, value):
+        maximo = getattr(settings, 'SUBIDA_FOTO_MAX_BYTES', 25 * 1024 * 1024)
+        if value <= 0:
+            raise serializers.ValidationError("El tamaño debe ser mayor que cero.")
+        if value > maximo:
+            raise serializers.ValidationError(f"La foto no puede superar {maximo} bytes.")
+        return value
+
+    def validate_nombre_archivo(self, value):
+        # Solo el nombre, sin rutas del teléfono
+        return value.replace('\\', '/').rsplit('/', 1)[-1] or 'foto'
+
+
+# --- Serializers ItemPedido ---
 class ItemPedidoWriteSerializer(serializers.ModelSerializer):
-    producto_id = serializers.PrimaryKeyRelatedField(
-        queryset=Producto.objects.all(),
-        source='producto'
-    )
+    # Solo el id: los productos de todas las líneas se resuelven juntos en
+    # PedidoTransporteSerializer.validate_items_a_retirar (una consulta, no una por item)
+    producto_id = serializers.IntegerField(min_value=1)
+    # Opcional: retirar esta línea solo de una ubicación concreta
+    ubicacion_id = serializers.IntegerField(min_value=1, required=False, allow_null=True)
     class Meta:
         model = ItemPedido
-        fields = ('producto_id', 'cantidad')
+        fields = ('producto_id', 'cantidad', 'ubicacion_id')
+
+class AsignacionItemPedidoSerializer(serializers.ModelSerializer):
+    ubicacion = serializers.StringRelatedField()
+    class Meta:
+        model = AsignacionItemPedido
+        fields = ('ubicacion_id', 'ubicacion', 'cantidad')
 
 class ItemPedidoReadSerializer(serializers.ModelSerializer):
     producto = serializers.StringRelatedField()
+    asignaciones = AsignacionItemPedidoSerializer(many=True, read_only=True)
     class Meta:
         model = ItemPedido
-        fields = ('id', 'producto', 'cantidad')
+        fields = ('id', 'producto', 'cantidad', 'asignaciones')
 # --- FIN Serializers ItemPedido ---
 
 
@@ -240,6 +370,8 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
     )
     # Campo específico para recibir items al crear pedidos de BODEGAJE_SALIDA
     items_a_retirar = ItemPedidoWriteSerializer(many=True, write_only=True, required=False)
+    # Cómo repartir cada item entre ubicaciones (por defecto ASIGNACION_ESTRATEGIA_DEFECTO)
+    estrategia_asignacion = serializers.ChoiceField(choices=ESTRATEGIA_CHOICES, write_only=True, required=False)
 
 
     class Meta:
@@ -273,7 +405,7 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
            # --- FIN CAMPOS BOOLEANOS ---
            # Campos Write-Only (necesarios para que el serializer los reconozca al validar data de entrada, aunque no salgan en GET)
            'cliente_id', 'conductor_id', 
-           'items_a_retirar',
+           'items_a_retirar', 'estrategia_asignacion',
            'pruebas_entrega',
            'confirmacion_cliente',
         )
@@ -291,6 +423,24 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
             'pruebas_entrega', 'confirmacion_cliente',
         )
 
+    def validate_items_a_retirar(self, value):
+        """Resuelve todos los productos con un solo in_bulk y rechaza productos repetidos."""
+        ids = [item['producto_id'] for item in value]
+        productos = Producto.objects.in_bulk(ids)
+        errores, vistos, items = [], set(), []
+        for idx, item in enumerate(value):
+            producto = productos.get(item['producto_id'])
+            if producto is None:
+                errores.append(f"Item #{idx+1}: Producto inválido.")
+            elif producto.pk in vistos:
+                errores.append(f"Item '{producto.nombre}': Producto repetido, agrupa la cantidad en una sola línea.")
+            else:
+                vistos.add(producto.pk)
+                items.append({'producto': producto, 'cantidad': item['cantidad'], 'ubicacion_id': item.get('ubicacion_id')})
+        if errores:
+            raise serializers.ValidationError(errores)
+        return items
+
     def validate(self, data):
         """
         Valida los datos según el tipo_servicio y limpia campos no aplicables.
@@ -362,9 +512,14 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
                             print(f"Error buscando cliente ID {cliente_id_input}: {e}")
                             errors['cliente_id'] = _("Error interno buscando cliente.")
                     else:
+                         request = self.context.get('request')
+                         usuario_request = getattr(request, 'user', None)
                          # Si es una actualización (self.instance existe) y no se cambió el cliente
                          if self.instance and self.instance.cliente:
                              cliente_obj_target = self.instance.cliente
+                         # Cliente creando su propio pedido (el cliente se asigna luego en save())
+                         elif usuario_request is not None and getattr(getattr(usuario_request, 'rol', None), 'nombre', None) == 'cliente':
+                             cliente_obj_target = usuario_request
                          else:
                              # No hay cliente en el input ni en la instancia (no debería pasar si cliente es obligatorio)
                              errors['cliente_id'] = _("No se pudo determinar el cliente para validar stock.")
@@ -379,28 +534,22 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
                     # Si tenemos empresa, validamos stock de items
                     if target_empresa and 'cliente_id' not in errors:
                         items_errors = []
-                        for idx, item_data in enumerate(items_retiro):
+                        lineas = []
+                        for item_data in items_retiro:
                             producto_obj = item_data.get('producto')
                             cantidad_a_retirar = item_data.get('cantidad')
-
-                            if not producto_obj:
-                                items_errors.append(f"Item #{idx+1}: Producto inválido.")
-                                continue
                             if cantidad_a_retirar is None or cantidad_a_retirar <= 0:
                                 items_errors.append(f"Item '{producto_obj.nombre}': Cantidad debe ser mayor a 0.")
-                                continue
-
-                            try:
-                                inventario = Inventario.objects.get(producto=producto_obj, empresa=target_empresa)
-                                if inventario.cantidad < cantidad_a_retirar:
-                                    items_errors.append(f"Item '{producto_obj.nombre}': Stock insuficiente (Disp: {inventario.cantidad}, Sol: {cantidad_a_retirar}).")
-                            except Inventario.DoesNotExist:
-                                items_errors.append(f"Item '{producto_obj.nombre}': No encontrado en inventario de '{target_empresa.nombre}'.")
-                            except Exception as e:
-                                items_errors.append(f"Item '{producto_obj.nombre}': Error consultando stock ({e}).")
+                            else:
+                                lineas.append(LineaRetiro(producto_obj, cantidad_a_retirar, item_data.get('ubicacion_id')))
+                        # Una sola consulta para todas las líneas y ubicaciones (se revalida con bloqueo al crear)
+                        items_errors += verificar_stock(target_empresa, lineas, data.get('estrategia_asignacion'))
 
                         if items_errors:
                             errors['items_a_retirar'] = items_errors
+                        else:
+                            # create() descuenta contra esta empresa
+                            self._empresa_stock = target_empresa
                     # --- Fin Validación Stock CORREGIDA ---
                     
         elif tipo_servicio == 'PASAJEROS':
@@ -446,52 +595,101 @@ class PedidoTransporteSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Crea el PedidoTransporte y maneja la creación de ItemPedido
-        y el descuento de stock si aplica (BODEGAJE_SALIDA).
+        Crea el PedidoTransporte y, si es BODEGAJE_SALIDA, sus ItemPedido y la
+        reserva del stock (se descuenta al iniciar el viaje), todo en una
+        transacción: si una línea no alcanza al momento de confirmar, no se crea nada.
         """
         # validated_data ya ha pasado por self.validate()
         items_data = validated_data.pop('items_a_retirar', None)
+        estrategia = validated_data.pop('estrategia_asignacion', None)
         tipo_servicio = validated_data.get('tipo_servicio') # Obtener tipo para lógica interna
 
-        # Crear el pedido principal
-        pedido = PedidoTransporte.objects.create(**validated_data)
+        with transaction.atomic():
+            # Crear el pedido principal
+            pedido = PedidoTransporte.objects.create(**validated_data)
 
-        # Si es retiro de bodega Y hay items válidos, procesarlos
-        if tipo_servicio == 'BODEGAJE_SALIDA' and items_data:
-            for item_data in items_data:
-                # Crear el ItemPedido asociado
-                ItemPedido.objects.create(pedido=pedido, **item_data)
+            # Si es retiro de bodega Y hay items válidos, procesarlos
+            if tipo_servicio == 'BODEGAJE_SALIDA' and items_data:
+                items = ItemPedido.objects.bulk_create([
+                    ItemPedido(pedido=pedido, producto=item['producto'], cantidad=item['cantidad']) for item in items_data
+                ])
 
-                # --- Lógica de Descontar Stock (CRÍTICA - Considerar Transacciones) ---
-                # Idealmente, esto debería estar dentro de una transacción atómica
-                # from django.db import transaction
-                # with transaction.atomic(): ... (en la vista o aquí)
+                empresa = getattr(self, '_empresa_stock', None) or pedido.cliente.empresa
                 try:
-                    # Usar select_for_update para bloquear la fila si usas transacciones
-                    inventario_a_actualizar = Inventario.objects.select_for_update().get(
-                        producto=item_data.get('producto'),
-                        empresa=pedido.cliente.empresa # Asume cliente y empresa existen
+                    # Bloqueo ordenado de las filas + bulk_create de las reservas
+                    plan = reservar_stock(
+                        empresa,
+                        [LineaRetiro(item['producto'], item['cantidad'], item.get('ubicacion_id')) for item in items_data],
+                        pedido,
+                        estrategia=estrategia,
                     )
-                    # Re-validar stock justo antes de descontar (importante por concurrencia)
-                    if inventario_a_actualizar.cantidad >= item_data.get('cantidad'):
-                        inventario_a_actualizar.cantidad -= item_data.get('cantidad')
-                        inventario_a_actualizar.save(update_fields=['cantidad'])
-                        # Aquí es un buen lugar para crear el MovimientoInventario
-                        # MovimientoInventario.objects.create(...)
-                    else:
-                        # El stock cambió desde la validación inicial.
-                        # ¿Qué hacer? ¿Cancelar el pedido? ¿Notificar?
-                        # Por ahora, solo logueamos. Necesita definición de negocio.
-                        print(f"ADVERTENCIA: Stock insuficiente al intentar descontar para Pedido {pedido.id}, Producto {item_data.get('producto').id}. Stock actual: {inventario_a_actualizar.cantidad}")
-                        # Podrías lanzar una excepción aquí para detener la creación si es crítico
-                        # raise serializers.ValidationError(f"Stock insuficiente para {item_data.get('producto').nombre} al momento de confirmar.")
-                except Inventario.DoesNotExist:
-                     # Esto no debería pasar si la validación fue correcta, pero es posible
-                     print(f"ERROR CRÍTICO: Inventario no encontrado al descontar stock para Pedido {pedido.id}, Producto {item_data.get('producto').id}")
-                     # Considera lanzar excepción
-                except Exception as e:
-                     print(f"ERROR inesperado descontando stock para Pedido {pedido.id}: {e}")
-                     # Considera lanzar excepción
-            # --- FIN Descontar Stock ---
+                except StockInsuficienteError as e:
+                    # El stock cambió desde la validación inicial: se revierte todo
+                    logger.warning("Stock insuficiente al reservar para Pedido %s: %s", pedido.id, e.errores)
+                    raise serializers.ValidationError({'items_a_retirar': e.errores})
+
+                # Se guarda de qué ubicación sale cada item (un producto = un item por pedido)
+                item_por_producto = {item.producto_id: item for item in items}
+                AsignacionItemPedido.objects.bulk_create([
+                    AsignacionItemPedido(
+                        item=item_por_producto[linea.producto.pk], ubicacion_id=fila.ubicacion_id,
+                        inventario=fila, cantidad=cantidad,
+                    )
+                    for linea, fila, cantidad in plan
+                ])
+
+            # La respuesta lista los items con su producto y ubicaciones: se precargan juntos (no uno por item)
+            prefetch_related_objects([pedido], 'items_pedido__producto', 'items_pedido__asignaciones__ubicacion')
 
         return pedido
+
+    def update(self, instance, validated_data):
+        """
+        Los items no se editan después de crear el pedido. Si Admin/Jefe cambia
+        el estado a mano se aplican los mismos efectos sobre las reservas de
+        stock que en las transiciones (en_curso consume, cancelado libera).
+        """
+        validated_data.pop('items_a_retirar', None)
+        validated_data.pop('estrategia_asignacion', None)
+        estado_anterior = instance.estado
+        request = self.context.get('request')
+        with transaction.atomic():
+            pedido = super().update(instance, validated_data)
+            if pedido.estado != estado_anterior:
+                try:
+                    efectos_de_estado(pedido.pk, pedido.estado, usuario=getattr(request, 'user', None))
+                except TransicionInvalida as e:
+                    raise serializers.ValidationError({'estado': e.detalle})
+        return pedido
+
+
+class PedidoTransporteListSerializer(CamposDinamicosMixin, PedidoTransporteSerializer):
+    """
+    Representación compacta (solo lectura) para las vistas de lista e historial.
+    Las relaciones anidadas (items, fotos, confirmación) solo se incluyen
+    si se piden con ?expand=; la firma nunca viaja en listas.
+    """
+    confirmacion_cliente = ConfirmacionClienteResumenSerializer(read_only=True)
+
+    class Meta(PedidoTransporteSerializer.Meta):
+        fields = (
+           'id',
+           'cliente', 'conductor',
+           'origen', 'destino', 'estado', 'estado_display',
+           'fecha_creacion', 'fecha_inicio', 'fecha_fin',
+           'hora_recogida_programada', 'hora_entrega_programada',
+           'tipo_servicio', 'tipo_servicio_display',
+           'tipo_vehiculo_requerido',
+           'requiere_fotos_inicio',
+           'requiere_fotos_fin',
+           'requiere_confirmacion_cliente',
+           'fotos_inicio_completas',
+           'fotos_fin_completas',
+           'confirmacion_cliente_realizada',
+           # Expandibles (?expand=)
+           'items_pedido',
+           'pruebas_entrega',
+           'confirmacion_cliente',
+        )
+        read_only_fields = fields
+        campos_expandibles = ('items_pedido', 'pruebas_entrega', 'confirmacion_cliente')
@@ -0,0 +1,28 @@
+# backend/proyecto/apps/transporte/signals.py
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PedidoTransporte, ItemPedido, ConfirmacionCliente
+from .remisiones import invalidar_cache
+
+# --- Invalidación de la caché de remisiones PDF ---
+# La clave de caché ya incluye la versión de los datos, así que un PDF viejo nunca
+# se sirve; estas señales solo liberan los archivos obsoletos del storage.
+
+def _invalidar_remision(pedido_id):
+    if pedido_id:
+        transaction.on_commit(lambda: invalidar_cache(pedido_id))
+
+@receiver(post_save, sender=PedidoTransporte)
+@receiver(post_delete, sender=PedidoTransporte)
+def invalidar_remision_pedido(sender, instance, **kwargs):
+    """Al cambiar o borrar el pedido."""
+    _invalidar_remision(instance.pk)
+
+@receiver(post_save, sender=ItemPedido)
+@receiver(post_delete, sender=ItemPedido)
+@receiver(post_save, sender=ConfirmacionCliente)
+@receiver(post_delete, sender=ConfirmacionCliente)
+def invalidar_remision_relacionado(sender, instance, **kwargs):
+    """Al cambiar los items o la confirmación del cliente."""
+    _invalidar_remision(instance.pedido_id)
@@ -0,0 +1,97 @@
+# backend/proyecto/apps/transporte/subidas.py
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.utils import timezone
+
+from .models import SesionSubidaPrueba
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 64 * 1024 # Se copia del request al disco en bloques de 64 KB
+
+
+class TrozoInvalidoError(ValueError):
+    """El trozo recibido no encaja con lo que la sesión espera."""
+
+
+def directorio_temporal():
+    directorio = str(getattr(settings, 'SUBIDAS_TEMP_DIR', settings.BASE_DIR / 'subidas_tmp'))
+    os.makedirs(directorio, exist_ok=True)
+    return directorio
+
+
+def ruta_temporal(sesion):
+    return os.path.join(directorio_temporal(), f'{sesion.pk}.part')
+
+
+def escribir_trozo(sesion, stream, offset, longitud):
+    """
+    Añade al archivo temporal de la sesión 'longitud' bytes leídos de 'stream'.
+    Debe llamarse con la fila de la sesión bloqueada (select_for_update) para que
+    dos PUT simultáneos no escriban en el mismo offset.
+    El trozo solo cuenta si llega completo: si la conexión se corta a mitad,
+    se descarta y el cliente reintenta desde el último offset confirmado.
+    """
+    if offset != sesion.recibido:
+        raise TrozoInvalidoError(f"Offset esperado {sesion.recibido}, recibido {offset}.")
+    if longitud <= 0:
+        raise TrozoInvalidoError("El trozo está vacío.")
+    if longitud > getattr(settings, 'SUBIDA_TROZO_MAX_BYTES', 2 * 1024 * 1024):
+        raise TrozoInvalidoError("El trozo supera el tamaño máximo permitido.")
+    if offset + longitud > sesion.tamano_total:
+        raise TrozoInvalidoError("El trozo excede el tamaño total declarado.")
+
+    ruta = ruta_temporal(sesion)
+    with open(ruta, 'ab') as destino:
+        # Si un intento anterior dejó bytes sin confirmar, se recorta al offset real
+        destino.truncate(offset)
+        pendientes = longitud
+        while pendientes:
+            bloque = stream.read(min(TAMANO_BLOQUE, pendientes))
+            if not bloque:
+                break
+            destino.write(bloque)
+            pendientes -= len(bloque)
+    if pendientes:
+        raise TrozoInvalidoError("El trozo llegó incompleto.")
+
+    sesion.recibido = offset + longitud
+    sesion.save(update_fields=['recibido', 'actualizado'])
+    return sesion.recibido
+
+
+class ArchivoTemporalSubida(UploadedFile):
+    """
+    Archivo ya ensamblado en disco presentado como un UploadedFile, para pasarlo
+    por el mismo serializer que la subida directa. temporary_file_path() evita
+    que la validación de imagen lo copie entero a memoria.
+    """
+    def __init__(self, sesion):
+        self._ruta = ruta_temporal(sesion)
+        super().__init__(open(self._ruta, 'rb'), name=sesion.nombre_archivo, size=sesion.tamano_total)
+
+    def temporary_file_path(self):
+        return self._ruta
+
+
+def borrar_temporal(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"No se pudo borrar el temporal de subida {ruta}: {e}")
+
+
+def purgar_sesiones_vencidas():
+    """Elimina sesiones sin actividad en SUBIDA_SESION_TTL_HORAS (y sus temporales)."""
+    limite = timezone.now() - timedelta(hours=getattr(settings, 'SUBIDA_SESION_TTL_HORAS', 24))
+    vencidas = list(SesionSubidaPrueba.objects.filter(actualizado__lt=limite)[:100])
+    for sesion in vencidas:
+        borrar_temporal(ruta_temporal(sesion))
+    if vencidas:
+        SesionSubidaPrueba.objects.filter(pk__in=[s.pk for s in vencidas]).delete()
@@ -1,3 +1,146 @@
+from datetime import timedelta
+
+from django.db.models import ProtectedError
 from django.test import TestCase
+from django.utils import timezone
+
+from apps.bodegaje.models import Inventario, Producto, ReservaStock, Ubicacion
+from apps.bodegaje.stock import LineaRetiro, borrar_filas_vacias, liberar_reservas_vencidas, reservar_stock
+from apps.usuarios.models import Empresa, Rol, Usuario
+
+from .models import ItemPedido, PedidoTransporte
+from .remisiones import queryset_remision, version_remision
+from .serializers import PedidoTransporteSerializer
+from .transiciones import TransicionInvalida, aplicar_transicion
+
+
+class IniciarRetiroBodegaTests(TestCase):
+    """Al iniciar un retiro de bodega se descuenta el stock del pedido, tenga o no reservas vigentes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Empresa Test')
+        cls.cliente = Usuario.objects.create_user(
+            'cli-1', 'pw', rol=Rol.objects.get_or_create(nombre='cliente')[0], empresa=cls.empresa
+        )
+        cls.conductor = Usuario.objects.create_user('cond-1', 'pw', rol=Rol.objects.get_or_create(nombre='conductor')[0])
+        cls.producto = Producto.objects.create(nombre='Caja', sku='CAJA-1')
+        cls.ubicacion = Ubicacion.objects.create(nombre='A1')
+
+    def setUp(self):
+        self.inventario = Inventario.objects.create(
+            producto=self.producto, ubicacion=self.ubicacion, empresa=self.empresa, cantidad=10
+        )
+
+    def _pedido(self, cantidad=4):
+        pedido = PedidoTransporte.objects.create(
+            cliente=self.cliente, conductor=self.conductor, tipo_servicio='BODEGAJE_SALIDA', destino='Calle 1',
+            requiere_fotos_inicio=False, requiere_fotos_fin=False, requiere_confirmacion_cliente=False,
+        )
+        ItemPedido.objects.create(pedido=pedido, producto=self.producto, cantidad=cantidad)
+        reservar_stock(self.empresa, [LineaRetiro(self.producto, cantidad)], pedido)
+        return pedido
+
+    def _vencer(self, pedido):
+        ReservaStock.objects.filter(pedido=pedido).update(vence_en=timezone.now() - timedelta(minutes=1))
+
+    def test_iniciar_consume_la_reserva(self):
+        pedido = self._pedido()
+        aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 6)
+        self.assertEqual(ReservaStock.objects.get(pedido=pedido).estado, 'CONSUMIDA')
+
+    def test_reserva_vencida_y_liberada_igual_descuenta(self):
+        pedido = self._pedido()
+        self._vencer(pedido)
+        self.assertEqual(liberar_reservas_vencidas(), 1)
+
+        aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 6)
+        self.assertEqual(PedidoTransporte.objects.get(pk=pedido.pk).estado, 'en_curso')
+
+    def test_reserva_parcial_descuenta_el_resto(self):
+        pedido = self._pedido(cantidad=4)
+        # Solo quedan 3 unidades reservadas de las 4 del pedido
+        ReservaStock.objects.filter(pedido=pedido).update(cantidad=3)
+
+        aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 6)
+
+    def test_sin_stock_tras_liberar_no_inicia(self):
+        pedido = self._pedido(cantidad=4)
+        self._vencer(pedido)
+        liberar_reservas_vencidas()
+        # Otro pedido toma lo que quedó libre
+        self._pedido(cantidad=8)
+
+        with self.assertRaises(TransicionInvalida) as error:
+            aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        self.assertEqual(error.exception.codigo, 409)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 10)
+        self.assertEqual(PedidoTransporte.objects.get(pk=pedido.pk).estado, 'pendiente')
+
+    def test_fila_reservada_no_se_borra(self):
+        pedido = self._pedido(cantidad=4)
+        self._vencer(pedido)
+        Inventario.objects.filter(pk=self.inventario.pk).update(cantidad=0)
+
+        self.assertEqual(borrar_filas_vacias([self.inventario.pk]), set())
+        with self.assertRaises(ProtectedError):
+            self.inventario.delete()
+        self.assertTrue(ReservaStock.objects.filter(pedido=pedido, estado='ACTIVA').exists())
+
+    def _cambiar_estado(self, pedido, estado):
+        # Cambio manual de Admin/Jefe (PATCH estado)
+        serializer = PedidoTransporteSerializer(PedidoTransporte.objects.get(pk=pedido.pk), data={'estado': estado}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+    def test_volver_a_en_curso_no_descuenta_dos_veces(self):
+        pedido = self._pedido()
+        aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        aplicar_transicion(pedido.pk, 'finalizar', conductor=self.conductor)
+
+        self._cambiar_estado(pedido, 'en_curso')
+        self._cambiar_estado(pedido, 'pendiente')
+        self._cambiar_estado(pedido, 'en_curso')
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 6)
+
+    def test_en_curso_manual_descuenta_una_vez(self):
+        pedido = self._pedido()
+        self._vencer(pedido)
+        liberar_reservas_vencidas()
+
+        self._cambiar_estado(pedido, 'en_curso')
+        self._cambiar_estado(pedido, 'pendiente')
+        aplicar_transicion(pedido.pk, 'iniciar', conductor=self.conductor)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.cantidad, 6)
+
+
+class VersionRemisionTests(TestCase):
+    """La versión (clave de caché y ETag) de la remisión cambia si cambia algo que el PDF muestra."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Usuario.objects.create_user(
+            'cli-2', 'pw', rol=Rol.objects.get_or_create(nombre='cliente')[0], empresa=Empresa.objects.create(nombre='Empresa 2')
+        )
+        cls.conductor = Usuario.objects.create_user('cond-2', 'pw', rol=Rol.objects.get_or_create(nombre='conductor')[0])
+        cls.pedido = PedidoTransporte.objects.create(cliente=cls.cliente, conductor=cls.conductor, destino='Calle 1')
+
+    def _version(self):
+        return version_remision(queryset_remision().get(pk=self.pedido.pk))
 
-# Create your tests here.
+    def test_renombrar_cliente_o_conductor_cambia_la_version(self):
+        inicial = self._version()
+        Usuario.objects.filter(pk=self.cliente.pk).update(nombre='Ana')
+        con_cliente = self._version()
+        self.assertNotEqual(con_cliente, inicial)
+        Usuario.objects.filter(pk=self.conductor.pk).update(apellido='Pérez')
+        self.assertNotEqual(self._version(), con_cliente)
@@ -0,0 +1,136 @@
+# backend/proyecto/apps/transporte/transiciones.py
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.bodegaje.stock import LineaRetiro, StockInsuficienteError, consumir_reservas, liberar_reservas
+
+from .models import ItemPedido, PedidoTransporte
+from .remisiones import invalidar_cache
+
+
+@dataclass(frozen=True)
+class Transicion:
+    origenes: tuple         # Estados desde los que se permite
+    destino: str
+    campo_fecha: str = None # Fecha que se sella con la hora de la transición
+    precondiciones: Q = Q() # Requisitos del pedido (fotos, confirmación)
+    mensaje_precondicion: str = ''
+
+
+_FOTOS_INICIO_OK = Q(requiere_fotos_inicio=False) | Q(fotos_inicio_completas=True)
+_FOTOS_FIN_OK = Q(requiere_fotos_fin=False) | Q(fotos_fin_completas=True)
+_CONFIRMACION_OK = Q(requiere_confirmacion_cliente=False) | Q(confirmacion_cliente_realizada=True)
+
+# Máquina de estados del pedido: pendiente -> en_curso -> finalizado (o cancelado)
+TRANSICIONES = {
+    'iniciar': Transicion(
+        origenes=('pendiente',), destino='en_curso', campo_fecha='fecha_inicio',
+        precondiciones=_FOTOS_INICIO_OK,
+        mensaje_precondicion='Faltan las fotos de inicio requeridas.',
+    ),
+    'finalizar': Transicion(
+        origenes=('en_curso',), destino='finalizado', campo_fecha='fecha_fin',
+        precondiciones=_FOTOS_FIN_OK & _CONFIRMACION_OK,
+        mensaje_precondicion='Faltan las fotos de finalización o la confirmación del cliente.',
+    ),
+    'cancelar': Transicion(
+        origenes=('pendiente', 'en_curso'), destino='cancelado',
+    ),
+}
+
+# Lo que puede hacer el conductor asignado; Admin/Jefe pueden aplicar cualquiera
+ACCIONES_CONDUCTOR = ('iniciar', 'finalizar')
+
+
+class TransicionInvalida(Exception):
+    """La transición no se aplicó; 'codigo' es el status HTTP sugerido."""
+    def __init__(self, detalle, codigo=409, estado_actual=None):
+        super().__init__(detalle)
+        self.detalle = detalle
+        self.codigo = codigo
+        self.estado_actual = estado_actual
+
+
+@dataclass(frozen=True)
+class ResultadoTransicion:
+    pedido_id: int
+    accion: str
+    estado: str
+    fecha: object = None # fecha_inicio / fecha_fin sellada, si aplica
+
+
+def aplicar_transicion(pedido_id, accion, conductor=None, usuario=None):
+    """
+    Aplica la transición con un único UPDATE condicional:
+        UPDATE pedido SET estado=<destino>, fecha_x=now
+        WHERE id=<id> AND estado IN <origenes> AND <precondiciones> [AND conductor_id=<conductor>]
+    Si dos peticiones compiten (doble toque), solo una actualiza la fila; la
+    otra recibe 409. No hay SELECT previo ni re-lectura: el nuevo estado se
+    conoce por construcción. Solo cuando falla se lee la fila para explicar por qué.
+    En la misma transacción se aplican los efectos sobre las reservas de stock.
+    """
+    transicion = TRANSICIONES.get(accion)
+    if transicion is None:
+        raise TransicionInvalida(f"Acción '{accion}' no reconocida. Opciones: {', '.join(TRANSICIONES)}.", 400)
+
+    ahora = timezone.now()
+    filtro = Q(pk=pedido_id, estado__in=transicion.origenes) & transicion.precondiciones
+    if conductor is not None:
+        filtro &= Q(conductor_id=conductor.pk)
+    cambios = {'estado': transicion.destino}
+    if transicion.campo_fecha:
+        cambios[transicion.campo_fecha] = ahora
+
+    with transaction.atomic():
+        if PedidoTransporte.objects.filter(filtro).update(**cambios):
+            # Si el stock reservado ya no alcanza, la excepción revierte también el UPDATE
+            efectos_de_estado(pedido_id, transicion.destino, usuario=usuario or conductor)
+            # update() no dispara post_save: se invalida la remisión a mano
+            transaction.on_commit(lambda: invalidar_cache(pedido_id))
+            return ResultadoTransicion(pedido_id, accion, transicion.destino, ahora if transicion.campo_fecha else None)
+
+    raise _diagnosticar(pedido_id, transicion, conductor)
+
+
+def efectos_de_estado(pedido_id, destino, usuario=None):
+    """
+    Reservas de stock de los retiros de bodega: al pasar a en_curso se
+    descuentan de verdad (el conductor retira la mercancía), al cancelar se liberan.
+    El descuento se hace una sola vez por pedido: si Admin/Jefe lo devuelve a
+    en_curso (p. ej. finalizado -> en_curso) el stock ya salió y no se toca.
+    """
+    if destino == 'en_curso':
+        # UPDATE condicional: solo la primera vez (y solo una de dos peticiones concurrentes) marca el pedido
+        if not PedidoTransporte.objects.filter(pk=pedido_id, stock_retirado=False).update(stock_retirado=True):
+            return
+        # Las líneas del pedido: lo que ya no esté reservado (reserva vencida y liberada) se retira igual
+        items = list(ItemPedido.objects.filter(pedido_id=pedido_id).select_related('producto', 'pedido__cliente__empresa'))
+        try:
+            consumir_reservas(
+                pedido_id,
+                empresa=items[0].pedido.cliente.empresa if items else None,
+                lineas=[LineaRetiro(item.producto, item.cantidad) for item in items],
+                usuario=usuario,
+                motivo=f"Retiro de bodega para Pedido {pedido_id}.",
+            )
+        except StockInsuficienteError as e:
+            raise TransicionInvalida(f"No se puede iniciar: el stock del pedido ya no está disponible. {' '.join(e.errores)}", 409, 'pendiente')
+    elif destino == 'cancelado':
+        liberar_reservas(pedido_id)
+
+
+def _diagnosticar(pedido_id, transicion, conductor):
+    fila = PedidoTransporte.objects.filter(pk=pedido_id).values('estado', 'conductor_id').first()
+    if fila is None:
+        return TransicionInvalida("Pedido no encontrado.", 404)
+    if conductor is not None and fila['conductor_id'] != conductor.pk:
+        return TransicionInvalida("No tienes permiso para modificar este pedido.", 403, fila['estado'])
+    if fila['estado'] not in transicion.origenes:
+        return TransicionInvalida(
+            f"No se puede pasar a '{transicion.destino}' desde '{fila['estado']}' "
+            f"(se esperaba {' o '.join(transicion.origenes)}).", 409, fila['estado']
+        )
+    return TransicionInvalida(transicion.mensaje_precondicion, 409, fila['estado'])
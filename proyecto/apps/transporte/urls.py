@@ -10,9 +10,14 @@ from .views import (
     SimplePedidoTestView,
     ClientePedidoSimpleCreateView,
     PruebaEntregaUploadView,
+    PruebasEntregaLoteUploadView,
+    SesionSubidaPruebaCreateView,
+    SesionSubidaPruebaView,
+    SesionSubidaPruebaFinalizarView,
     ConfirmacionClienteView,
     HistorialMesClienteList,
     RemisionPDFView,
+    RemisionesZipView,
     VehiculoViewSet,
     TipoVehiculoViewSet
 )
@@ -26,11 +31,19 @@ router.register(r'tipos-vehiculo', TipoVehiculoViewSet, basename='tipovehiculo')
 
 urlpatterns = [
     path('pedidos/<int:pk>/remision/', RemisionPDFView.as_view(), name='pedido-remision-pdf'),
+    # Descarga masiva: GET /api/transporte/remisiones/zip/?year=&month=&empresa=&conductor=&ids=
+    path('remisiones/zip/', RemisionesZipView.as_view(), name='remisiones-zip'),
     # Esperar post para recibir la confirmación del cliente
     path('confirmar/<uuid:token>/', ConfirmacionClienteView.as_view(), name='confirmar-cliente'),
 
     # Espera POST a /api/transporte/pedidos/<pedido_pk>/subir_prueba/
     path('pedidos/<int:pedido_pk>/subir_prueba/', PruebaEntregaUploadView.as_view(), name='subir-prueba-entrega'),
+    # Varias fotos en una petición: POST /api/transporte/pedidos/<pedido_pk>/subir_pruebas/
+    path('pedidos/<int:pedido_pk>/subir_pruebas/', PruebasEntregaLoteUploadView.as_view(), name='subir-pruebas-lote'),
+    # Subida reanudable por partes (redes móviles débiles): sesión -> PUT trozos -> finalizar
+    path('pedidos/<int:pedido_pk>/subir_prueba/sesiones/', SesionSubidaPruebaCreateView.as_view(), name='subir-prueba-sesion'),
+    path('subidas/<uuid:sesion_id>/', SesionSubidaPruebaView.as_view(), name='subida-prueba-trozos'),
+    path('subidas/<uuid:sesion_id>/finalizar/', SesionSubidaPruebaFinalizarView.as_view(), name='subida-prueba-finalizar'),
     
     # Espera GET a /api/transporte/pedidos/<pedido_pk>/qr_data/
     path('pedidos/<int:pedido_pk>/qr_data/', GenerarQRDataView.as_view(), name='pedido-qr-data'),
@@ -2,15 +2,20 @@
 
 from rest_framework import generics, status, viewsets
 from rest_framework.response import Response
+from rest_framework.decorators import action
 from rest_framework.parsers import MultiPartParser, FormParser # Para manejar subida de archivos
 from django.shortcuts import get_object_or_404 
 from .models import PedidoTransporte, PruebaEntrega, ConfirmacionCliente, Vehiculo, TipoVehiculo
+from .models import SesionSubidaPrueba
 from .serializers import PedidoTransporteSerializer, PruebaEntregaSerializer, TipoVehiculoSerializer
+from .serializers import SesionSubidaPruebaSerializer
 from apps.usuarios.permissions import IsConductor
+from apps.bodegaje.exportar import bloques_para_respuesta
+from apps.usuarios.principal import principal_de
 from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import APIException, ValidationError
 from django.utils import timezone
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError as DjangoValidationError
 from django.db.models import Q
 from django.db import transaction
 import logging
@@ -18,20 +23,64 @@ from django.conf import settings
 from rest_framework.views import APIView
 # Asegúrate que IsCliente y otros permisos necesarios estén importados
 from proyecto.apps.usuarios.permissions import IsCliente, IsConductor, IsJefeEmpresa
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML, CSS # Importa WeasyPrint
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
 from django.conf import settings # Para buscar MEDIA_ROOT si usas fotos
 import os
+from datetime import datetime
 from apps.usuarios.permissions import IsJefeEmpresa
 from .serializers import VehiculoSerializer
+from .pagination import PedidoFechaCreacionPagination, PedidoFechaFinPagination
+from .remisiones import queryset_remision, version_remision, obtener_pdf_remision
+from .remisiones import PoolRemisionesSaturado, RenderRemisionTimeout, zip_remisiones
+from .transiciones import TRANSICIONES, ACCIONES_CONDUCTOR, TransicionInvalida, aplicar_transicion
+from .subidas import TrozoInvalidoError, ArchivoTemporalSubida, escribir_trozo, ruta_temporal, borrar_temporal, purgar_sesiones_vencidas
 
 # Importa el modelo y el serializer principal
 from .models import PedidoTransporte    
 from .serializers import PedidoTransporteSerializer, ConfirmacionClienteSerializer
+from .serializers import PedidoTransporteListSerializer, campos_expandidos
 
 logger = logging.getLogger(__name__)
 
+
+def _rango_mes_solicitado(query_params):
+    """
+    Devuelve (inicio, fin) del mes pedido en ?year=&month= (por defecto el actual)
+    como rango semiabierto [inicio, fin) en la zona horaria local.
+    Filtrar fecha_fin por rango (en vez de __year/__month) permite usar índices.
+    """
+    now = timezone.localtime()
+    try:
+        selected_year = int(query_params.get('year', now.year))
+        selected_month = int(query_params.get('month', now.month))
+        if not 1 <= selected_month <= 12: selected_month = now.month
+        if not 1 <= selected_year <= 9998: selected_year = now.year
+    except (TypeError, ValueError):
+        selected_year = now.year
+        selected_month = now.month
+    inicio = timezone.make_aware(datetime(selected_year, selected_month, 1))
+    if selected_month == 12:
+        fin = timezone.make_aware(datetime(selected_year + 1, 1, 1))
+    else:
+        fin = timezone.make_aware(datetime(selected_year, selected_month + 1, 1))
+    return inicio, fin
+
+def _con_relaciones_expandidas(queryset, request):
+    """
+    Precarga solo las relaciones que PedidoTransporteListSerializer va a
+    serializar según ?expand=, para no traer fotos/items/firmas que no se usan.
+    """
+    expandir = campos_expandidos(request, PedidoTransporteListSerializer.Meta.campos_expandibles)
+    if 'items_pedido' in expandir:
+        queryset = queryset.prefetch_related('items_pedido__producto', 'items_pedido__asignaciones__ubicacion')
+    if 'pruebas_entrega' in expandir:
+        queryset = queryset.prefetch_related('pruebas_entrega__subido_por')
+    if 'confirmacion_cliente' in expandir:
+        # La lista nunca muestra la firma: no se trae el data URL legado
+        queryset = queryset.select_related('confirmacion_cliente').defer('confirmacion_cliente__firma_imagen_base64')
+    return queryset
+
 class TipoVehiculoViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestionar los Tipos de Vehículo (CRUD).
@@ -61,58 +110,116 @@ class VehiculoViewSet(viewsets.ModelViewSet):
 
 # --- FIN NUEVO VIEWSET ---
 
+def _respuesta_reintentar(detalle, codigo):
+    """Respuesta de back-pressure con cabecera Retry-After (segundos)."""
+    response = Response({"detail": detalle}, status=codigo)
+    response['Retry-After'] = str(getattr(settings, 'REMISION_PDF_RETRY_AFTER', 5))
+    return response
+
 class RemisionPDFView(APIView):
     permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa)] # Define quién puede generar remisiones
 
     def get(self, request, pk, format=None):
         # Obtener el pedido o devolver 404
         try:
-            pedido = PedidoTransporte.objects.select_related(
-                'cliente', 'conductor', 'cliente__empresa', 'confirmacion_cliente'
-            ).prefetch_related(
-                'items_pedido__producto', # Precarga items y producto si es BODEGAJE_SALIDA
-                # 'pruebas_entrega' # Descomenta si quieres añadir fotos al PDF
-            ).get(pk=pk)
+            pedido = queryset_remision().get(pk=pk)
         except PedidoTransporte.DoesNotExist:
             return Response({"detail": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Preparar contexto para la plantilla HTML
-        context = {
-            'pedido': pedido,
-            'items': pedido.items_pedido.all() if pedido.tipo_servicio == 'BODEGAJE_SALIDA' else None,
-            # Podrías añadir más datos si son necesarios
-        }
-
-        # Renderizar la plantilla HTML a un string
-        html_string = render_to_string('transporte/remision_template.html', context)
-
-        # Crear el PDF usando WeasyPrint
-        # Añadimos una base_url para que WeasyPrint pueda encontrar archivos estáticos/media si los usas en el template
-        # base_url = request.build_absolute_uri('/') # Opción 1: Base URL de la request
-        base_url = settings.BASE_DIR # Opción 2: Directorio base del proyecto (útil para rutas locales de CSS/imágenes si no usas static/media)
-
-        try:
-            html = HTML(string=html_string, base_url=base_url)
-            # Puedes añadir CSS externo si lo prefieres:
-            # css_path = os.path.join(settings.STATIC_ROOT, 'css/remision_styles.css') # Ejemplo
-            # main_doc = html.render(stylesheets=[CSS(filename=css_path)])
-            main_doc = html.render() # Renderiza sin CSS externo por ahora
-            pdf_bytes = main_doc.write_pdf()
-
-            # Crear la respuesta HTTP con el PDF
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            # Opcional: Forzar descarga con nombre de archivo
-            # response['Content-Disposition'] = f'attachment; filename="remision_pedido_{pedido.id}.pdf"'
-            # Opcional: Mostrar en el navegador en lugar de descargar
-            response['Content-Disposition'] = f'inline; filename="remision_pedido_{pedido.id}.pdf"'
-
+        # La versión resume los datos que muestra la plantilla: sirve de clave de caché y de ETag
+        version = version_remision(pedido)
+        etag = f'"{version}"'
+        etags_cliente = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in etags_cliente or '*' in etags_cliente:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
             return response
 
+        try:
+            # Usa el PDF en caché si existe para esta versión; si no, lo renderiza (en el pool) y lo guarda
+            pdf_bytes, _ = obtener_pdf_remision(pedido, version)
+        except PoolRemisionesSaturado:
+            logger.warning(f"Pool de remisiones saturado; se rechaza el PDF del pedido {pk}")
+            return _respuesta_reintentar("Hay demasiadas remisiones generándose. Intenta de nuevo en unos segundos.",
+                                         status.HTTP_429_TOO_MANY_REQUESTS)
+        except RenderRemisionTimeout:
+            logger.error(f"Timeout generando PDF para pedido {pk}")
+            return _respuesta_reintentar("La generación del PDF tardó demasiado. Intenta de nuevo.",
+                                         status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             # Manejar errores de WeasyPrint o renderizado
-            print(f"Error generando PDF para pedido {pk}: {e}")
+            logger.error(f"Error generando PDF para pedido {pk}: {e}", exc_info=True)
             return Response({"detail": f"Error al generar el PDF: {e}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        # Crear la respuesta HTTP con el PDF
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        # Mostrar en el navegador en lugar de descargar
+        response['Content-Disposition'] = f'inline; filename="remision_pedido_{pedido.id}.pdf"'
+        response['ETag'] = etag
+        # El navegador puede guardarlo, pero debe revalidar con If-None-Match
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+def _lista_ids(valor):
+    """'1,2,3' -> [1, 2, 3]; lanza ValidationError si algún id no es entero."""
+    try:
+        return [int(parte) for parte in valor.split(',') if parte.strip()]
+    except ValueError:
+        raise ValidationError({"ids": "Debe ser una lista de ids separados por coma."})
+
+
+class RemisionesZipView(APIView):
+    """
+    Descarga masiva de remisiones en un ZIP (cierre de mes, facturación).
+    Filtros (al menos uno):
+      ?year=&month=  pedidos finalizados en ese mes
+      ?empresa=<id>  pedidos de clientes de esa empresa
+      ?conductor=<id>
+      ?ids=1,2,3
+    Los pedidos se cargan en lotes con todas sus relaciones, los PDF en caché
+    se reutilizan y el resto se renderiza en paralelo en el pool. El ZIP se
+    envía por trozos a medida que cada PDF está listo.
+    """
+    permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa)]
+
+    def get(self, request, format=None):
+        params = request.query_params
+        filtros = Q()
+        if 'year' in params or 'month' in params:
+            inicio, fin = _rango_mes_solicitado(params)
+            filtros &= Q(estado='finalizado', fecha_fin__gte=inicio, fecha_fin__lt=fin)
+        if params.get('empresa'):
+            filtros &= Q(cliente__empresa_id=params['empresa'])
+        if params.get('conductor'):
+            filtros &= Q(conductor_id=params['conductor'])
+        if params.get('ids'):
+            filtros &= Q(pk__in=_lista_ids(params['ids']))
+        if not filtros:
+            return Response({"detail": "Indica al menos un filtro: year/month, empresa, conductor o ids."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            pedidos = queryset_remision().filter(filtros).order_by('id')
+            total = pedidos.count()
+        except (ValueError, DjangoValidationError):
+            return Response({"detail": "Filtros inválidos."}, status=status.HTTP_400_BAD_REQUEST)
+        maximo = getattr(settings, 'REMISION_ZIP_MAX_PEDIDOS', 1000)
+        if total == 0:
+            return Response({"detail": "No hay pedidos para los filtros indicados."}, status=status.HTTP_404_NOT_FOUND)
+        if total > maximo:
+            return Response({"detail": f"La exportación supera el máximo de {maximo} remisiones. Acota los filtros."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # iterator(chunk_size) mantiene el prefetch por lote: pocas consultas y memoria acotada.
+        # Bajo ASGI (UvicornWorker) se itera de forma asíncrona: si no, Django arma el ZIP entero antes de enviarlo
+        response = StreamingHttpResponse(
+            bloques_para_respuesta(request, zip_remisiones(pedidos.iterator(chunk_size=100))),
+            content_type='application/zip',
+        )
+        response['Content-Disposition'] = 'attachment; filename="remisiones.zip"'
+        return response
+
 
 # Vista para formulario de confirmación de cliente
 
@@ -224,6 +331,81 @@ class GenerarQRDataView(APIView):
         return Response({'confirmation_url': confirmation_url})
 
 
+def _validar_subida_prueba(pedido, usuario, tipo_foto):
+    """Dueño del pedido y etapa correcta para el tipo de foto (subida directa o por partes)."""
+    if pedido.conductor_id != usuario.pk: # Sin cargar el Usuario conductor
+        raise PermissionDenied("No tienes permiso para subir pruebas para este pedido.")
+
+    # --- Validar Estado vs Tipo de Foto ---
+    etapa_actual_pedido = pedido.estado # pendiente, en_curso
+
+    # Determinar etapa esperada para este tipo de foto
+    etapa_esperada = None
+    if tipo_foto.startswith('INICIO'): etapa_esperada = 'pendiente'
+    elif tipo_foto.startswith('FIN'): etapa_esperada = 'en_curso'
+
+    if not etapa_esperada:
+        raise ValidationError("Tipo de foto no reconocido o inválido.")
+    if etapa_actual_pedido != etapa_esperada:
+         raise ValidationError(f"No se puede subir foto de tipo '{tipo_foto}' si el pedido está en estado '{etapa_actual_pedido}'. Se esperaba '{etapa_esperada}'.")
+    # --- Fin Validación Estado ---
+
+
+def _actualizar_flags_fotos(pedido, tipos_nuevos):
+    """
+    Marca fotos_inicio_completas / fotos_fin_completas si ya están las fotos requeridas.
+    tipos_nuevos: tipos de foto recién guardados (uno en la subida simple, varios en lote).
+    Se llama una sola vez por petición, después de guardar todas las fotos.
+    """
+    tipos_nuevos = set(tipos_nuevos)
+    # --- Actualizar estado de flags en el Pedido ---
+    try:
+        updated_fields = []
+        # Lógica para fotos de INICIO (generalmente solo se requiere una)
+        if pedido.requiere_fotos_inicio and not pedido.fotos_inicio_completas:
+             # Asumimos que una foto de INICIO_GEN es suficiente
+             if 'INICIO_GEN' in tipos_nuevos:
+                pedido.fotos_inicio_completas = True
+                updated_fields.append('fotos_inicio_completas')
+                print(f"Marcando fotos_inicio_completas=True para Pedido {pedido.id}")
+
+        # Lógica para fotos de FIN (requiere tipos específicos)
+        if any(t.startswith('FIN') for t in tipos_nuevos) and pedido.requiere_fotos_fin and not pedido.fotos_fin_completas:
+             # Definir qué tipos de foto son OBLIGATORIOS para marcar como completas las de FIN
+             # Esto podría depender del tipo de servicio del pedido
+             tipos_requeridos_fin = ['FIN_MERC', 'FIN_REC'] # Ejemplo para mercancía
+             # Para otros tipos de servicio podrías requerir solo 'FIN_GEN', etc.
+             # if pedido.tipo_servicio == 'PASAJEROS': tipos_requeridos_fin = ['FIN_GEN']
+
+             # Solo se consulta la BD por los tipos requeridos que no llegaron en esta petición
+             faltantes = [t for t in tipos_requeridos_fin if t not in tipos_nuevos]
+             fotos_fin_existentes = set()
+             if faltantes:
+                 fotos_fin_existentes = set(PruebaEntrega.objects.filter(
+                     pedido=pedido,
+                     etapa='FIN', # Filtrar por etapa sigue siendo útil
+                     tipo_foto__in=faltantes # Solo contar las relevantes
+                 ).values_list('tipo_foto', flat=True)) # Obtener lista de tipos existentes
+
+             # Verificar si todos los tipos requeridos están presentes
+             todos_presentes = all(tipo_req in fotos_fin_existentes for tipo_req in faltantes)
+
+             if todos_presentes:
+                 pedido.fotos_fin_completas = True
+                 updated_fields.append('fotos_fin_completas')
+                 print(f"Marcando fotos_fin_completas=True para Pedido {pedido.id} (Tipos requeridos {tipos_requeridos_fin} presentes)")
+             else:
+                  print(f"Pedido {pedido.id}: Aún faltan tipos de fotos de FIN. Existentes: {sorted(fotos_fin_existentes | tipos_nuevos)}, Requeridos: {tipos_requeridos_fin}")
+
+
+        if updated_fields:
+            pedido.save(update_fields=updated_fields)
+            print(f"Pedido {pedido.id} actualizado, campos: {updated_fields}")
+
+    except Exception as e:
+        print(f"ERROR al actualizar flags del pedido {pedido.id} tras subir prueba: {e}")
+
+
 class PruebaEntregaUploadView(generics.CreateAPIView):
     serializer_class = PruebaEntregaSerializer
     permission_classes = [IsAuthenticated, IsConductor]
@@ -232,80 +414,175 @@ class PruebaEntregaUploadView(generics.CreateAPIView):
     def perform_create(self, serializer):
         pedido_id = self.kwargs.get('pedido_pk')
         pedido = get_object_or_404(PedidoTransporte, pk=pedido_id)
+        tipo_foto = serializer.validated_data.get('tipo_foto')
+        _validar_subida_prueba(pedido, self.request.user, tipo_foto)
 
-        if pedido.conductor != self.request.user:
-            raise PermissionDenied("No tienes permiso para subir pruebas para este pedido.")
+        # Guardar la prueba (el modelo save() calculará la etapa)
+        instancia_prueba = serializer.save(pedido=pedido, subido_por=self.request.user)
+        print(f"Prueba de entrega guardada: ID {instancia_prueba.id} para Pedido {pedido.id}, Tipo Foto {tipo_foto}")
 
-        # --- Validar Estado vs Tipo de Foto ---
-        tipo_foto = serializer.validated_data.get('tipo_foto')
-        etapa_actual_pedido = pedido.estado # pendiente, en_curso
+        _actualizar_flags_fotos(pedido, [tipo_foto])
 
-        # Determinar etapa esperada para este tipo de foto
-        etapa_esperada = None
-        if tipo_foto.startswith('INICIO'): etapa_esperada = 'pendiente'
-        elif tipo_foto.startswith('FIN'): etapa_esperada = 'en_curso'
+    def get_serializer_context(self):
+        # Pasamos el request al contexto para que el serializer pueda construir URLs absolutas
+        context = super().get_serializer_context()
+        context['request'] = self.request
+        return context
 
-        if not etapa_esperada:
-            raise ValidationError("Tipo de foto no reconocido o inválido.")
-        if etapa_actual_pedido != etapa_esperada:
-             raise ValidationError(f"No se puede subir foto de tipo '{tipo_foto}' si el pedido está en estado '{etapa_actual_pedido}'. Se esperaba '{etapa_esperada}'.")
-        # --- Fin Validación Estado ---
 
+class PruebasEntregaLoteUploadView(APIView):
+    """
+    Sube varias fotos de prueba en una sola petición multipart, p. ej. las de FIN:
+      tipo_foto=FIN_MERC, foto=<archivo>, tipo_foto=FIN_REC, foto=<archivo>
+    (las listas 'tipo_foto' y 'foto' se emparejan por posición).
+    Se valida todo antes de escribir, se guarda en una transacción y los flags
+    del pedido se actualizan una sola vez al final.
+    """
+    permission_classes = [IsAuthenticated, IsConductor]
+    parser_classes = [MultiPartParser, FormParser]
 
-        # Guardar la prueba (el modelo save() calculará la etapa)
-        instancia_prueba = serializer.save(pedido=pedido, subido_por=self.request.user)
-        print(f"Prueba de entrega guardada: ID {instancia_prueba.id} para Pedido {pedido.id}, Tipo Foto {tipo_foto}")
+    def post(self, request, pedido_pk, format=None):
+        tipos = request.data.getlist('tipo_foto')
+        fotos = request.FILES.getlist('foto')
+        if not fotos or len(tipos) != len(fotos):
+            raise ValidationError("Envía la misma cantidad de valores 'tipo_foto' y archivos 'foto' (al menos uno).")
+        maximo = getattr(settings, 'SUBIDA_LOTE_MAX_FOTOS', 10)
+        if len(fotos) > maximo:
+            raise ValidationError(f"Máximo {maximo} fotos por petición.")
+
+        # Dueño y etapa primero: no se procesan imágenes de una petición que se va a rechazar
+        pedido = get_object_or_404(PedidoTransporte, pk=pedido_pk)
+        for tipo in set(tipos):
+            _validar_subida_prueba(pedido, request.user, tipo)
+
+        # Validación de datos y procesamiento de imágenes de todas las fotos antes de tocar la BD
+        serializer = PruebaEntregaSerializer(
+            data=[{'tipo_foto': tipo, 'foto': foto} for tipo, foto in zip(tipos, fotos)],
+            many=True, context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            # Se relee bloqueado: el estado pudo cambiar mientras se procesaban las imágenes
+            pedido = PedidoTransporte.objects.select_for_update().get(pk=pedido.pk)
+            for tipo in set(tipos):
+                _validar_subida_prueba(pedido, request.user, tipo)
+            instancias = serializer.save(pedido=pedido, subido_por=request.user)
+            logger.info(f"Pruebas de entrega guardadas en lote: IDs {[i.id for i in instancias]} para Pedido {pedido.id}, Tipos {tipos}")
+            _actualizar_flags_fotos(pedido, tipos)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+# --- Subida reanudable por partes de PruebaEntrega ---
+# 1. POST pedidos/<pedido_pk>/subir_prueba/sesiones/ {tipo_foto, nombre_archivo, tamano_total} -> {id, recibido}
+# 2. PUT  subidas/<id>/  cuerpo = bytes del trozo, cabecera Upload-Offset = posición del trozo
+#    (HEAD/GET subidas/<id>/ devuelve el offset confirmado para reanudar tras un corte)
+# 3. POST subidas/<id>/finalizar/ -> crea la PruebaEntrega (mismas validaciones que subir_prueba)
+class SesionSubidaPruebaCreateView(generics.CreateAPIView):
+    serializer_class = SesionSubidaPruebaSerializer
+    permission_classes = [IsAuthenticated, IsConductor]
+
+    def perform_create(self, serializer):
+        pedido = get_object_or_404(PedidoTransporte, pk=self.kwargs.get('pedido_pk'))
+        # Se valida desde el principio para no recibir megas que luego se rechazarían
+        _validar_subida_prueba(pedido, self.request.user, serializer.validated_data['tipo_foto'])
+        purgar_sesiones_vencidas()
+        serializer.save(pedido=pedido, conductor=self.request.user)
+
+
+class SesionSubidaPruebaView(APIView):
+    permission_classes = [IsAuthenticated, IsConductor]
+
+    def _sesion(self, request, sesion_id, bloquear=False):
+        queryset = SesionSubidaPrueba.objects.filter(conductor=request.user)
+        if bloquear:
+            queryset = queryset.select_for_update()
+        return get_object_or_404(queryset, pk=sesion_id)
+
+    def _respuesta_offset(self, sesion, codigo=status.HTTP_200_OK, detalle=None):
+        datos = {'id': str(sesion.pk), 'recibido': sesion.recibido, 'tamano_total': sesion.tamano_total}
+        if detalle:
+            datos['detail'] = detalle
+        response = Response(datos, status=codigo)
+        response['Upload-Offset'] = str(sesion.recibido)
+        return response
+
+    def get(self, request, sesion_id, format=None):
+        return self._respuesta_offset(self._sesion(request, sesion_id))
+
+    def head(self, request, sesion_id, format=None):
+        return self.get(request, sesion_id, format)
 
-        # --- Actualizar estado de flags en el Pedido ---
+    def put(self, request, sesion_id, format=None):
         try:
-            updated_fields = []
-            # Lógica para fotos de INICIO (generalmente solo se requiere una)
-            if instancia_prueba.etapa == 'INICIO' and pedido.requiere_fotos_inicio and not pedido.fotos_inicio_completas:
-                 # Asumimos que una foto de INICIO_GEN es suficiente
-                 if tipo_foto == 'INICIO_GEN':
-                    pedido.fotos_inicio_completas = True
-                    updated_fields.append('fotos_inicio_completas')
-                    print(f"Marcando fotos_inicio_completas=True para Pedido {pedido.id}")
-
-            # Lógica para fotos de FIN (requiere tipos específicos)
-            elif instancia_prueba.etapa == 'FIN' and pedido.requiere_fotos_fin and not pedido.fotos_fin_completas:
-                 # Definir qué tipos de foto son OBLIGATORIOS para marcar como completas las de FIN
-                 # Esto podría depender del tipo de servicio del pedido
-                 tipos_requeridos_fin = ['FIN_MERC', 'FIN_REC'] # Ejemplo para mercancía
-                 # Para otros tipos de servicio podrías requerir solo 'FIN_GEN', etc.
-                 # if pedido.tipo_servicio == 'PASAJEROS': tipos_requeridos_fin = ['FIN_GEN']
-
-                 # Contar las fotos existentes para CADA tipo requerido para ESTE pedido
-                 fotos_fin_existentes = PruebaEntrega.objects.filter(
-                     pedido=pedido,
-                     etapa='FIN', # Filtrar por etapa sigue siendo útil
-                     tipo_foto__in=tipos_requeridos_fin # Solo contar las relevantes
-                 ).values_list('tipo_foto', flat=True) # Obtener lista de tipos existentes
+            offset = int(request.headers['Upload-Offset'])
+            longitud = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({"detail": "Se requiere la cabecera Upload-Offset numérica."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            sesion = self._sesion(request, sesion_id, bloquear=True)
+            try:
+                # Se lee el cuerpo directo del stream: el trozo va al disco sin pasar por los parsers
+                escribir_trozo(sesion, request.stream, offset, longitud)
+            except TrozoInvalidoError as e:
+                # 409 con el offset confirmado: el cliente reanuda desde ahí
+                return self._respuesta_offset(sesion, status.HTTP_409_CONFLICT, str(e))
+        return self._respuesta_offset(sesion)
 
-                 # Verificar si todos los tipos requeridos están presentes
-                 todos_presentes = all(tipo_req in fotos_fin_existentes for tipo_req in tipos_requeridos_fin)
+    def delete(self, request, sesion_id, format=None):
+        sesion = self._sesion(request, sesion_id)
+        borrar_temporal(ruta_temporal(sesion))
+        sesion.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-                 if todos_presentes:
-                     pedido.fotos_fin_completas = True
-                     updated_fields.append('fotos_fin_completas')
-                     print(f"Marcando fotos_fin_completas=True para Pedido {pedido.id} (Tipos requeridos {tipos_requeridos_fin} presentes)")
-                 else:
-                      print(f"Pedido {pedido.id}: Aún faltan tipos de fotos de FIN. Existentes: {list(fotos_fin_existentes)}, Requeridos: {tipos_requeridos_fin}")
 
+class SesionSubidaPruebaFinalizarView(APIView):
+    permission_classes = [IsAuthenticated, IsConductor]
 
-            if updated_fields:
-                pedido.save(update_fields=updated_fields)
-                print(f"Pedido {pedido.id} actualizado, campos: {updated_fields}")
+    def post(self, request, sesion_id, format=None):
+        # Sin bloqueo: una sesión completa ya no admite trozos, el archivo no cambia
+        sesion = get_object_or_404(
+            SesionSubidaPrueba.objects.select_related('pedido'), pk=sesion_id, conductor=request.user
+        )
+        if not sesion.completa:
+            return Response(
+                {"detail": "La subida está incompleta.", "recibido": sesion.recibido, "tamano_total": sesion.tamano_total},
+                status=status.HTTP_409_CONFLICT
+            )
+        # Mismas comprobaciones que la subida directa: el pedido pudo cambiar de estado mientras subía
+        _validar_subida_prueba(sesion.pedido, request.user, sesion.tipo_foto)
 
-        except Exception as e:
-            print(f"ERROR al actualizar flags del pedido {pedido.id} tras subir prueba: {e}")
+        # Decodificar, reducir y codificar a WebP (lo costoso) fuera de la transacción y del bloqueo
+        try:
+            archivo = ArchivoTemporalSubida(sesion)
+        except FileNotFoundError: # Otra petición la finalizó y borró el temporal
+            return Response({"detail": "La subida ya fue finalizada."}, status=status.HTTP_409_CONFLICT)
+        try:
+            serializer = PruebaEntregaSerializer(
+                data={'tipo_foto': sesion.tipo_foto, 'foto': archivo}, context={'request': request}
+            )
+            serializer.is_valid(raise_exception=True)
+        finally:
+            archivo.close()
 
+        # Bloqueo corto: la sesión sigue ahí (no la finalizó otra petición), el pedido sigue en la etapa y se crea la prueba
+        with transaction.atomic():
+            sesion = SesionSubidaPrueba.objects.select_for_update().select_related('pedido').filter(pk=sesion.pk).first()
+            if sesion is None:
+                return Response({"detail": "La subida ya fue finalizada."}, status=status.HTTP_409_CONFLICT)
+            pedido = sesion.pedido
+            _validar_subida_prueba(pedido, request.user, sesion.tipo_foto)
+            instancia_prueba = serializer.save(pedido=pedido, subido_por=request.user)
+            logger.info(f"Prueba de entrega guardada (subida por partes): ID {instancia_prueba.id} para Pedido {pedido.id}, Tipo Foto {sesion.tipo_foto}")
 
-    def get_serializer_context(self):
-        # Pasamos el request al contexto para que el serializer pueda construir URLs absolutas
-        context = super().get_serializer_context()
-        context['request'] = self.request
-        return context
+            _actualizar_flags_fotos(pedido, [sesion.tipo_foto])
+
+            ruta = ruta_temporal(sesion) # delete() deja la instancia sin pk
+            sesion.delete()
+            transaction.on_commit(lambda: borrar_temporal(ruta))
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
 # --- VISTA SIMPLE PARA CREAR PEDIDO (AHORA FUNCIONAL) --- Recuaerda modificar la PedidoTransporteCreateView por que es redundante y ajusat el codigo
@@ -323,7 +600,7 @@ class ClientePedidoSimpleCreateView(APIView):
         data = request.data
         logger.info(f"ClientePedidoSimpleCreateView: Intento POST por User ID {user.id} con data: {data}")
         print(f"\n--- ClientePedidoSimpleCreateView POST ---")
-        print(f"--- User: {user}, Rol: {getattr(user.rol, 'nombre', 'N/A')} ---")
+        print(f"--- User: {user}, Rol: {principal_de(request).rol or 'N/A'} ---")
         print(f"--- Data Recibida: {data} ---")
 
         serializer = None
@@ -433,8 +710,9 @@ class PedidoTransporteCreateView(generics.CreateAPIView):
 
 class PedidosConductorList(generics.ListAPIView):
     """Devuelve pedidos ACTIVOS asignados al conductor."""
-    serializer_class = PedidoTransporteSerializer
+    serializer_class = PedidoTransporteListSerializer
     permission_classes = [IsAuthenticated, IsConductor]
+    pagination_class = PedidoFechaCreacionPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -442,38 +720,26 @@ class PedidosConductorList(generics.ListAPIView):
             conductor=user
         ).exclude(
             estado__in=['finalizado', 'cancelado']
-        ).select_related('cliente').order_by('-fecha_creacion') # select_related añadido
-        logger.debug(f"Queryset count for active orders conductor {user.id}: {queryset.count()}")
-        return queryset
+        ).select_related('cliente', 'conductor').order_by('-fecha_creacion', 'id') # select_related añadido
+        return _con_relaciones_expandidas(queryset, self.request)
 
 class HistorialMesConductorList(generics.ListAPIView):
     """Devuelve pedidos FINALIZADOS del conductor para un mes/año."""
-    serializer_class = PedidoTransporteSerializer
+    serializer_class = PedidoTransporteListSerializer
     permission_classes = [IsAuthenticated, IsConductor]
+    pagination_class = PedidoFechaFinPagination
 
     def get_queryset(self):
         user = self.request.user
-        now = timezone.now()
-        try:
-            selected_year = int(self.request.query_params.get('year', now.year))
-            selected_month = int(self.request.query_params.get('month', now.month))
-            if not 1 <= selected_month <= 12: selected_month = now.month
-        except (TypeError, ValueError):
-            selected_year = now.year
-            selected_month = now.month
-        logger.debug(f"Fetching history for conductor {user.id}, year={selected_year}, month={selected_month}")
+        inicio, fin = _rango_mes_solicitado(self.request.query_params)
+        logger.debug(f"Fetching history for conductor {user.id}, desde={inicio}, hasta={fin}")
         queryset = PedidoTransporte.objects.filter(
             conductor=user, estado='finalizado',
-            fecha_fin__year=selected_year, fecha_fin__month=selected_month
+            fecha_fin__gte=inicio, fecha_fin__lt=fin
         ).select_related(
             'cliente', 'conductor'
-        ).prefetch_related(
-            # --- CORRECCIÓN AQUÍ ---
-            'pruebas_entrega', # Correcto
-            # --- FIN CORRECCIÓN ---
-            'confirmacion_cliente'
-        ).order_by('-fecha_fin')
-        return queryset
+        ).order_by('-fecha_fin', 'id')
+        return _con_relaciones_expandidas(queryset, self.request)
 
 
 # --- VIEWSET PARA GESTIÓN COMPLETA (SIN CAMBIOS NECESARIOS EN LA LÓGICA CENTRAL) ---
@@ -487,6 +753,7 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
     """
     serializer_class = PedidoTransporteSerializer
     queryset = PedidoTransporte.objects.all().select_related('cliente', 'conductor', 'cliente__empresa')
+    pagination_class = PedidoFechaCreacionPagination
 
     def get_permissions(self):
         """Define permisos por acción (sin cambios respecto a la versión anterior)."""
@@ -508,6 +775,9 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
         elif self.action in ['update', 'partial_update']:
             # Quién puede modificar? Admin, Jefe, o Conductor (solo para iniciar/finalizar)
             permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa | IsConductor)]
+        elif self.action == 'transicion':
+            # Conductor (solo sus pedidos, iniciar/finalizar) o Admin/Jefe
+            permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa | IsConductor)]
         elif self.action == 'destroy':
             # Quién puede eliminar?
             permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa)]
@@ -516,15 +786,21 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAdminUser]
         return [permission() for permission in permission_classes]
 
+    def get_serializer_class(self):
+        # La lista usa la representación compacta (?fields= / ?expand=)
+        if self.action == 'list':
+            return PedidoTransporteListSerializer
+        return super().get_serializer_class()
+
     def get_queryset(self):
         """Filtra queryset para 'list' (sin cambios)."""
-        user = self.request.user
         base_queryset = super().get_queryset()
-        if self.action == 'list' and (user.is_staff or (user.rol and user.rol.nombre == 'jefe_empresa')):
+        principal = principal_de(self.request) # Rol resuelto al autenticar: sin consulta a Rol
+        if self.action == 'list' and (principal.is_staff or principal.tiene_rol('jefe_empresa')):
              # Solo Admin/Jefe ven la lista de activos
-             return base_queryset.exclude(
+             return _con_relaciones_expandidas(base_queryset.exclude(
                  estado__in=['finalizado', 'cancelado']
-             ).order_by('-fecha_creacion')
+             ).order_by('-fecha_creacion', 'id'), self.request)
         # Para otras acciones (retrieve, etc.), se usa el queryset base.
         # Si un cliente o conductor intenta listar aquí, get_permissions lo bloquea.
         # Si necesitan listar *sus* pedidos, usan las vistas específicas (PedidosConductorList, etc.)
@@ -534,11 +810,12 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
         """Maneja PATCH, incluyendo iniciar/finalizar por conductor (sin cambios)."""
         pedido = self.get_object() # DRF maneja 404 si no existe
         user = request.user
-        logger.info(f"Partial update attempt on Pedido ID {pedido.id} (Type: {pedido.tipo_servicio}) by User {user.id} ({getattr(user.rol, 'nombre', 'N/A')}) with data: {request.data}")
+        principal = principal_de(request)
+        logger.info(f"Partial update attempt on Pedido ID {pedido.id} (Type: {pedido.tipo_servicio}) by User {user.id} ({principal.rol or 'N/A'}) with data: {request.data}")
 
         # Lógica Específica para Conductores
-        if user.rol and user.rol.nombre == 'conductor':
-            if pedido.conductor != user:
+        if principal.tiene_rol('conductor'):
+            if pedido.conductor_id != principal.usuario_id:
                 logger.warning(f"Conductor {user.id} denied PATCH on Pedido {pedido.id} (not assigned)")
                 # Usar PermissionDenied para respuesta 403 estándar
                 raise PermissionDenied('No tienes permiso para modificar este pedido.')
@@ -546,29 +823,21 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
             iniciar = request.data.get('iniciar') == 'confirmado'
             finalizar = request.data.get('finalizar') == 'confirmado'
 
-            if iniciar:
-                if pedido.estado == 'pendiente':
-                    pedido.estado = 'en_curso'
-                    pedido.fecha_inicio = timezone.now()
-                    pedido.save(update_fields=['estado', 'fecha_inicio'])
-                    logger.info(f"Pedido {pedido.id} iniciado por conductor {user.id}")
-                    serializer = self.get_serializer(pedido)
-                    return Response(serializer.data) # Status 200 OK por defecto
-                else:
-                    logger.warning(f"Conductor {user.id} intento iniciar pedido {pedido.id} no pendiente (estado: {pedido.estado})")
-                    # Devolver error claro al cliente
-                    return Response({'detail': f'El pedido no está pendiente (estado actual: {pedido.estado}).'}, status=status.HTTP_400_BAD_REQUEST)
-            elif finalizar:
-                if pedido.estado == 'en_curso':
-                    pedido.estado = 'finalizado'
-                    pedido.fecha_fin = timezone.now()
-                    pedido.save(update_fields=['estado', 'fecha_fin'])
-                    logger.info(f"Pedido {pedido.id} finalizado por conductor {user.id}")
-                    serializer = self.get_serializer(pedido)
-                    return Response(serializer.data)
-                else:
-                    logger.warning(f"Conductor {user.id} intento finalizar pedido {pedido.id} no en curso (estado: {pedido.estado})")
-                    return Response({'detail': f'El pedido no está en curso (estado actual: {pedido.estado}).'}, status=status.HTTP_400_BAD_REQUEST)
+            if iniciar or finalizar:
+                accion = 'iniciar' if iniciar else 'finalizar'
+                try:
+                    # UPDATE condicional: un doble toque no puede aplicar la transición dos veces
+                    resultado = aplicar_transicion(pedido.pk, accion, conductor=user)
+                except TransicionInvalida as e:
+                    logger.warning(f"Conductor {user.id} no pudo {accion} pedido {pedido.id}: {e.detalle}")
+                    # Este endpoint siempre respondió 400 a estados inválidos; se conserva
+                    return Response({'detail': e.detalle}, status=e.codigo if e.codigo in (403, 404) else status.HTTP_400_BAD_REQUEST)
+                logger.info(f"Pedido {pedido.id} {resultado.estado} por conductor {user.id}")
+                # Se refleja el cambio en la instancia ya cargada, sin volver a leerla
+                pedido.estado = resultado.estado
+                setattr(pedido, TRANSICIONES[accion].campo_fecha, resultado.fecha)
+                serializer = self.get_serializer(pedido)
+                return Response(serializer.data) # Status 200 OK por defecto
             else:
                  # Si conductor envía otros campos o acción no reconocida
                  logger.warning(f"Conductor {user.id} intento de PATCH no válido en pedido {pedido.id}: {request.data}")
@@ -582,11 +851,46 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
             # La llamada a super() aplicará las validaciones del serializer
             try:
                 return super().partial_update(request, *args, **kwargs)
+            except APIException:
+                # Errores de validación (400) y similares se devuelven tal cual
+                raise
             except Exception as e:
                  # Capturar errores inesperados durante la actualización estándar
                  logger.error(f"Error en super().partial_update para pedido {pedido.id} por usuario {user.id}: {e}", exc_info=True)
                  return Response({"detail": "Ocurrió un error al actualizar el pedido."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['post'], url_path='transicion')
+    def transicion(self, request, pk=None):
+        """
+        POST /pedidos/<pk>/transicion/ {"accion": "iniciar" | "finalizar" | "cancelar"}
+        Aplica la transición de estado con un único UPDATE condicional y
+        devuelve el nuevo estado sin volver a leer ni serializar el pedido.
+        """
+        user = request.user
+        accion = request.data.get('accion')
+        try:
+            pedido_id = int(pk)
+        except (TypeError, ValueError):
+            return Response({"detail": "Pedido no encontrado."}, status=status.HTTP_404_NOT_FOUND)
+        principal = principal_de(request)
+        es_conductor = principal.tiene_rol('conductor') and not principal.is_staff
+        if es_conductor and accion not in ACCIONES_CONDUCTOR:
+            raise PermissionDenied('Los conductores solo pueden iniciar o finalizar pedidos.')
+        try:
+            resultado = aplicar_transicion(pedido_id, accion, conductor=user if es_conductor else None, usuario=user)
+        except TransicionInvalida as e:
+            datos = {'detail': e.detalle}
+            if e.estado_actual:
+                datos['estado'] = e.estado_actual
+            return Response(datos, status=e.codigo)
+        logger.info(f"Pedido {pedido_id}: '{accion}' -> {resultado.estado} por usuario {user.id}")
+        return Response({
+            'id': resultado.pedido_id,
+            'estado': resultado.estado,
+            'accion': resultado.accion,
+            'fecha': resultado.fecha,
+        })
+
     # perform_create/update/destroy solo añaden logging (sin cambios)
     def perform_create(self, serializer):
         logger.info(f"Pedido creado vía ViewSet por usuario {self.request.user}")
@@ -606,31 +910,21 @@ class PedidoTransporteViewSet(viewsets.ModelViewSet):
 # --- VISTA HISTORIAL GENERAL (SIN CAMBIOS) ---
 class HistorialMesGeneralList(generics.ListAPIView):
     """Devuelve TODOS los pedidos finalizados del mes/año (Admin/Jefe)."""
-    serializer_class = PedidoTransporteSerializer
+    serializer_class = PedidoTransporteListSerializer
     permission_classes = [IsAuthenticated, (IsAdminUser | IsJefeEmpresa)]
+    pagination_class = PedidoFechaFinPagination
+
     def get_queryset(self):
-        now = timezone.now()
-        try:
-            selected_year = int(self.request.query_params.get('year', now.year))
-            selected_month = int(self.request.query_params.get('month', now.month))
-            if not 1 <= selected_month <= 12: selected_month = now.month
-        except (TypeError, ValueError):
-            selected_year = now.year
-            selected_month = now.month
-        logger.debug(f"Fetching general history for year={selected_year}, month={selected_month}")
+        inicio, fin = _rango_mes_solicitado(self.request.query_params)
+        logger.debug(f"Fetching general history desde={inicio}, hasta={fin}")
         queryset = PedidoTransporte.objects.filter(
             estado='finalizado',
-            fecha_fin__year=selected_year,
-            fecha_fin__month=selected_month
+            fecha_fin__gte=inicio,
+            fecha_fin__lt=fin
         ).select_related(
             'cliente', 'conductor', 'cliente__empresa'
-        ).prefetch_related(
-             # --- CORRECCIÓN AQUÍ ---
-            'pruebas_entrega', # Correcto
-             # --- FIN CORRECCIÓN ---
-            'confirmacion_cliente', 'items_pedido', 'items_pedido__producto'
-        ).order_by('-fecha_fin')
-        return queryset
+        ).order_by('-fecha_fin', 'id')
+        return _con_relaciones_expandidas(queryset, self.request)
     
     # --- NUEVA VISTA PARA HISTORIAL CLIENTE ---
 class HistorialMesClienteList(generics.ListAPIView):
@@ -638,42 +932,29 @@ class HistorialMesClienteList(generics.ListAPIView):
     Devuelve pedidos FINALIZADOS o CANCELADOS del cliente autenticado
     para un mes/año específico.
     """
-    serializer_class = PedidoTransporteSerializer # Reutiliza el serializer detallado
+    serializer_class = PedidoTransporteListSerializer # Compacto; ?expand= para detalle
     permission_classes = [IsAuthenticated, IsCliente] # Solo clientes autenticados
+    pagination_class = PedidoFechaFinPagination
 
     def get_queryset(self):
         user = self.request.user
-        now = timezone.now() # Para obtener fecha actual como default
-
-        # Obtener año y mes de query params, con defaults
-        try:
-            selected_year = int(self.request.query_params.get('year', now.year))
-            selected_month = int(self.request.query_params.get('month', now.month))
-            # Validación básica del mes
-            if not 1 <= selected_month <= 12:
-                selected_month = now.month
-        except (TypeError, ValueError):
-            selected_year = now.year
-            selected_month = now.month
+        # Obtener el mes de query params (?year=&month=) como rango de fechas
+        inicio, fin = _rango_mes_solicitado(self.request.query_params)
 
-        logger.debug(f"Fetching history for CLIENTE {user.id}, year={selected_year}, month={selected_month}")
+        logger.debug(f"Fetching history for CLIENTE {user.id}, desde={inicio}, hasta={fin}")
 
         # Filtrar pedidos por cliente, estado y fecha de finalización
         queryset = PedidoTransporte.objects.filter(
             cliente=user, # <-- Filtro clave: solo pedidos de este cliente
             estado__in=['finalizado', 'cancelado'], # Incluye finalizados y cancelados
-            fecha_fin__year=selected_year,
-            fecha_fin__month=selected_month
+            fecha_fin__gte=inicio,
+            fecha_fin__lt=fin
         ).select_related( # Optimiza FKs
-            'conductor' # Cliente ya es user, no necesita select_related
-        ).prefetch_related( # Optimiza ManyToMany y Reverse FKs
-            'pruebas_entrega',
-            'confirmacion_cliente',
-            'items_pedido', # Para tipo BODEGAJE_SALIDA
-            'items_pedido__producto' # Incluye info del producto en los items
-        ).order_by('-fecha_fin') # Ordenar por fecha de finalización descendente
-
-        return queryset
+            'cliente', 'conductor'
+        ).order_by('-fecha_fin', 'id') # Ordenar por fecha de finalización descendente
+
+        # Relaciones anidadas (fotos, confirmación, items) solo si se piden con ?expand=
+        return _con_relaciones_expandidas(queryset, self.request)
     
 
     
\ No newline at end of file
@@ -3,7 +3,7 @@ from django.contrib import admin
 # NO importamos UserAdmin aquí
 # NO importamos UserCreationForm/UserChangeForm de auth aquí
 from django import forms
-from .models import Usuario, Rol, Empresa
+from .models import Usuario, Rol, Empresa, TokenRevocado
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.hashers import make_password # Para hashear
 
@@ -50,7 +50,7 @@ class UsuarioCreationForm(forms.ModelForm): # <-- Hereda de forms.ModelForm
             user.username = user.email
 
         if commit:
-            user.save()
+            user.guardar_validado()
         return user
 
 
@@ -134,4 +134,10 @@ class RolAdmin(admin.ModelAdmin):
 @admin.register(Empresa)
 class EmpresaAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'nit', 'telefono')
-    search_fields = ('nombre', 'nit')
\ No newline at end of file
+    search_fields = ('nombre', 'nit')
+@admin.register(TokenRevocado)
+class TokenRevocadoAdmin(admin.ModelAdmin):
+    list_display = ('jti', 'usuario', 'motivo', 'fecha_revocacion', 'expira')
+    search_fields = ('jti', 'usuario__cedula')
+    raw_id_fields = ('usuario',)
+    readonly_fields = ('fecha_revocacion',)
@@ -5,3 +5,6 @@ class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.usuarios'
     verbose_name = "Gestión de Usuarios"
+
+    def ready(self):
+        import apps.usuarios.signals  # Invalidación de la caché de usuarios (cache_usuarios.py)
@@ -2,7 +2,7 @@
 
 from django.urls import path
 # Importa tu LoginView y RefreshTokenView personalizadas
-from .views import LoginView, RefreshTokenView
+from .views import LoginView, RefreshTokenView, LogoutView
 
 # Si estuvieras usando las vistas por defecto de SimpleJWT (pero usamos LoginView personalizada):
 # from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -12,4 +12,6 @@ urlpatterns = [
     path('login/', LoginView.as_view(), name='token_obtain_pair'), # Puedes nombrarla 'login' o 'token_obtain_pair'
     # Apunta a tu vista de Refresh (o la por defecto)
     path('refresh/', RefreshTokenView.as_view(), name='token_refresh'),
+    # Revoca el access actual (y el refresh enviado) en la lista de revocados
+    path('logout/', LogoutView.as_view(), name='logout'),
 ]
\ No newline at end of file
@@ -0,0 +1,143 @@
+# backend/proyecto/apps/usuarios/authentication.py
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .cache_usuarios import cache_usuarios
+from .models import Usuario
+from .principal import Principal
+from .revocacion import revocaciones
+from .tokens import CLAIM_CEDULA, CLAIM_EMPRESA, CLAIM_ROL, CLAIM_STAFF, CLAIM_VERSION, token_vigente
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication que carga el usuario junto con su rol (una consulta en
+    vez de dos) y deja el Principal de la petición en request.principal.
+    """
+
+    def authenticate(self, request):
+        resultado = super().authenticate(request)
+        if resultado is not None:
+            request.principal = Principal.desde_usuario(resultado[0])
+        return resultado
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        # Lista de revocados en memoria del worker: sin consulta salvo positivo del filtro
+        if revocaciones.esta_revocado(validated_token.get(api_settings.JTI_CLAIM)):
+            raise AuthenticationFailed("Token revocado.", code="token_revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        # Igual que JWTAuthentication.get_user, cargando el usuario con cargar_usuario()
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        try:
+            user = self.cargar_usuario(user_id)
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        # Con el usuario ya cargado la versión se compara sin pasar por la caché
+        if CLAIM_VERSION in validated_token and validated_token[CLAIM_VERSION] != user.version_seguridad:
+            raise AuthenticationFailed("Token revocado.", code="token_revoked")
+
+        return user
+
+    def cargar_usuario(self, user_id):
+        return self.user_model.objects.select_related('rol').get(**{api_settings.USER_ID_FIELD: user_id})
+
+
+class CacheJWTAuthentication(PrincipalJWTAuthentication):
+    """
+    Sirve el usuario (con Rol y Empresa) desde la caché LRU del proceso: sin
+    consulta por petición mientras la entrada siga vigente (ver cache_usuarios.py).
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        # La copia en caché puede tener hasta USUARIOS_CACHE_TTL: su versión (y is_active) no basta
+        # para ver una revocación hecha en otro worker. Se compara también con la versión vigente,
+        # igual que en las lecturas (a lo sumo JWT_VERSION_CACHE_SEGUNDOS de retraso)
+        if not token_vigente(validated_token):
+            raise AuthenticationFailed("Token revocado.", code="token_revoked")
+        return user
+
+    def cargar_usuario(self, user_id):
+        return cache_usuarios.obtener(user_id, self._cargar_de_bd)
+
+    def _cargar_de_bd(self, user_id):
+        return self.user_model.objects.select_related('rol', 'empresa').get(**{api_settings.USER_ID_FIELD: user_id})
+
+
+class ClaimsJWTAuthentication(CacheJWTAuthentication):
+    """
+    En peticiones de solo lectura (GET/HEAD/OPTIONS) confía en los claims del
+    token (rol, empresa, staff, cédula) y no consulta Usuario: request.user es un
+    Usuario con solo esos campos cargados; el resto se lee de la BD, de una
+    vez, si la vista llega a necesitarlo. La revocación se comprueba con la
+    versión de seguridad en caché. Las escrituras y los tokens sin claims
+    (emitidos antes) siguen el camino completo.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        if CLAIM_VERSION not in validated_token:
+            return super().authenticate(request)
+
+        if not token_vigente(validated_token):
+            raise AuthenticationFailed("Token revocado.", code="token_revoked")
+
+        user = self.usuario_desde_claims(validated_token)
+        request.principal = Principal(
+            usuario_id=user.pk,
+            rol=validated_token.get(CLAIM_ROL),
+            empresa_id=user.empresa_id,
+            is_staff=user.is_staff,
+            autenticado=True,
+        )
+        return user, validated_token
+
+    def usuario_desde_claims(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        # Activo: desactivar sube la versión, así que un token vigente es de un usuario activo
+        cargados = {
+            'id': user_id,
+            'is_active': True,
+            'is_staff': validated_token.get(CLAIM_STAFF, False),
+            'empresa_id': validated_token.get(CLAIM_EMPRESA),
+            'version_seguridad': validated_token[CLAIM_VERSION],
+        }
+        if CLAIM_CEDULA in validated_token:
+            cargados['cedula'] = validated_token[CLAIM_CEDULA]
+        # from_db espera los valores en el orden de los campos del modelo; el resto queda diferido
+        campos = [f.attname for f in Usuario._meta.concrete_fields if f.attname in cargados]
+        user = Usuario.from_db(router.db_for_read(Usuario), campos, [cargados[c] for c in campos])
+        user._desde_token = True
+        return user
@@ -0,0 +1,72 @@
+# backend/proyecto/apps/usuarios/cache_usuarios.py
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class CacheUsuarios:
+    """
+    Caché LRU con TTL, en memoria del proceso (cada worker la suya), de
+    Usuario con su Rol y Empresa ya cargados. Se invalida desde las señales de
+    Usuario/Rol/Empresa (signals.py); en los demás workers una entrada vieja
+    dura como mucho 'ttl' segundos.
+    """
+
+    def __init__(self, maximo, ttl):
+        self.maximo = maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict() # usuario_id -> (expira, usuario)
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, usuario_id, cargar):
+        """
+        Copia del usuario en caché, o cargar(usuario_id) si no está o expiró.
+        Se devuelve una copia: la vista puede modificar request.user sin tocar la caché.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(usuario_id)
+            if entrada is not None and entrada[0] > ahora:
+                self._entradas.move_to_end(usuario_id)
+                self.aciertos += 1
+                return copy.copy(entrada[1])
+            self.fallos += 1
+        # La consulta va fuera del lock: dos fallos simultáneos cargan dos veces, sin bloquearse
+        usuario = cargar(usuario_id)
+        with self._lock:
+            self._entradas[usuario_id] = (ahora + self.ttl, usuario)
+            self._entradas.move_to_end(usuario_id)
+            while len(self._entradas) > self.maximo:
+                self._entradas.popitem(last=False) # El menos usado recientemente
+        return copy.copy(usuario)
+
+    def invalidar(self, usuario_id):
+        with self._lock:
+            self._entradas.pop(usuario_id, None)
+
+    def vaciar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def estadisticas(self):
+        with self._lock:
+            total = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'maximo': self.maximo,
+                'ttl_segundos': self.ttl,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / total, 4) if total else None,
+            }
+
+
+cache_usuarios = CacheUsuarios(
+    maximo=getattr(settings, 'USUARIOS_CACHE_MAXIMO', 1024),
+    ttl=getattr(settings, 'USUARIOS_CACHE_TTL', 300),
+)
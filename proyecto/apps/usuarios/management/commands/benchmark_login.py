@@ -0,0 +1,98 @@
+# backend/proyecto/apps/usuarios/management/commands/benchmark_login.py
+
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.contrib.auth.models import update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from apps.usuarios.models import Rol, Usuario
+from apps.usuarios.serializers import MyTokenObtainPairSerializer
+
+
+def _login(cedula, password):
+    """Login JWT completo más la escritura de last_login (la de UPDATE_LAST_LOGIN y la del admin)."""
+    serializer = MyTokenObtainPairSerializer(data={'cedula': cedula, 'password': password})
+    serializer.is_valid(raise_exception=True)
+    update_last_login(None, serializer.user) # save(update_fields=['last_login'])
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el rendimiento del login (tokens + last_login) con full_clean() en cada '
+        'save() contra el camino rápido de Usuario.save (sin validar cuando update_fields '
+        'solo toca CAMPOS_SIN_VALIDACION). Crea un usuario temporal y lo borra al terminar. '
+        'Con el hasher configurado domina el hash de la contraseña; --hash-rapido lo aísla.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=4, help='Logins concurrentes (default: 4).')
+        parser.add_argument('--logins', type=int, default=50, help='Logins por hilo (default: 50).')
+        parser.add_argument(
+            '--hash-rapido', action='store_true',
+            help='Usa MD5PasswordHasher durante la medición para medir solo el coste de BD.',
+        )
+
+    def handle(self, *args, **options):
+        hilos = max(1, options['hilos'])
+        logins = max(1, options['logins'])
+        hashers = (
+            override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+            if options['hash_rapido'] else nullcontext()
+        )
+
+        marca = f"bench{uuid.uuid4().hex[:8]}"
+        password = uuid.uuid4().hex
+        with hashers:
+            # Email y username para que full_clean() haga sus tres comprobaciones de unicidad
+            usuario = Usuario.objects.create_user(
+                cedula=marca, password=password, email=f"{marca}@benchmark.local",
+                rol=Rol.objects.filter(nombre='conductor').first(),
+            )
+            self.stdout.write(f"{hilos} hilos x {logins} logins ({connection.vendor})")
+            try:
+                for nombre, sin_validacion in (
+                    ('full_clean siempre', frozenset()), # El save() anterior
+                    ('camino rápido', Usuario.CAMPOS_SIN_VALIDACION),
+                ):
+                    consultas, total, errores, segundos = self._medir(
+                        marca, password, sin_validacion, hilos, logins
+                    )
+                    self.stdout.write(
+                        f"  {nombre:<18} {total / segundos:8.1f} logins/s  "
+                        f"({consultas} consultas por login, {total} en {segundos:.2f}s, {errores} errores)"
+                    )
+            finally:
+                usuario.delete()
+
+    def _medir(self, cedula, password, sin_validacion, hilos, logins):
+        original = Usuario.CAMPOS_SIN_VALIDACION
+        Usuario.CAMPOS_SIN_VALIDACION = sin_validacion
+        try:
+            # Un login de calentamiento, contando sus consultas
+            with CaptureQueriesContext(connection) as consultas:
+                _login(cedula, password)
+
+            def trabajador(_):
+                errores = 0
+                try:
+                    for _i in range(logins):
+                        try:
+                            _login(cedula, password)
+                        except Exception:
+                            errores += 1
+                finally:
+                    connection.close() # Cada hilo usa su propia conexión
+                return errores
+
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=hilos) as pool:
+                errores = sum(pool.map(trabajador, range(hilos)))
+            segundos = time.perf_counter() - inicio
+        finally:
+            Usuario.CAMPOS_SIN_VALIDACION = original
+        return len(consultas), hilos * logins - errores, errores, segundos
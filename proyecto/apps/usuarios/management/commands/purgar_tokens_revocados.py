@@ -0,0 +1,17 @@
+# backend/proyecto/apps/usuarios/management/commands/purgar_tokens_revocados.py
+
+from django.core.management.base import BaseCommand
+
+from apps.usuarios.revocacion import purgar_expirados
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra de la lista de revocados los tokens ya expirados: no valdrían de '
+        'todos modos y así el filtro en memoria de cada worker se mantiene pequeño '
+        '(programar con cron, p. ej. a diario).'
+    )
+
+    def handle(self, *args, **options):
+        borrados = purgar_expirados()
+        self.stdout.write(self.style.SUCCESS(f"Tokens revocados expirados borrados: {borrados}"))
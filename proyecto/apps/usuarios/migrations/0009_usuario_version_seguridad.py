@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0008_create_initial_roles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='version_seguridad',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
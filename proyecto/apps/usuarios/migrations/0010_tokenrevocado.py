@@ -0,0 +1,31 @@
+# Generated by Django 5.1.6 on 2026-10-18 00:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0009_usuario_version_seguridad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TokenRevocado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jti', models.CharField(max_length=255, unique=True)),
+                ('expira', models.DateTimeField(verbose_name='Expiración del Token')),
+                ('fecha_revocacion', models.DateTimeField(auto_now_add=True)),
+                ('motivo', models.CharField(blank=True, max_length=255)),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tokens_revocados', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token Revocado',
+                'verbose_name_plural': 'Tokens Revocados',
+                'indexes': [models.Index(fields=['expira'], name='token_revocado_expira_idx')],
+            },
+        ),
+    ]
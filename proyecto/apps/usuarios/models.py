@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
@@ -125,8 +125,20 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
         help_text=_("Vehículo asignado a este usuario (solo si es conductor)")
     )
 
+    # Se incrementa al cambiar contraseña, rol, empresa o estado: los JWT emitidos
+    # con una versión anterior (claim 'ver') dejan de valer. Ver apps/usuarios/tokens.py
+    version_seguridad = models.PositiveIntegerField(default=0, editable=False)
+
     objects = UsuarioManager()
 
+    # Campos que, al cambiar, invalidan los tokens ya emitidos. La contraseña no se compara
+    # por su hash: el rehash del login (más iteraciones de PBKDF2) lo cambia sin que cambie la
+    # contraseña. Se revoca cuando se llamó a set_password() (ver save())
+    CAMPOS_SEGURIDAD = ('is_active', 'is_staff', 'is_superuser', 'rol_id', 'empresa_id')
+    # Columnas sin unique ni reglas en clean(): save(update_fields=...) que solo toca estas
+    # (last_login del login, contraseña nueva o rehash, versión) no pasa por full_clean()
+    CAMPOS_SIN_VALIDACION = frozenset({'password', 'last_login', 'version_seguridad'})
+
     USERNAME_FIELD = 'cedula'  # ¡Cédula como identificador!
     REQUIRED_FIELDS = []       # Cedula ya es el USERNAME_FIELD, así que no necesita estar aquí
 
@@ -134,6 +146,49 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.cedula if self.cedula else str(self.email)  # Asegura que siempre retorne un string
 
+    def get_full_name(self):
+        # Lo usa la plantilla de remisión (con la cédula como respaldo si está vacío)
+        return f"{self.nombre} {self.apellido}".strip()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._recordar_seguridad()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        # Usuario armado desde los claims del JWT (ver ClaimsJWTAuthentication): al
+        # primer acceso a un campo no incluido se cargan todos los diferidos juntos
+        if fields is not None and getattr(self, '_desde_token', False):
+            fields = set(fields) | self.get_deferred_fields()
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._recordar_seguridad(fields)
+
+    def _recordar_seguridad(self, campos=None):
+        # Valores de seguridad tal como están en la BD (solo los leídos; los diferidos no se tocan
+        # y un cambio en memoria sin guardar no se pisa al cargar otros campos)
+        leidos = {
+            campo: self.__dict__[campo] for campo in self.CAMPOS_SEGURIDAD
+            if campo in self.__dict__ and (campos is None or campo in campos)
+        }
+        if campos is None:
+            self._seguridad_cargada = leidos
+        else:
+            self._seguridad_cargada = {**getattr(self, '_seguridad_cargada', {}), **leidos}
+
+    def _seguridad_modificada(self):
+        cargados = getattr(self, '_seguridad_cargada', {})
+        return any(cargados[campo] != getattr(self, campo) for campo in cargados)
+
+    def revocar_tokens(self):
+        """Invalida todos los JWT emitidos hasta ahora para este usuario (sube la versión)."""
+        from .cache_usuarios import cache_usuarios # Imports diferidos: ambos módulos importan este modelo
+        from .tokens import publicar_version
+        Usuario.objects.filter(pk=self.pk).update(version_seguridad=models.F('version_seguridad') + 1)
+        self.version_seguridad = Usuario.objects.filter(pk=self.pk).values_list('version_seguridad', flat=True).get()
+        publicar_version(self.pk, self.version_seguridad)
+        cache_usuarios.invalidar(self.pk) # update() no dispara post_save
+
     # Usaremos clean para validaciones antes de guardar
     def clean(self):
         super().clean() # Llama a la validación padre
@@ -162,19 +217,68 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
 
 
     # El método save puede quedarse como estaba o simplemente llamar a clean
-    def save(self, *args, **kwargs):
-        # Genera username si está vacío y hay email (lógica existente)
-        if not self.username and self.email:
-             self.username = self.email
+    def save(self, *args, validar=None, **kwargs):
+        # validar=None: se valida salvo que update_fields solo toque CAMPOS_SIN_VALIDACION.
+        # full_clean() cuesta una consulta por campo único (email, username, cédula) más las
+        # del rol/empresa/vehículo de clean(), y en esas escrituras internas no aporta nada
+        if validar is None:
+            update_fields = kwargs.get('update_fields')
+            validar = update_fields is None or not set(update_fields) <= self.CAMPOS_SIN_VALIDACION
+
+        if validar:
+            # Genera username si está vacío y hay email (lógica existente)
+            if not self.username and self.email:
+                 self.username = self.email
+
+            # Asegura que las validaciones se corran ANTES de guardar
+            self.full_clean() # Llama al método clean()
+
+            # Limpia el vehículo si el rol no es conductor ANTES de guardar
+            if self.rol and self.rol.nombre != 'conductor':
+                self.vehiculo_asignado = None
+            # Limpia la empresa si el rol no es cliente ANTES de guardar
+            if self.rol and self.rol.nombre != 'cliente':
+                self.empresa = None
+
+        # Cambió algo sensible (contraseña, rol, empresa, estado): revoca los tokens vigentes.
+        # set_password() deja la contraseña nueva en _password hasta guardar; el rehash de
+        # check_password() lo limpia antes de su save(update_fields=['password'])
+        revocar = not self._state.adding and (self._seguridad_modificada() or self._password is not None)
+        if revocar:
+            self.version_seguridad += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version_seguridad'}
+
+        super().save(*args, **kwargs) # Guarda en la base de datos
 
-        # Asegura que las validaciones se corran ANTES de guardar
-        self.full_clean() # Llama al método clean()
+        self._recordar_seguridad()
+        if revocar:
+            from .tokens import publicar_version
+            transaction.on_commit(lambda: publicar_version(self.pk, self.version_seguridad))
 
-        # Limpia el vehículo si el rol no es conductor ANTES de guardar
-        if self.rol and self.rol.nombre != 'conductor':
-            self.vehiculo_asignado = None
-        # Limpia la empresa si el rol no es cliente ANTES de guardar
-        if self.rol and self.rol.nombre != 'cliente':
-            self.empresa = None
+    def guardar_validado(self, **kwargs):
+        """Guardado de escrituras del usuario (API, admin): siempre con full_clean(), toque los campos que toque."""
+        self.save(validar=True, **kwargs)
 
-        super().save(*args, **kwargs) # Guarda en la base de datos
+
+class TokenRevocado(models.Model):
+    """
+    JWT revocado por su 'jti' (cierre de sesión, rotación del refresh, equipo
+    perdido). Cada worker lo consulta en memoria (ver revocacion.py); la fila
+    sobra una vez pasado 'expira', cuando el token ya no valdría de todos modos.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE, null=True, blank=True, related_name='tokens_revocados')
+    expira = models.DateTimeField(verbose_name=_("Expiración del Token"))
+    fecha_revocacion = models.DateTimeField(auto_now_add=True)
+    motivo = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name = _("Token Revocado")
+        verbose_name_plural = _("Tokens Revocados")
+        indexes = [
+            models.Index(fields=['expira'], name='token_revocado_expira_idx'), # Purga y recarga de vigentes
+        ]
+
+    def __str__(self):
+        return f'{self.jti} (usuario {self.usuario_id})'
@@ -1,4 +1,5 @@
 from rest_framework import permissions
+from .principal import principal_de # Rol/empresa resueltos una vez por petición (sin consultas)
 import logging # Opcional
 logger = logging.getLogger(__name__) # Opcional
 
@@ -14,22 +15,15 @@ class IsOwner(permissions.BasePermission):
 class IsJefeInventario(permissions.BasePermission):
     message = "Se requiere rol de Jefe de Inventario."
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.rol and request.user.rol.nombre == 'jefe_inventario'
+        return principal_de(request).tiene_rol('jefe_inventario')
         
 
 class IsConductor(permissions.BasePermission):
     message = "No tienes permiso para acceder a esta vista, no eres un conductor."
 
     def has_permission(self, request, view):
-        # Verifica si el usuario está autenticado.
-        if not request.user.is_authenticated:
-            return False  # Si no está autenticado, no hay permiso
-
-        # Verifica si el usuario tiene un rol asignado *antes* de acceder a .nombre
-        if request.user.rol is None:
-            return False  # Si no tiene rol, no es conductor
-
-        return request.user.rol.nombre == 'conductor'
+        # Anónimos y usuarios sin rol tienen rol None en el principal
+        return principal_de(request).tiene_rol('conductor')
 
 
 class IsCliente(permissions.BasePermission):
@@ -39,15 +33,8 @@ class IsCliente(permissions.BasePermission):
     message = "No tienes permiso para realizar esta acción, se requiere rol de cliente."
 
     def has_permission(self, request, view):
-        # Verifica que el usuario esté autenticado y que tenga el atributo 'rol'
-        # y que el nombre de ese rol sea 'cliente'
-        return (
-            request.user and
-            request.user.is_authenticated and
-            hasattr(request.user, 'rol') and
-            request.user.rol is not None and
-            getattr(request.user.rol, 'nombre', None) == 'cliente'
-        )
+        # Usuario autenticado con rol 'cliente' (el principal ya lo resolvió al autenticar)
+        return principal_de(request).tiene_rol('cliente')
     
 class IsJefeEmpresa(permissions.BasePermission):
     """
@@ -56,5 +43,5 @@ class IsJefeEmpresa(permissions.BasePermission):
     message = "No tienes permiso para realizar esta acción, se requiere rol de Jefe de Empresa."
 
     def has_permission(self, request, view):
-        return request.user.is_authenticated and request.user.rol and request.user.rol.nombre == 'jefe_empresa'
+        return principal_de(request).tiene_rol('jefe_empresa')
 # 
\ No newline at end of file
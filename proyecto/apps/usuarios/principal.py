@@ -0,0 +1,57 @@
+# backend/proyecto/apps/usuarios/principal.py
+from dataclasses import dataclass
+
+# Roles con acceso de gestión a todo el inventario (además de is_staff)
+ROLES_JEFE_BODEGA = ('jefe_empresa', 'jefe_inventario', 'admin')
+
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Quién hace la petición, resuelto una sola vez al autenticar: id, código de
+    rol y empresa. Los permisos y el filtrado de querysets leen de aquí en
+    lugar de request.user.rol, así un chequeo de rol nunca consulta la BD.
+    """
+    usuario_id: int = None
+    rol: str = None          # Rol.nombre ('conductor', 'cliente', ...) o None
+    empresa_id: int = None
+    is_staff: bool = False
+    autenticado: bool = False
+
+    @classmethod
+    def desde_usuario(cls, user):
+        if user is None or not user.is_authenticated:
+            return ANONIMO
+        # Con el usuario cargado por PrincipalJWTAuthentication el rol ya viene
+        # en el select_related; si no (force_authenticate, sesión) cuesta una consulta aquí, una vez
+        rol = getattr(user, 'rol', None)
+        return cls(
+            usuario_id=user.pk,
+            rol=rol.nombre if rol else None,
+            empresa_id=getattr(user, 'empresa_id', None),
+            is_staff=user.is_staff,
+            autenticado=True,
+        )
+
+    def tiene_rol(self, *roles):
+        return self.rol is not None and self.rol in roles
+
+    @property
+    def es_jefe_bodega(self):
+        """Admin/staff o jefes: ven y gestionan el inventario de todas las empresas."""
+        return self.is_staff or self.tiene_rol(*ROLES_JEFE_BODEGA)
+
+
+ANONIMO = Principal()
+
+
+def principal_de(request):
+    """
+    Principal de la petición (DRF Request). Lo fija el autenticador; si la
+    petición se autenticó por otra vía se construye aquí y se guarda en la request.
+    """
+    principal = getattr(request, 'principal', None)
+    if principal is None:
+        principal = Principal.desde_usuario(getattr(request, 'user', None))
+        request.principal = principal
+    return principal
@@ -0,0 +1,143 @@
+# backend/proyecto/apps/usuarios/revocacion.py
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import TokenRevocado
+
+
+class FiltroBloom:
+    """
+    Conjunto aproximado de jti: 'no está' es seguro, 'está' puede ser un falso
+    positivo (con probabilidad ~tasa_error), que se confirma en la BD.
+    Unos 1,8 bytes por jti con tasa 0.001, frente a ~100 de un set de str.
+    """
+
+    def __init__(self, capacidad, tasa_error):
+        self.capacidad = max(capacidad, 1)
+        self.bits_totales = max(8, math.ceil(-self.capacidad * math.log(tasa_error) / math.log(2) ** 2))
+        self.funciones = max(1, round(self.bits_totales / self.capacidad * math.log(2)))
+        self.bits = bytearray((self.bits_totales + 7) // 8)
+        self.elementos = 0
+
+    def _posiciones(self, clave):
+        # Doble hash (Kirsch-Mitzenmacher) sobre un único blake2b
+        digest = hashlib.blake2b(clave.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits_totales for i in range(self.funciones)]
+
+    def agregar(self, clave):
+        for posicion in self._posiciones(clave):
+            self.bits[posicion >> 3] |= 1 << (posicion & 7)
+        self.elementos += 1
+
+    def __contains__(self, clave):
+        return all(self.bits[posicion >> 3] & (1 << (posicion & 7)) for posicion in self._posiciones(clave))
+
+
+class Revocaciones:
+    """
+    Vista en memoria (por worker) de la tabla TokenRevocado. Cada petición
+    cuesta un chequeo en el filtro; la BD solo se toca para traer las filas
+    nuevas cada REVOCACION_REFRESCO_SEGUNDOS, para reconstruir el filtro sin
+    los expirados cada REVOCACION_RECONSTRUIR_SEGUNDOS, y para confirmar un positivo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filtro = None
+        self._ultimo_id = 0
+        self._proximo_refresco = 0
+        self._proxima_reconstruccion = 0
+        self._confirmados = set() # jti revocados ya confirmados: no se vuelve a consultar
+
+    def _reconstruir(self, ahora):
+        # El tope se lee antes: lo insertado mientras tanto entra en el siguiente refresco
+        tope = TokenRevocado.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        filas = list(TokenRevocado.objects.filter(expira__gt=timezone.now()).values_list('jti', flat=True))
+        # Margen para las revocaciones que lleguen hasta la próxima reconstrucción
+        filtro = FiltroBloom(
+            max(1024, 2 * len(filas)), getattr(settings, 'REVOCACION_TASA_FALSOS_POSITIVOS', 0.001)
+        )
+        for jti in filas:
+            filtro.agregar(jti)
+        self._filtro = filtro
+        self._confirmados = set()
+        self._ultimo_id = tope
+        # La reconstrucción periódica también recoge una fila que confirmó tarde (id menor que el último visto)
+        self._proxima_reconstruccion = ahora + getattr(settings, 'REVOCACION_RECONSTRUIR_SEGUNDOS', 3600)
+
+    def _refrescar(self, ahora):
+        if self._filtro is None or ahora >= self._proxima_reconstruccion or self._filtro.elementos > self._filtro.capacidad:
+            self._reconstruir(ahora)
+        else:
+            # Solo las revocaciones nuevas (otros workers): una consulta por el índice de la PK
+            for fila_id, jti in TokenRevocado.objects.filter(id__gt=self._ultimo_id).values_list('id', 'jti'):
+                self._filtro.agregar(jti)
+                self._ultimo_id = max(self._ultimo_id, fila_id)
+        self._proximo_refresco = ahora + getattr(settings, 'REVOCACION_REFRESCO_SEGUNDOS', 30)
+
+    def esta_revocado(self, jti):
+        if not jti:
+            return False
+        ahora = time.monotonic()
+        with self._lock:
+            if ahora >= self._proximo_refresco:
+                self._refrescar(ahora)
+            if jti not in self._filtro:
+                return False # El caso común: sin tocar la BD
+            if jti in self._confirmados:
+                return True
+        # Positivo del filtro (revocado o falso positivo): se confirma
+        revocado = TokenRevocado.objects.filter(jti=jti).exists()
+        if revocado:
+            with self._lock:
+                self._confirmados.add(jti)
+        return revocado
+
+    def registrar(self, jti):
+        """Revocación hecha en este worker: efecto inmediato aquí, los demás la ven al refrescar."""
+        with self._lock:
+            if self._filtro is not None:
+                self._filtro.agregar(jti)
+            self._confirmados.add(jti)
+
+
+revocaciones = Revocaciones()
+
+
+def revocar_token(token, motivo='', usuario_id=None):
+    """
+    Guarda el jti del token (access o refresh validado) en la tabla y en la
+    memoria del worker. Devuelve False si ya estaba revocado: el jti único en
+    la BD decide, no el filtro (el de otro worker puede estar desactualizado).
+    """
+    jti = token[api_settings.JTI_CLAIM]
+    expira = datetime.fromtimestamp(token['exp'], tz=dt_timezone.utc)
+    try:
+        with transaction.atomic(): # Savepoint: el IntegrityError no rompe la transacción de la petición
+            TokenRevocado.objects.create(
+                jti=jti,
+                usuario_id=usuario_id or token.get(api_settings.USER_ID_CLAIM),
+                expira=expira,
+                motivo=motivo,
+            )
+        revocado = True
+    except IntegrityError: # Ya revocado (antes o a la vez por otra petición)
+        revocado = False
+    revocaciones.registrar(jti)
+    return revocado
+
+
+def purgar_expirados():
+    """Borra las filas de tokens ya expirados; devuelve cuántas."""
+    borrados, _ = TokenRevocado.objects.filter(expira__lte=timezone.now()).delete()
+    return borrados
@@ -3,7 +3,12 @@ from rest_framework import serializers
 from .models import Usuario, Rol, Empresa  # Importa los modelos necesarios
 from django.contrib.auth.hashers import make_password
 from ..transporte.models import Vehiculo
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .tokens import agregar_claims, token_vigente
+from .cache_usuarios import cache_usuarios
+from .revocacion import revocaciones, revocar_token
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.utils.translation import gettext_lazy as _ # Importa para mensajes de error
 from django.contrib.auth.password_validation import validate_password
 
@@ -40,6 +45,7 @@ class CambiarPasswordSerializer(serializers.Serializer):
         user = self.context['user'] # Obtenemos el usuario del contexto pasado por la vista
         user.set_password(password)
         user.save(update_fields=['password'])
+        cache_usuarios.invalidar(user.pk) # La autenticación no debe seguir usando la contraseña vieja
         return user
 # --- FIN NUEVO ---
 
@@ -48,9 +54,9 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
-        # Opcional: añadir claims personalizados al token
-        # token['nombre_completo'] = user.get_full_name()
-        return token
+        # Rol, empresa y versión de seguridad: las lecturas se autorizan sin consultar
+        # Usuario (ver ClaimsJWTAuthentication); subir la versión revoca el token
+        return agregar_claims(token, user)
 
     def validate(self, attrs):
         data = super().validate(attrs) # Obtiene tokens access y refresh
@@ -62,6 +68,36 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         data['user'] = user_data
         return data
 
+class RefreshConVersionSerializer(TokenRefreshSerializer):
+    """
+    No emite un access nuevo desde un refresh revocado (por versión de
+    seguridad o por jti). Con ROTATE_REFRESH_TOKENS el refresh usado queda
+    revocado: cada refresh sirve una sola vez.
+    """
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if not token_vigente(refresh) or revocaciones.esta_revocado(refresh.get(jwt_settings.JTI_CLAIM)):
+            raise InvalidToken(_("Token revocado."))
+        if not jwt_settings.ROTATE_REFRESH_TOKENS:
+            return super().validate(attrs)
+
+        # Rotación hecha aquí: la de simplejwt 5.5.0 llama a refresh.outstand(), que
+        # exige la app token_blacklist (no instalada) y fallaba con AttributeError
+        usuario = Usuario.objects.select_related('rol').filter(**{jwt_settings.USER_ID_FIELD: refresh.get(jwt_settings.USER_ID_CLAIM)}).first()
+        if usuario is None or not jwt_settings.USER_AUTHENTICATION_RULE(usuario):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        # Cada refresh sirve una vez: si otra petición (o una repetición) ya lo usó, la fila existe
+        if not revocar_token(refresh, motivo='Rotación de refresh', usuario_id=usuario.pk): # Antes de cambiarle el jti
+            raise InvalidToken(_("Token revocado."))
+        # Claims al día (y 'ver' en los refresh emitidos antes de existir): el access los copia
+        agregar_claims(refresh, usuario)
+        data = {'access': str(refresh.access_token)}
+        refresh.set_jti()
+        refresh.set_exp()
+        refresh.set_iat()
+        data['refresh'] = str(refresh)
+        return data
+
 # Serializer para el modelo Rol
 class RolSerializer(serializers.ModelSerializer):
     class Meta:
@@ -185,9 +221,8 @@ class UsuarioSerializer(serializers.ModelSerializer):
         user = Usuario(**validated_data)
         user.set_password(password)
         if not user.username and user.email: user.username = user.email
-        # Las validaciones del modelo se ejecutan antes de guardar si se llama a full_clean
-        # user.full_clean() # Opcional, pero recomendado si tienes validaciones en clean()
-        user.save()
+        # Las validaciones del modelo (full_clean) se ejecutan antes de guardar
+        user.guardar_validado()
         return user
 
     # Método para hashear contraseña si se actualiza
@@ -202,7 +237,7 @@ class UsuarioSerializer(serializers.ModelSerializer):
 
         # Actualiza los demás campos (incluyendo vehiculo_asignado)
         # El super().update se encarga de asignar los valores de validated_data
-        # y luego llama a instance.save(), que a su vez llamará a instance.clean()
+        # y luego llama a instance.save() sin update_fields, que siempre pasa por full_clean()
         return super().update(instance, validated_data)
 
 
@@ -0,0 +1,27 @@
+# backend/proyecto/apps/usuarios/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache_usuarios import cache_usuarios
+from .models import Empresa, Rol, Usuario
+
+# --- Invalidación de la caché de usuarios de la autenticación JWT ---
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario(sender, instance, **kwargs):
+    usuario_id = instance.pk
+    cache_usuarios.invalidar(usuario_id)
+    # Otra petición podría volver a cachear la fila vieja antes del commit: se repite al confirmar
+    transaction.on_commit(lambda: cache_usuarios.invalidar(usuario_id))
+
+
+@receiver(post_save, sender=Rol)
+@receiver(post_delete, sender=Rol)
+@receiver(post_save, sender=Empresa)
+@receiver(post_delete, sender=Empresa)
+def invalidar_relacionados(sender, instance, **kwargs):
+    # Rol y Empresa van embebidos en cada usuario cacheado: cambian muy poco, se vacía todo
+    cache_usuarios.vaciar()
+    transaction.on_commit(cache_usuarios.vaciar)
@@ -1,3 +1,98 @@
+from unittest import mock
+
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.db.models import F
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache_usuarios import cache_usuarios
+from .models import Rol, Usuario
+from .revocacion import revocaciones
+from .serializers import MyTokenObtainPairSerializer
+from .tokens import CLAIM_VERSION
+
+
+class RotacionRefreshTests(TestCase):
+    """El refresh rotado no vuelve a servir, ni siquiera en un worker con el filtro desactualizado."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('cond-1', 'pw', rol=Rol.objects.get_or_create(nombre='conductor')[0])
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _refrescar(self, refresh):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(refresh)}, format='json')
+
+    def test_refresh_usado_no_sirve_en_otro_worker(self):
+        refresh = RefreshToken.for_user(self.usuario)
+        self.assertEqual(self._refrescar(refresh).status_code, 200)
+
+        # Otro worker: su filtro aún no trae la revocación
+        with mock.patch.object(revocaciones, 'esta_revocado', return_value=False):
+            respuesta = self._refrescar(refresh)
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertNotIn('refresh', respuesta.data)
+
+    def test_refresh_sin_claims_queda_sujeto_a_revocacion(self):
+        # Refresh emitido antes de los claims propios: sin 'ver'
+        refresh = RefreshToken.for_user(self.usuario)
+        self.assertNotIn(CLAIM_VERSION, refresh)
+        respuesta = self._refrescar(refresh)
+        self.assertEqual(respuesta.status_code, 200)
+        rotado = RefreshToken(respuesta.data['refresh'])
+        self.assertEqual(rotado[CLAIM_VERSION], self.usuario.version_seguridad)
+
+        self.usuario.revocar_tokens()
+        self.assertEqual(self._refrescar(rotado).status_code, 401)
+
+
+class EscrituraConUsuarioEnCacheTests(TestCase):
+    """Una escritura no se autoriza con la versión de seguridad de la copia en caché del usuario."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = Usuario.objects.create_user('cond-2', 'pw', rol=Rol.objects.get_or_create(nombre='conductor')[0])
+
+    def setUp(self):
+        cache_usuarios.vaciar()
+        self.addCleanup(cache_usuarios.vaciar)
+
+    def test_revocacion_en_otro_worker(self):
+        access = str(MyTokenObtainPairSerializer.get_token(self.usuario).access_token)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        # Usuario en la caché de este worker, con la versión del token
+        cache_usuarios.obtener(self.usuario.pk, lambda pk: Usuario.objects.select_related('rol', 'empresa').get(pk=pk))
+
+        # Otro worker revoca: aquí no llega la señal, solo la versión nueva (caché de versiones expirada)
+        Usuario.objects.filter(pk=self.usuario.pk).update(version_seguridad=F('version_seguridad') + 1)
+        cache.clear()
+        self.assertEqual(client.post('/api/auth/logout/', {}, format='json').status_code, 401)
+
+
+class VersionSeguridadPasswordTests(TestCase):
+    """Cambiar la contraseña revoca los tokens; el rehash al iniciar sesión no."""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user('cond-3', 'clave-vieja', rol=Rol.objects.get_or_create(nombre='conductor')[0])
+
+    def test_rehash_no_revoca(self):
+        # Hash de una versión anterior de Django (menos iteraciones): check_password lo rehace
+        hash_viejo = PBKDF2PasswordHasher().encode('clave-vieja', PBKDF2PasswordHasher().salt(), iterations=1000)
+        Usuario.objects.filter(pk=self.usuario.pk).update(password=hash_viejo)
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        self.assertTrue(usuario.check_password('clave-vieja'))
+        usuario.refresh_from_db()
+        self.assertNotEqual(usuario.password, hash_viejo)
+        self.assertEqual(usuario.version_seguridad, self.usuario.version_seguridad)
 
-# Create your tests here.
+    def test_cambio_de_password_revoca(self):
+        usuario = Usuario.objects.get(pk=self.usuario.pk)
+        usuario.set_password('clave-nueva')
+        usuario.save(update_fields=['password'])
+        usuario.refresh_from_db()
+        self.assertEqual(usuario.version_seguridad, self.usuario.version_seguridad + 1)
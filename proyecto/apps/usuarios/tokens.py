@@ -0,0 +1,59 @@
+# backend/proyecto/apps/usuarios/tokens.py
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Usuario
+
+# Claims propios en los JWT (además de user_id)
+CLAIM_ROL = 'rol'            # Rol.nombre o None
+CLAIM_EMPRESA = 'empresa_id'
+CLAIM_STAFF = 'staff'
+CLAIM_VERSION = 'ver'        # Usuario.version_seguridad al emitir el token
+CLAIM_CEDULA = 'cedula'      # Identificador que usan str(usuario) y los logs
+
+VERSION_REVOCADA = -1        # Usuario borrado o inactivo: ningún token coincide
+
+
+def agregar_claims(token, user):
+    """Rol, empresa, staff, cédula y versión de seguridad en el token (se copian al access del refresh)."""
+    token[CLAIM_ROL] = user.rol.nombre if user.rol_id else None
+    token[CLAIM_EMPRESA] = user.empresa_id
+    token[CLAIM_STAFF] = user.is_staff
+    token[CLAIM_VERSION] = user.version_seguridad
+    token[CLAIM_CEDULA] = user.cedula
+    return token
+
+
+def _clave(usuario_id):
+    return f'usuarios:version_seguridad:{usuario_id}'
+
+
+def version_vigente(usuario_id):
+    """
+    Versión de seguridad actual del usuario, desde la caché (una consulta
+    pequeña al expirar). Con la caché por defecto (memoria local) cada proceso
+    ve una revocación a más tardar a los JWT_VERSION_CACHE_SEGUNDOS; con una
+    caché compartida (Redis/Memcached en CACHES) es inmediata.
+    """
+    version = cache.get(_clave(usuario_id))
+    if version is None:
+        version = (
+            Usuario.objects.filter(pk=usuario_id, is_active=True)
+            .values_list('version_seguridad', flat=True).first()
+        )
+        version = VERSION_REVOCADA if version is None else version
+        cache.set(_clave(usuario_id), version, getattr(settings, 'JWT_VERSION_CACHE_SEGUNDOS', 60))
+    return version
+
+
+def publicar_version(usuario_id, version):
+    """Tras subir la versión: la caché la refleja ya (revocación inmediata en este proceso)."""
+    cache.set(_clave(usuario_id), version, getattr(settings, 'JWT_VERSION_CACHE_SEGUNDOS', 60))
+
+
+def token_vigente(token):
+    """False si el token lleva una versión distinta de la actual (revocado). Tokens sin 'ver' no se juzgan aquí."""
+    if CLAIM_VERSION not in token:
+        return True
+    return token[CLAIM_VERSION] == version_vigente(token[api_settings.USER_ID_CLAIM])
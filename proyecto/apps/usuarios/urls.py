@@ -2,7 +2,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 # Asegúrate que estas vistas SÍ estén definidas en usuarios/views.py
-from .views import UsuarioViewSet, EmpresaViewSet, MinimalAuthTestView, RolListView # Añade MinimalAuthTestView
+from .views import UsuarioViewSet, EmpresaViewSet, MinimalAuthTestView, RolListView, CacheUsuariosView # Añade MinimalAuthTestView
 
 router = DefaultRouter()
 router.register(r'usuarios', UsuarioViewSet, basename='usuario')
@@ -14,4 +14,5 @@ urlpatterns = [
     # Ruta de prueba para autenticación básica
     path('test-auth/', MinimalAuthTestView.as_view(), name='test-auth'),
     path('roles/', RolListView.as_view(), name='rol-list'),
+    path('cache-usuarios/', CacheUsuariosView.as_view(), name='cache-usuarios'),
 ]
\ No newline at end of file
@@ -8,6 +8,8 @@ from rest_framework.decorators import action # <-- Importar action
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.contrib.auth import authenticate
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -16,11 +18,14 @@ from .models import Usuario, Rol, Empresa
 from .serializers import ( # <-- Serializadores necesarios
     UsuarioSerializer,
     MyTokenObtainPairSerializer,
+    RefreshConVersionSerializer,
     EmpresaSerializer,
     RolSerializer,
     CambiarPasswordSerializer # <-- Importar el nuevo serializer
 )
 from .filters import UsuarioFilter # <-- Filtro existente
+from .cache_usuarios import cache_usuarios
+from .revocacion import revocar_token
 
 # Configurar logger
 logger = logging.getLogger(__name__)
@@ -33,6 +38,12 @@ class MinimalAuthTestView(APIView):
         logger.debug(f"MinimalAuthTestView - User: {request.user}, Auth: {request.user.is_authenticated}")
         return Response({"message": f"Hello authenticated user: {request.user.id} - {request.user.cedula}"})
 
+class CacheUsuariosView(APIView):
+    """Aciertos/fallos de la caché de usuarios de la autenticación (del worker que responde)."""
+    permission_classes = [IsAuthenticated, IsAdminUser]
+    def get(self, request):
+        return Response(cache_usuarios.estadisticas())
+
 class RolListView(generics.ListAPIView):
     queryset = Rol.objects.all().order_by('id')
     serializer_class = RolSerializer
@@ -43,7 +54,30 @@ class LoginView(TokenObtainPairView):
     serializer_class = MyTokenObtainPairSerializer
 
 class RefreshTokenView(TokenRefreshView):
-    permission_classes = (IsAuthenticated,) # Refresh requiere estar autenticado (tener un refresh token válido)
+    # La credencial es el refresh token del cuerpo: TokenRefreshView no autentica la
+    # petición (authentication_classes vacío), así que IsAuthenticated la rechazaba siempre
+    permission_classes = (AllowAny,)
+    serializer_class = RefreshConVersionSerializer # Rechaza refresh de sesiones revocadas
+
+class LogoutView(APIView):
+    """
+    Cierra la sesión del equipo: revoca el access con el que se llama y, si
+    se envía {'refresh': ...}, también ese refresh (ver revocacion.py).
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        revocar_token(request.auth, motivo='Logout', usuario_id=request.user.pk)
+        if request.data.get('refresh'):
+            try:
+                refresh = RefreshToken(request.data['refresh'])
+            except TokenError:
+                return Response({"detail": "Refresh token inválido."}, status=status.HTTP_400_BAD_REQUEST)
+            if refresh.get(jwt_settings.USER_ID_CLAIM) != request.user.pk:
+                return Response({"detail": "El refresh token no es de este usuario."}, status=status.HTTP_400_BAD_REQUEST)
+            revocar_token(refresh, motivo='Logout', usuario_id=request.user.pk)
+        logger.info(f"Logout del usuario {request.user.pk}")
+        return Response({"detail": "Sesión cerrada."}, status=status.HTTP_200_OK)
 
 # --- QUITAR VISTAS REDUNDANTES/INSEGURAS ---
 # Quitar ConductorLoginView y ClienteLoginView si no se usan y se prefiere el login estándar con contraseña
@@ -130,6 +164,17 @@ class UsuarioViewSet(viewsets.ModelViewSet):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     # --- FIN NUEVA ACCIÓN ---
 
+    @action(detail=True, methods=['post'], url_path='revocar-sesiones', permission_classes=[IsAuthenticated, (IsAdminUser | IsJefeEmpresa)])
+    def revocar_sesiones(self, request, pk=None):
+        """
+        Cierra todas las sesiones del usuario: sus JWT (access y refresh) dejan de valer.
+        URL: /api/gestion/usuarios/{pk}/revocar-sesiones/
+        """
+        usuario = self.get_object()
+        usuario.revocar_tokens()
+        logger.info(f"Sesiones del usuario {usuario.cedula} revocadas por {request.user.cedula}")
+        return Response({"detail": "Sesiones revocadas."}, status=status.HTTP_200_OK)
+
     # Métodos create, update, partial_update, destroy pueden quedarse como estaban
     # si no necesitan lógica adicional más allá de lo que hacen los serializers y permisos.
     # Por ejemplo, el serializer ya maneja la lógica de rol/empresa/vehículo.
@@ -81,6 +81,7 @@ MIDDLEWARE = [
     # 'django.middleware.csrf.CsrfViewMiddleware',      # <-- Comentado por ahora (para pruebas API)
     'django.contrib.auth.middleware.AuthenticationMiddleware', # <-- Procesa Auth (Session y otros backends)
     'apps.bodegaje.middleware.CurrentUserMiddleware', 
+    'apps.bodegaje.auditoria.AuditoriaMiddleware',     # Historial de la petición en un solo INSERT
     'proyecto.middleware.RequestLogMiddleware',       # <-- Tu logger (después de Auth)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -121,7 +122,9 @@ DATABASES = {
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         # Usar SOLO JWT por defecto para la API inicialmente
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWT con claims de rol/empresa: lecturas sin consultar Usuario, escrituras con el usuario
+        # completo; ambos fijan request.principal (apps/usuarios/authentication.py)
+        'apps.usuarios.authentication.ClaimsJWTAuthentication',
         # Si necesitas SessionAuth para admin/browsable API, descomenta después
         # 'rest_framework.authentication.SessionAuthentication',
     ],
@@ -133,24 +136,44 @@ REST_FRAMEWORK = {
         'rest_framework.renderers.JSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ]
-    # Puedes añadir aquí otras configuraciones de DRF como paginación, etc.
+    # La paginación se define por vista (ver apps/transporte/pagination.py)
 }
 
+# --- Paginación por cursor de pedidos (keyset) ---
+# Tamaño de página por defecto y máximo permitido vía ?page_size=
+PEDIDOS_PAGE_SIZE = int(os.environ.get('PEDIDOS_PAGE_SIZE', 50))
+PEDIDOS_MAX_PAGE_SIZE = int(os.environ.get('PEDIDOS_MAX_PAGE_SIZE', 200))
+# Historial de bodegaje (apps/bodegaje/pagination.py)
+HISTORIAL_PAGE_SIZE = int(os.environ.get('HISTORIAL_PAGE_SIZE', 100))
+HISTORIAL_MAX_PAGE_SIZE = int(os.environ.get('HISTORIAL_MAX_PAGE_SIZE', 500))
+
 # --- Configuración SIMPLE_JWT Limpia ---
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': True,
-    'BLACKLIST_AFTER_ROTATION': False, # Simplifica manejo inicial
+    'BLACKLIST_AFTER_ROTATION': False, # La revocación tras rotar la hace RefreshConVersionSerializer (apps/usuarios/revocacion.py)
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY, # Usa la SECRET_KEY principal
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id', # Campo PK en tu modelo Usuario
     'USER_ID_CLAIM': 'user_id', # Claim en el token con el ID
+    # 'rol', 'empresa_id', 'staff', 'cedula' y 'ver' se añaden en MyTokenObtainPairSerializer
     # Configs por defecto suelen ser suficientes
 }
 
 
+# Segundos que cada proceso guarda en caché la versión de seguridad de un usuario:
+# es el retraso máximo de una revocación con la caché local por defecto
+JWT_VERSION_CACHE_SEGUNDOS = int(os.environ.get('JWT_VERSION_CACHE_SEGUNDOS', 60))
+# Caché LRU por worker de Usuario+Rol+Empresa en la autenticación (apps/usuarios/cache_usuarios.py)
+USUARIOS_CACHE_MAXIMO = int(os.environ.get('USUARIOS_CACHE_MAXIMO', 1024))  # Usuarios por worker
+USUARIOS_CACHE_TTL = int(os.environ.get('USUARIOS_CACHE_TTL', 300))         # Segundos por entrada
+# Lista de tokens revocados (apps/usuarios/revocacion.py): filtro Bloom por worker
+REVOCACION_REFRESCO_SEGUNDOS = 30         # Cada cuánto trae las revocaciones de otros workers
+REVOCACION_RECONSTRUIR_SEGUNDOS = 3600    # Reconstrucción completa (descarta los ya expirados)
+REVOCACION_TASA_FALSOS_POSITIVOS = 0.001  # Positivos falsos que cuestan una consulta de confirmación
+
 # Modelo de Usuario Personalizado
 AUTH_USER_MODEL = 'usuarios.Usuario'
 
@@ -217,3 +240,39 @@ MEDIA_URL = '/media/'
 # Ruta absoluta en el sistema de archivos donde se guardarán esos archivos
 # Asegúrate que esta carpeta exista y Django tenga permisos de escritura
 MEDIA_ROOT = BASE_DIR / 'media' # BASE_DIR está definido usualmente al inicio del archivo
+
+# Fotos de pruebas de entrega (ver apps/transporte/fotos.py): el original se reduce y se generan versiones WebP
+PRUEBA_FOTO_MAX_LADO = 2048        # Lado mayor (px) del archivo guardado como 'original'
+PRUEBA_FOTO_CALIDAD = 85           # Calidad JPEG del original reducido
+PRUEBA_FOTO_MEDIA_LADO = 1024      # Versión media (detalle en la app)
+PRUEBA_FOTO_MINIATURA_LADO = 320   # Miniatura (listas)
+
+# Reparto de retiros de bodega entre ubicaciones (ver apps/bodegaje/stock.py):
+# 'menos_recogidas' | 'vaciar_menores' | 'ubicacion'
+ASIGNACION_ESTRATEGIA_DEFECTO = 'menos_recogidas'
+# Los retiros se reservan al crear el pedido y se descuentan al iniciar el viaje;
+# la reserva vence estas horas después de la recogida programada (o de su creación)
+RESERVA_STOCK_HORAS = 48
+MOVIMIENTOS_LOTE_MAX_LINEAS = 1000  # Líneas por petición en inventario/movimientos/
+
+# Exportaciones de bodegaje (ver apps/bodegaje/exportar.py)
+EXPORTAR_CHUNK_SIZE = 2000                      # Filas por bloque al leer de la BD
+EXPORTAR_SPOOL_MAX_BYTES = 8 * 1024 * 1024      # El .xlsx pasa de memoria a disco por encima de esto
+AUDITORIA_BATCH_SIZE = 500                      # Filas por INSERT al escribir el historial (ver apps/bodegaje/auditoria.py)
+
+# Subida reanudable por partes de fotos de prueba (ver apps/transporte/subidas.py)
+SUBIDAS_TEMP_DIR = BASE_DIR / 'subidas_tmp'     # Disco local donde se ensamblan los trozos
+SUBIDA_FOTO_MAX_BYTES = 25 * 1024 * 1024        # Tamaño máximo declarado por sesión
+SUBIDA_TROZO_MAX_BYTES = 2 * 1024 * 1024        # Tamaño máximo de cada PUT
+SUBIDA_SESION_TTL_HORAS = 24                    # Sesiones sin actividad se purgan pasado este tiempo
+SUBIDA_LOTE_MAX_FOTOS = 10                      # Fotos por petición en subir_pruebas/
+
+# Carpeta (dentro del storage de media) donde se guardan las remisiones PDF ya renderizadas
+REMISION_CACHE_DIR = 'remisiones_cache'
+
+# Pool de procesos para renderizar remisiones con WeasyPrint (ver apps/transporte/remisiones.py)
+REMISION_PDF_WORKERS = int(os.environ.get('REMISION_PDF_WORKERS', 2))   # 0 = render en el mismo proceso
+REMISION_PDF_COLA = int(os.environ.get('REMISION_PDF_COLA', 4))         # Peticiones que pueden esperar turno
+REMISION_PDF_TIMEOUT = int(os.environ.get('REMISION_PDF_TIMEOUT', 30))  # Segundos
+REMISION_PDF_RETRY_AFTER = 5  # Segundos sugeridos al cliente cuando el pool está saturado (429)
+REMISION_ZIP_MAX_PEDIDOS = 1000  # Tope de remisiones por descarga ZIP